@@ -0,0 +1,182 @@
+"""Run a converter over many files in a pool of worker processes.
+
+Each file is converted by parsing the converter's command line as if it had
+been given on its own, so any converter that takes an input file followed by
+an output file can be run in a batch.
+
+Workers are replaced after a number of files so that memory held by one large
+file does not accumulate. A failure only fails its own file.
+
+"""
+import os
+import os.path
+import time
+from glob import glob
+from multiprocessing import Pool, cpu_count
+from traceback import format_exc
+
+from libcchdo import metrics
+
+
+# The argument parser and the function that runs the parsed arguments. Worker
+# processes inherit these on fork.
+_parser = None
+_run = None
+
+
+def find_inputs(path):
+    """Return the files in a directory or that match a glob, sorted."""
+    if os.path.isdir(path):
+        paths = [os.path.join(path, name) for name in os.listdir(path)]
+    else:
+        paths = glob(path)
+    return sorted(path for path in paths if os.path.isfile(path))
+
+
+def output_path(input_path, outdir, suffix=None):
+    """Return the output path for an input.
+
+    suffix - replaces the input's extension if given
+
+    """
+    name = os.path.basename(input_path)
+    if suffix:
+        name = os.path.splitext(name)[0] + suffix
+    return os.path.join(outdir, name)
+
+
+def output_paths(input_paths, outdir, suffix=None):
+    """Return the output path of each input.
+
+    Raises ValueError if inputs would be written to the same output, e.g. two
+    inputs of the same name from different directories.
+
+    """
+    out_paths = [output_path(path, outdir, suffix) for path in input_paths]
+    inputs_by_output = {}
+    for path, out_path in zip(input_paths, out_paths):
+        inputs_by_output.setdefault(out_path, []).append(path)
+    collisions = [
+        u'{0} <- {1}'.format(out_path, ', '.join(paths)) for out_path, paths in
+        sorted(inputs_by_output.items()) if len(paths) > 1]
+    if collisions:
+        raise ValueError(
+            u'Inputs would overwrite each other\'s output:\n{0}'.format(
+                '\n'.join(collisions)))
+    return out_paths
+
+
+def _close_files(args):
+    for value in vars(args).values():
+        if hasattr(value, 'close') and hasattr(value, 'closed'):
+            if not value.closed:
+                value.close()
+
+
+def _run_main(args):
+    return args.main(args)
+
+
+def _convert_one(task):
+    """Convert one file and return its result."""
+    converter_argv, input_path, out_path, in_worker = task
+    if in_worker:
+        metrics.reset()
+    result = {
+        'input': input_path,
+        'output': out_path,
+        'error': None,
+    }
+    wall = time.time()
+    cpu = sum(os.times()[:2])
+    args = None
+    try:
+        args = _parser.parse_args(converter_argv + [input_path, out_path])
+        status = _run(args)
+        if status:
+            result['error'] = u'exited with status {0}'.format(status)
+    except SystemExit, err:
+        result['error'] = u'exited with status {0}'.format(err.code)
+    except Exception, err:
+        result['error'] = format_exc()
+    finally:
+        if args is not None:
+            _close_files(args)
+    # Do not leave partial outputs of failed conversions behind.
+    if result['error'] and os.path.isfile(out_path):
+        os.unlink(out_path)
+    result['wall'] = time.time() - wall
+    result['cpu'] = sum(os.times()[:2]) - cpu
+    # Workers' metrics are added to this process's.
+    if in_worker:
+        result['metrics'] = metrics.snapshot()
+    return result
+
+
+def convert_files(parser, converter_argv, input_paths, outdir, suffix=None,
+                  processes=None, files_per_worker=10, run=None):
+    """Convert each input into outdir and return a list of results.
+
+    parser - the argument parser to parse each conversion's arguments with
+    converter_argv - the arguments that select the converter and its options.
+        The input and output paths are appended.
+    processes - number of worker processes. 1 runs in this process.
+    files_per_worker - number of files a worker converts before it is
+        replaced
+    run - runs the parsed arguments (default: args.main(args))
+
+    Each result is a dict of input, output, error (None on success), wall and
+    cpu seconds.
+
+    Raises ValueError before converting anything if inputs would be written to
+    the same output.
+
+    """
+    global _parser, _run
+
+    out_paths = output_paths(input_paths, outdir, suffix)
+    if not os.path.isdir(outdir):
+        os.makedirs(outdir)
+    in_worker = not (processes == 1 or len(input_paths) < 2)
+    tasks = [(converter_argv, path, out_path, in_worker)
+             for path, out_path in zip(input_paths, out_paths)]
+
+    _parser = parser
+    _run = run or _run_main
+    try:
+        if not in_worker:
+            return map(_convert_one, tasks)
+        pool = Pool(processes or cpu_count(),
+                    maxtasksperchild=files_per_worker)
+        try:
+            results = []
+            for result in pool.imap(_convert_one, tasks, 1):
+                metrics.merge(result.pop('metrics'))
+                results.append(result)
+            return results
+        finally:
+            pool.close()
+            pool.join()
+    finally:
+        _parser = None
+        _run = None
+
+
+def summarize(results):
+    """Return a summary of the results' failures and timings as lines."""
+    failures = [result for result in results if result['error']]
+    wall = sum(result['wall'] for result in results)
+    cpu = sum(result['cpu'] for result in results)
+    lines = [
+        u'Converted {0} of {1} files, {2} failed'.format(
+            len(results) - len(failures), len(results), len(failures)),
+        u'Total {0:.2f}s wall, {1:.2f}s CPU'.format(wall, cpu),
+    ]
+    if results:
+        slowest = max(results, key=lambda result: result['wall'])
+        lines.append(u'Slowest {0} {1:.2f}s wall, {2:.2f}s CPU'.format(
+            slowest['input'], slowest['wall'], slowest['cpu']))
+    for result in failures:
+        lines.append(u'FAILED {0}: {1}'.format(
+            result['input'], result['error'].rstrip()))
+    return lines
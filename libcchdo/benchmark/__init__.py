@@ -0,0 +1,406 @@
+"""Benchmarks of reading, writing and manipulating large cruises.
+
+Inputs are synthesised by libcchdo.benchmark.synthetic at the sizes of large
+real cruises, e.g. a 40,000 row bottle file and a 5,000 cast CTD zip. A scale
+shrinks or grows them.
+
+Each case runs in a forked process so that its peak memory can be measured
+apart from the other cases. Cases that read a file also report the bytes
+held by what was read, from DataFile.memory_usage(), so that growth in the
+data model shows up apart from transient garbage. Reports are JSON and can
+be compared against a stored baseline::
+
+    $ hydro misc benchmark --output baseline.json
+    ...
+    $ hydro misc benchmark --baseline baseline.json --threshold 0.2
+
+"""
+import os
+import os.path
+import sys
+import gc
+import time
+import json
+import resource
+from collections import OrderedDict
+from datetime import datetime
+from traceback import format_exc
+from logging import getLogger
+
+
+log = getLogger(__name__)
+
+
+import libcchdo
+from libcchdo.benchmark import synthetic
+
+
+#: Sizes of the synthetic inputs at scale 1
+SIZES = {
+    'bottle_casts': 1112,
+    'bottles': 36,
+    'ctd_casts': 5000,
+    'ctd_levels': 50,
+    'depth_casts': 500,
+}
+
+
+def scaled_sizes(scale=1.0):
+    return dict((key, max(1, int(round(value * scale))))
+                for key, value in SIZES.items())
+
+
+def _generate_btl_ex(handle, sizes):
+    synthetic.write_bottle_exchange(
+        handle, sizes['bottle_casts'], sizes['bottles'])
+
+
+def _generate_btl_woce(handle, sizes):
+    from libcchdo.formats.bottle import woce
+    woce.write(_read_btl_ex(sizes), handle)
+
+
+def _generate_btl_columnar(handle, sizes):
+    from libcchdo.formats import columnar
+    columnar.write(_read_btl_ex(sizes), handle)
+
+
+def _generate_ctdzip_ex(handle, sizes):
+    synthetic.write_ctd_exchange_zip(
+        handle, sizes['ctd_casts'], sizes['ctd_levels'])
+
+
+def _generate_ctdzip_woce(handle, sizes):
+    synthetic.write_woce_ctd_zip(
+        handle, sizes['ctd_casts'], sizes['ctd_levels'])
+
+
+def _generate_ctdzip_nc(handle, sizes):
+    from libcchdo.formats.ctd.zip import netcdf
+    netcdf.write(_read_ctdzip_ex(sizes), handle)
+
+
+_INPUTS = OrderedDict([
+    ('btl_ex', ('hy1.csv', _generate_btl_ex)),
+    ('btl_woce', ('hy.txt', _generate_btl_woce)),
+    ('btl_columnar', ('hy1.cchdo.pack', _generate_btl_columnar)),
+    ('ctdzip_ex', ('ct1.zip', _generate_ctdzip_ex)),
+    ('ctdzip_woce', ('ct.zip', _generate_ctdzip_woce)),
+    ('ctdzip_nc', ('nc_ctd.zip', _generate_ctdzip_nc)),
+])
+
+
+# The directory and sizes of the inputs for the current run. Cases run in
+# forked processes and inherit these.
+_input_dir = None
+_sizes = None
+
+
+def input_path(name, sizes=None):
+    """Return the path to an input, generating it if needed."""
+    sizes = sizes or _sizes
+    fname, generate = _INPUTS[name]
+    path = os.path.join(_input_dir, '{0}_{1}'.format(
+        '_'.join(str(sizes[key]) for key in sorted(sizes)), fname))
+    if not os.path.exists(path):
+        temp_path = path + '.incoming'
+        try:
+            with open(temp_path, 'wb') as handle:
+                generate(handle, sizes)
+            os.rename(temp_path, path)
+        finally:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+    return path
+
+
+def _read(format_module, cls, name, sizes=None):
+    dfile = cls()
+    with open(input_path(name, sizes), 'rb') as handle:
+        format_module.read(dfile, handle)
+    return dfile
+
+
+def _read_btl_ex(sizes=None):
+    from libcchdo.model.datafile import DataFile
+    from libcchdo.formats.bottle import exchange
+    return _read(exchange, DataFile, 'btl_ex', sizes)
+
+
+def _read_ctdzip_ex(sizes=None):
+    from libcchdo.model.datafile import DataFileCollection
+    from libcchdo.formats.ctd.zip import exchange
+    return _read(exchange, DataFileCollection, 'ctdzip_ex', sizes)
+
+
+def _format(module_name):
+    return __import__(module_name, fromlist=['read'])
+
+
+def _read_case(module_name, input_name, collection=False):
+    def setup():
+        from libcchdo.model.datafile import DataFile, DataFileCollection
+        cls = DataFileCollection if collection else DataFile
+        return _format(module_name), cls, input_path(input_name)
+
+    def run(state):
+        format_module, cls, path = state
+        dfile = cls()
+        with open(path, 'rb') as handle:
+            format_module.read(dfile, handle)
+        return dfile
+    return setup, run
+
+
+def _write_case(module_name, read):
+    def setup():
+        return _format(module_name), read()
+
+    def run(state):
+        format_module, dfile = state
+        with open(os.devnull, 'wb') as handle:
+            format_module.write(dfile, handle)
+    return setup, run
+
+
+def _merge_setup():
+    from libcchdo.fns import _decimal
+    origin = _read_btl_ex()
+    # A view of every row. DataFile copies only have the columns.
+    deriv = origin.take(slice(None))
+    deriv['OXYGEN'].values = [
+        value + _decimal('0.1') if value is not None else None
+        for value in origin['OXYGEN'].values]
+    return origin, deriv
+
+
+def _merge_run(state):
+    from libcchdo.merge import merge_datafiles, determine_bottle_keys
+    origin, deriv = state
+    # The merged file writes into the origin's columns. Merge into a view so
+    # that every run merges the same files.
+    origin = origin.take(slice(None))
+    merge_datafiles(
+        origin, deriv, determine_bottle_keys(origin, deriv), ['OXYGEN'])
+
+
+def _split_on_cast_run(dfile):
+    from libcchdo.model.convert.datafile_to_datafilecollection import \
+        split_on_cast
+    split_on_cast(dfile)
+
+
+def _reorder_run(dfile):
+    dfile.reorder_file_pressure()
+
+
+def _depth_setup():
+    dfc = _read_ctdzip_ex()
+    return dfc.files[:_sizes['depth_casts']]
+
+
+def _depth_run(dfiles):
+    for dfile in dfiles:
+        dfile.calculate_depths()
+
+
+#: name -> (setup, run). setup's return value is passed to run. Only run is
+#: measured. If run returns a DataFile or collection, the memory it uses is
+#: measured too.
+CASES = OrderedDict([
+    ('read_btl_ex', _read_case('libcchdo.formats.bottle.exchange', 'btl_ex')),
+    ('write_btl_ex', _write_case(
+        'libcchdo.formats.bottle.exchange', _read_btl_ex)),
+    ('read_btl_woce', _read_case('libcchdo.formats.bottle.woce', 'btl_woce')),
+    ('write_btl_woce', _write_case(
+        'libcchdo.formats.bottle.woce', _read_btl_ex)),
+    ('read_btl_columnar', _read_case(
+        'libcchdo.formats.columnar', 'btl_columnar')),
+    ('read_ctdzip_ex', _read_case(
+        'libcchdo.formats.ctd.zip.exchange', 'ctdzip_ex', True)),
+    ('write_ctdzip_ex', _write_case(
+        'libcchdo.formats.ctd.zip.exchange', _read_ctdzip_ex)),
+    ('read_ctdzip_woce', _read_case(
+        'libcchdo.formats.ctd.zip.woce', 'ctdzip_woce', True)),
+    ('read_ctdzip_nc', _read_case(
+        'libcchdo.formats.ctd.zip.netcdf', 'ctdzip_nc', True)),
+    ('write_ctdzip_nc', _write_case(
+        'libcchdo.formats.ctd.zip.netcdf', _read_ctdzip_ex)),
+    ('merge_btl', (_merge_setup, _merge_run)),
+    ('split_on_cast_btl', (_read_btl_ex, _split_on_cast_run)),
+    ('reorder_btl', (_read_btl_ex, _reorder_run)),
+    ('depth_ctd', (_depth_setup, _depth_run)),
+])
+
+
+def _max_rss_kb():
+    """Return the peak resident memory of this process in KiB."""
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        rss /= 1024
+    return rss
+
+
+def _cpu_time():
+    times = os.times()
+    return times[0] + times[1]
+
+
+def _measure(name, repeat):
+    """Set up and run the case, returning its measurements."""
+    setup, run = CASES[name]
+    try:
+        state = setup()
+    except ImportError, err:
+        return {'skipped': u'missing dependency: {0}'.format(
+            str(err).splitlines()[0])}
+    gc.collect()
+    setup_rss = _max_rss_kb()
+    walls = []
+    cpus = []
+    for iii in range(repeat):
+        wall = time.time()
+        cpu = _cpu_time()
+        result = run(state)
+        walls.append(time.time() - wall)
+        cpus.append(_cpu_time() - cpu)
+    peak_rss = _max_rss_kb()
+    measurements = {
+        'wall': min(walls),
+        'cpu': min(cpus),
+        'peak_rss_kb': peak_rss,
+        'peak_rss_growth_kb': peak_rss - setup_rss,
+    }
+    if hasattr(result, 'memory_usage'):
+        usage = result.memory_usage()
+        measurements['data_bytes'] = usage['total']
+        measurements['data_bytes_per_row'] = usage['bytes_per_row']
+    return measurements
+
+
+def run_case(name, repeat=1):
+    """Run the case in a forked process and return its measurements.
+
+    The peak memory growth is how far the run raised the peak over what was
+    already reached by setting up.
+
+    """
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(read_fd)
+        try:
+            try:
+                result = _measure(name, repeat)
+            except Exception:
+                result = {'error': format_exc()}
+            with os.fdopen(write_fd, 'wb') as out:
+                out.write(json.dumps(result))
+        finally:
+            os._exit(0)
+    os.close(write_fd)
+    with os.fdopen(read_fd, 'rb') as handle:
+        data = handle.read()
+    os.waitpid(pid, 0)
+    if not data:
+        return {'error': u'benchmark process died'}
+    return json.loads(data)
+
+
+def run(names=None, scale=1.0, repeat=1, input_dir=None):
+    """Run the benchmark cases and return a report.
+
+    names - the cases to run (default: all)
+    input_dir - where to keep generated inputs. Inputs already there are
+        reused.
+
+    """
+    global _input_dir, _sizes
+
+    from tempfile import mkdtemp
+    from shutil import rmtree
+
+    names = names or CASES.keys()
+    unknown = set(names) - set(CASES)
+    if unknown:
+        raise KeyError(u'Unknown benchmarks: {0}'.format(
+            ', '.join(sorted(unknown))))
+
+    temporary = input_dir is None
+    _input_dir = input_dir or mkdtemp(prefix='libcchdo_benchmark')
+    _sizes = scaled_sizes(scale)
+    if not os.path.isdir(_input_dir):
+        os.makedirs(_input_dir)
+    try:
+        cases = OrderedDict()
+        for name in names:
+            log.info(u'Benchmarking {0}'.format(name))
+            cases[name] = run_case(name, repeat)
+    finally:
+        if temporary:
+            rmtree(_input_dir)
+        _input_dir = _sizes = None
+
+    return OrderedDict([
+        ('version', libcchdo.__version__),
+        ('python', sys.version.split()[0]),
+        ('date', datetime.utcnow().isoformat()),
+        ('scale', scale),
+        ('sizes', scaled_sizes(scale)),
+        ('cases', cases),
+    ])
+
+
+#: Measurements compared against a baseline
+COMPARED = ('wall', 'peak_rss_growth_kb', 'data_bytes', )
+
+
+def compare(report, baseline, threshold=0.25):
+    """Return the regressions in report from the baseline.
+
+    A measurement regresses when it is more than threshold (a fraction) over
+    the baseline's. Returns a list of (case, measurement, baseline, value).
+
+    """
+    if report.get('scale') != baseline.get('scale'):
+        log.warn(u'Comparing benchmarks at different scales {0} and '
+                 '{1}'.format(report.get('scale'), baseline.get('scale')))
+    regressions = []
+    for name, result in report['cases'].items():
+        try:
+            base = baseline['cases'][name]
+        except KeyError:
+            continue
+        for key in COMPARED:
+            if key not in result or key not in base:
+                continue
+            # Tiny measurements are mostly noise.
+            if base[key] <= 0:
+                continue
+            if result[key] > base[key] * (1 + threshold):
+                regressions.append((name, key, base[key], result[key]))
+    return regressions
+
+
+def format_report(report):
+    """Return the report as lines of a table."""
+    lines = [u'{0:20s} {1:>10s} {2:>10s} {3:>12s} {4:>12s} {5:>12s}'.format(
+        'case', 'wall s', 'cpu s', 'peak KiB', 'growth KiB', 'data KiB')]
+    for name, result in report['cases'].items():
+        if 'skipped' in result:
+            lines.append(u'{0:20s} skipped: {1}'.format(
+                name, result['skipped']))
+        elif 'error' in result:
+            lines.append(u'{0:20s} error: {1}'.format(
+                name, result['error'].strip().splitlines()[-1]))
+        else:
+            if 'data_bytes' in result:
+                data = u'{0:12d}'.format(result['data_bytes'] / 1024)
+            else:
+                data = u'{0:>12s}'.format('-')
+            lines.append(
+                u'{0:20s} {1:10.3f} {2:10.3f} {3:12d} {4:12d} {5}'.format(
+                    name, result['wall'], result['cpu'],
+                    result['peak_rss_kb'], result['peak_rss_growth_kb'],
+                    data))
+    return lines
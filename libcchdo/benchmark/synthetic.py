@@ -0,0 +1,192 @@
+"""Synthetic cruises of realistic size for benchmarks.
+
+Profiles are smooth functions of pressure with a little noise and a few
+missing samples so that readers and writers see fill values and flags like
+they do in real data. The same seed always gives the same files.
+
+"""
+import random
+from math import exp
+from zipfile import ZipFile, ZIP_DEFLATED
+
+from libcchdo.util import StringIO
+
+
+EXPOCODE = '33BM20140101'
+SECT_ID = 'BM01'
+STAMP = '20140101CCHBENCH'
+DATE = '20140101'
+
+
+# name, units, format, fill chance
+BOTTLE_DATA = [
+    ('CTDPRS', 'DBAR', '{0:.1f}', 0),
+    ('CTDTMP', 'ITS-90', '{0:.4f}', 0),
+    ('CTDSAL', 'PSS-78', '{0:.4f}', 0.01),
+    ('SALNTY', 'PSS-78', '{0:.4f}', 0.03),
+    ('OXYGEN', 'UMOL/KG', '{0:.1f}', 0.03),
+    ('SILCAT', 'UMOL/KG', '{0:.2f}', 0.05),
+    ('NITRAT', 'UMOL/KG', '{0:.2f}', 0.05),
+]
+
+
+CTD_DATA = [
+    ('CTDPRS', 'DBAR', '{0:.1f}', 0),
+    ('CTDTMP', 'ITS-90', '{0:.4f}', 0),
+    ('CTDSAL', 'PSS-78', '{0:.4f}', 0.01),
+    ('CTDOXY', 'UMOL/KG', '{0:.1f}', 0.01),
+]
+
+
+def _profile(name, pres, rng):
+    """Return a plausible value for the parameter at the pressure."""
+    if name == 'CTDPRS':
+        return pres
+    if name == 'CTDTMP':
+        return 1.5 + 24 * exp(-pres / 700.0) + rng.gauss(0, 0.01)
+    if name in ('CTDSAL', 'SALNTY'):
+        return 34.7 + 0.6 * exp(-pres / 400.0) + rng.gauss(0, 0.002)
+    if name in ('CTDOXY', 'OXYGEN'):
+        return 180 + 60 * exp(-((pres - 900) / 500.0) ** 2) + rng.gauss(0, 1)
+    if name == 'SILCAT':
+        return 120 * (1 - exp(-pres / 2000.0)) + rng.gauss(0, 0.5)
+    if name == 'NITRAT':
+        return 35 * (1 - exp(-pres / 800.0)) + rng.gauss(0, 0.2)
+    raise KeyError(name)
+
+
+def _station(iii):
+    """Return the station number, latitude and longitude of a cast."""
+    return iii + 1, -60 + 0.05 * iii % 120, -170 + 0.07 * iii % 340
+
+
+def _bottom(rng):
+    return rng.randint(3000, 5500)
+
+
+def _value_and_flag(name, fmt, fill_chance, pres, rng):
+    if fill_chance and rng.random() < fill_chance:
+        return '-999', '9'
+    return fmt.format(_profile(name, pres, rng)), '2'
+
+
+def write_bottle_exchange(handle, ncasts=1112, bottles=36, seed=0):
+    """Write a Bottle Exchange file of ncasts casts of bottles each.
+
+    The defaults are about 40,000 rows.
+
+    """
+    rng = random.Random(seed)
+    columns = ['EXPOCODE', 'SECT_ID', 'STNNBR', 'CASTNO', 'SAMPNO', 'BTLNBR',
+               'BTLNBR_FLAG_W', 'DATE', 'TIME', 'LATITUDE', 'LONGITUDE',
+               'DEPTH']
+    units = [''] * 11 + ['METERS']
+    for name, unit, fmt, fill_chance in BOTTLE_DATA:
+        columns.append(name)
+        units.append(unit)
+        if fill_chance:
+            columns.append(name + '_FLAG_W')
+            units.append('')
+
+    handle.write('BOTTLE,{0}\n'.format(STAMP))
+    handle.write('# Synthetic cruise for benchmarks\n')
+    handle.write(','.join(columns) + '\n')
+    handle.write(','.join(units) + '\n')
+    for iii in xrange(ncasts):
+        station, lat, lng = _station(iii)
+        bottom = _bottom(rng)
+        for bottle in xrange(bottles, 0, -1):
+            pres = bottom * (bottle - 0.5) / bottles
+            row = [EXPOCODE, SECT_ID, str(station), '1', str(bottle),
+                   str(bottle), '2', DATE, '{0:04d}'.format(iii % 2400),
+                   '{0:.4f}'.format(lat), '{0:.4f}'.format(lng), str(bottom)]
+            for name, unit, fmt, fill_chance in BOTTLE_DATA:
+                value, flag = _value_and_flag(
+                    name, fmt, fill_chance, pres, rng)
+                row.append(value)
+                if fill_chance:
+                    row.append(flag)
+            handle.write(','.join(row) + '\n')
+    handle.write('END_DATA\n')
+
+
+def _ctd_levels(bottom, levels):
+    step = float(bottom) / levels
+    return [step * (lll + 0.5) for lll in xrange(levels)]
+
+
+def _write_ctd_exchange(handle, iii, levels, rng):
+    station, lat, lng = _station(iii)
+    bottom = _bottom(rng)
+    handle.write('CTD,{0}\n'.format(STAMP))
+    headers = [
+        ('EXPOCODE', EXPOCODE), ('SECT_ID', SECT_ID), ('STNNBR', station),
+        ('CASTNO', 1), ('DATE', DATE), ('TIME', '{0:04d}'.format(iii % 2400)),
+        ('LATITUDE', '{0:.4f}'.format(lat)),
+        ('LONGITUDE', '{0:.4f}'.format(lng)), ('DEPTH', bottom)]
+    handle.write('NUMBER_HEADERS = {0}\n'.format(len(headers) + 1))
+    for key, value in headers:
+        handle.write('{0} = {1}\n'.format(key, value))
+    columns = []
+    units = []
+    for name, unit, fmt, fill_chance in CTD_DATA:
+        columns.extend([name, name + '_FLAG_W'])
+        units.extend([unit, ''])
+    handle.write(','.join(columns) + '\n')
+    handle.write(','.join(units) + '\n')
+    for pres in _ctd_levels(bottom, levels):
+        row = []
+        for name, unit, fmt, fill_chance in CTD_DATA:
+            row.extend(_value_and_flag(name, fmt, fill_chance, pres, rng))
+        handle.write(','.join(row) + '\n')
+    handle.write('END_DATA\n')
+
+
+def _write_woce_ctd(handle, iii, levels, rng):
+    station, lat, lng = _station(iii)
+    bottom = _bottom(rng)
+    handle.write('EXPOCODE {0:14s} WHP-ID {1:5s} DATE 010114\n'.format(
+        EXPOCODE, SECT_ID))
+    handle.write('STNNBR {0:8d} CASTNO   1 NO. Records={1:5d}\n'.format(
+        station, levels))
+    handle.write('INSTRUMENT NO.   381 SAMPLING RATE  24.00 HZ\n')
+    handle.write(''.join(
+        '{0:>8s}'.format(name) for name, _, _, _ in CTD_DATA) + '  QUALT1\n')
+    handle.write(''.join(
+        '{0:>8s}'.format(unit) for _, unit, _, _ in CTD_DATA) + '       *\n')
+    handle.write(' *******' * len(CTD_DATA) + '       *\n')
+    for pres in _ctd_levels(bottom, levels):
+        values = []
+        flags = []
+        for name, unit, fmt, fill_chance in CTD_DATA:
+            value, flag = _value_and_flag(name, fmt, fill_chance, pres, rng)
+            values.append('{0:>8s}'.format(value))
+            flags.append(flag)
+        handle.write(''.join(values) + '   ' + ''.join(flags) + '\n')
+
+
+def _write_ctd_zip(handle, write_member, member_name, ncasts, levels, seed):
+    rng = random.Random(seed)
+    zfile = ZipFile(handle, 'w', ZIP_DEFLATED)
+    try:
+        for iii in xrange(ncasts):
+            member = StringIO()
+            write_member(member, iii, levels, rng)
+            zfile.writestr(member_name(iii), member.getvalue())
+    finally:
+        zfile.close()
+
+
+def write_ctd_exchange_zip(handle, ncasts=5000, levels=50, seed=0):
+    """Write a CTD Exchange zip of ncasts casts of levels each."""
+    def member_name(iii):
+        return '{0}_{1:05d}_00001_ct1.csv'.format(EXPOCODE, iii + 1)
+    _write_ctd_zip(
+        handle, _write_ctd_exchange, member_name, ncasts, levels, seed)
+
+
+def write_woce_ctd_zip(handle, ncasts=5000, levels=50, seed=0):
+    """Write a WOCE CTD zip of ncasts casts of levels each."""
+    def member_name(iii):
+        return '{0:05d}001.ctd'.format(iii + 1)
+    _write_ctd_zip(handle, _write_woce_ctd, member_name, ncasts, levels, seed)
@@ -0,0 +1,285 @@
+"""On-disk cache of conversion outputs.
+
+Converting the same unchanged file the same way gives the same output, so the
+output is stored under a key made from the input files' contents, the
+converter, its options and the library version. When the key is seen again
+the stored output is streamed out instead of reading and writing the file.
+
+The cache is bounded in size. The least recently used outputs are evicted
+first.
+
+Use with hydro convert::
+
+    $ hydro convert --cache bottle exchange_to_woce in_hy1.csv out_hy.txt
+
+--cache-dir stores the outputs somewhere other than the configuration
+directory.
+
+"""
+import os
+import os.path
+import sys
+from hashlib import sha1
+from shutil import copyfileobj
+from tempfile import SpooledTemporaryFile, mkstemp
+from logging import getLogger
+
+
+log = getLogger(__name__)
+
+
+import libcchdo
+from libcchdo import config
+from libcchdo.util import pyStringIO
+
+
+DEFAULT_MAX_BYTES = 2 ** 30
+
+
+def get_default_cache_dir():
+    return os.path.join(config.get_config_dir(), 'conversion_cache')
+
+
+class ConversionCache(object):
+    """A directory of outputs named by their keys.
+
+    An output's modification time is the last time it was used.
+
+    """
+    def __init__(self, directory=None, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory or get_default_cache_dir()
+        self.max_bytes = max_bytes
+        if not os.path.isdir(self.directory):
+            os.makedirs(self.directory)
+
+    def _path(self, key):
+        return os.path.join(self.directory, key)
+
+    def get(self, key):
+        """Return the path to the output for key or None."""
+        path = self._path(key)
+        try:
+            os.utime(path, None)
+        except OSError:
+            return None
+        return path
+
+    def put(self, key, handle):
+        """Store the contents of the file handle as the output for key."""
+        fd, temp_path = mkstemp(dir=self.directory, prefix='.incoming-')
+        try:
+            with os.fdopen(fd, 'wb') as out:
+                copyfileobj(handle, out)
+            os.rename(temp_path, self._path(key))
+        except:
+            os.unlink(temp_path)
+            raise
+        self.evict()
+
+    def entries(self):
+        """Return (mtime, size, path) for each output, oldest first."""
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.startswith('.'):
+                continue
+            path = self._path(name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        return sorted(entries)
+
+    def evict(self):
+        """Remove the least recently used outputs until under the bound."""
+        entries = self.entries()
+        total = sum(size for mtime, size, path in entries)
+        for mtime, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.unlink(path)
+            except OSError:
+                continue
+            log.debug(u'Evicted {0}'.format(path))
+            total -= size
+
+
+def _is_file(value):
+    return hasattr(value, 'read') or hasattr(value, 'write')
+
+
+def _is_output(handle):
+    return 'w' in getattr(handle, 'mode', '') or handle is sys.stdout
+
+
+def _file_args(args):
+    """Yield the name, index and file for each file argument.
+
+    The index is None unless the argument is a list of files.
+
+    """
+    for name, value in sorted(vars(args).items()):
+        if _is_file(value):
+            yield name, None, value
+        elif isinstance(value, list):
+            for index, item in enumerate(value):
+                if _is_file(item):
+                    yield name, index, item
+
+
+def _set_arg(args, name, index, value):
+    if index is None:
+        setattr(args, name, value)
+    else:
+        getattr(args, name)[index] = value
+
+
+class UncacheableError(ValueError):
+    """The conversion depends on something that cannot be hashed."""
+
+
+def _path_args(args, ignore=()):
+    """Yield the name, index and path for each argument that names a path.
+
+    The index is None unless the argument is a list of paths.
+
+    """
+    for name, value in sorted(vars(args).items()):
+        if name == 'main' or name in ignore:
+            continue
+        if isinstance(value, basestring):
+            values = [(None, value)]
+        elif isinstance(value, list):
+            values = [(index, item) for index, item in enumerate(value)
+                      if isinstance(item, basestring)]
+        else:
+            continue
+        for index, item in values:
+            if item and os.path.exists(item):
+                yield name, index, item
+
+
+def _hash_path(path):
+    """Return the hex SHA-1 of the contents of the file at path."""
+    if not os.path.isfile(path):
+        raise UncacheableError(u'{0} is not a regular file'.format(path))
+    digest = sha1()
+    with open(path, 'rb') as fff:
+        for chunk in iter(lambda: fff.read(2 ** 16), ''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def conversion_key(args, ignore=()):
+    """Return the cache key for the conversion the arguments describe.
+
+    Input files and the files named by path arguments are read to hash their
+    contents. Unseekable inputs are replaced in args with an in-memory copy
+    so the converter can still read them.
+
+    Raises UncacheableError if a path argument names something other than a
+    regular file, e.g. a directory.
+
+    """
+    key = sha1()
+    key.update(libcchdo.__version__)
+    key.update(args.main.__module__ + '.' + args.main.__name__)
+
+    for name, value in sorted(vars(args).items()):
+        if name == 'main' or name in ignore:
+            continue
+        if _is_file(value) or (
+                isinstance(value, list) and any(map(_is_file, value))):
+            continue
+        key.update(repr((name, value)))
+
+    for name, index, path in _path_args(args, ignore):
+        key.update(repr((name, index)))
+        key.update(_hash_path(path))
+
+    for name, index, handle in _file_args(args):
+        if _is_output(handle):
+            continue
+        data = handle.read()
+        try:
+            handle.seek(0)
+        except (AttributeError, IOError):
+            copy = pyStringIO(data)
+            copy.name = getattr(handle, 'name', None)
+            _set_arg(args, name, index, copy)
+        key.update(repr((name, index)))
+        key.update(sha1(data).hexdigest())
+    return key.hexdigest()
+
+
+class _Tee(object):
+    """Writes to a file and also keeps a copy."""
+
+    def __init__(self, handle):
+        self._handle = handle
+        self.copy = SpooledTemporaryFile(max_size=2 ** 23)
+
+    def write(self, data):
+        self._handle.write(data)
+        self.copy.write(data)
+
+    def writelines(self, lines):
+        for line in lines:
+            self.write(line)
+
+    def __getattr__(self, name):
+        return getattr(self._handle, name)
+
+
+def run_cached(cache, args, ignore=()):
+    """Run the converter in args.main through the cache.
+
+    Conversions that do not have exactly one output file are run without the
+    cache.
+
+    """
+    outputs = [(name, index, handle) for name, index, handle in
+               _file_args(args) if _is_output(handle)]
+    if len(outputs) != 1:
+        log.info(u'Not caching a conversion with {0} outputs'.format(
+            len(outputs)))
+        return args.main(args)
+    name, index, output = outputs[0]
+
+    try:
+        key = conversion_key(args, ignore)
+    except UncacheableError, err:
+        log.info(u'Not caching the conversion: {0}'.format(err))
+        return args.main(args)
+    path = cache.get(key)
+    if path:
+        log.info(u'Conversion cache hit {0}'.format(key))
+        with open(path, 'rb') as cached:
+            copyfileobj(cached, output)
+        if output is not sys.stdout:
+            output.close()
+        return 0
+
+    # Regular files are read back once written. Anything else is teed.
+    output_path = getattr(output, 'name', None)
+    if output is sys.stdout or not output_path or \
+            not os.path.isfile(output_path):
+        tee = _Tee(output)
+        _set_arg(args, name, index, tee)
+    else:
+        tee = None
+
+    status = args.main(args)
+    if status:
+        return status
+
+    if tee is None:
+        if not output.closed:
+            output.flush()
+        with open(output_path, 'rb') as written:
+            cache.put(key, written)
+    else:
+        tee.copy.seek(0)
+        cache.put(key, tee.copy)
+    return status
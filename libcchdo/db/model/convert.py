@@ -6,6 +6,7 @@ from logging import getLogger
 log = getLogger(__name__)
 
 
+from libcchdo import metrics
 from libcchdo.db.model import legacy, std
 
 
@@ -90,7 +91,11 @@ def convert_unit(session, name, mnemonic):
     return units
 
 
+_parameter_lookups = metrics.counter('parameters.lookups')
+
+
 def find_parameter(session, pname):
+    _parameter_lookups.inc()
     return session.query(std.Parameter).filter(
         std.Parameter.name == pname).first()
 
@@ -14,7 +14,7 @@ import sqlalchemy.ext.declarative
 from sqlalchemy.exc import OperationalError
 from sqlalchemy.sql.expression import exists
 
-from libcchdo import config, check_cache
+from libcchdo import config, check_cache, metrics
 from libcchdo.fns import _decimal
 from libcchdo.db import connect
 from legacy import session as LegacySession
@@ -531,7 +531,45 @@ def make_contrived_parameter(name, format=None, units=None, bound_lower=None,
         display_order=display_order)
 
 
+_parameter_lookups = metrics.counter('parameters.lookups')
+
+
+_parameters_by_name = {}
+
+
+def cache_parameters(std_session=None):
+    """Load every parameter and alias into the find_by_mnemonic cache.
+
+    The parameters are loaded with their units and aliases so that they stay
+    usable once std_session is closed.
+
+    """
+    std_session = std_session or session()
+    parameters = std_session.query(Parameter).options(
+        S.orm.joinedload(Parameter.units)).all()
+    for parameter in parameters:
+        _parameters_by_name[parameter.name] = parameter
+    for parameter in parameters:
+        for alias in parameter.aliases:
+            _parameters_by_name.setdefault(alias.name, parameter)
+
+
+def reconnect():
+    """Give a forked process its own connections to the parameter cache.
+
+    Connections inherited from the parent are left for the parent to use.
+
+    """
+    engine = connect.cchdo_data()
+    engine.pool = engine.pool.recreate()
+
+
 def find_by_mnemonic(name):
+    _parameter_lookups.inc()
+    try:
+        return _parameters_by_name[name]
+    except KeyError:
+        pass
     parameter = session().query(Parameter).\
         filter(Parameter.name == name).first()
     if not parameter:
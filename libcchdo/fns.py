@@ -4,9 +4,9 @@
 
 
 try:
-    from cdecimal import Decimal, getcontext, InvalidOperation
+    from cdecimal import Decimal, getcontext, InvalidOperation, ROUND_DOWN
 except ImportError:
-    from decimal import Decimal, getcontext, InvalidOperation
+    from decimal import Decimal, getcontext, InvalidOperation, ROUND_DOWN
 import math
 import os.path
 import sys
@@ -312,6 +312,85 @@ def sin(x):
             s += num / fact * sign
     return +s
 
+
+_MINUTES_PER_DEGREE = Decimal('60.0')
+
+
+def _hemisphere_coeff(hemisphere):
+    """Return the sign of a coordinate in the hemisphere (E, N, W or S)."""
+    if hemisphere == 'W' or hemisphere == 'S':
+        return -1
+    elif hemisphere == 'E' or hemisphere == 'N':
+        return 1
+    raise ValueError(('Expect E, W, N, or S in ctoks[2]'
+                     'instead got:%s'), hemisphere)
+
+
+def _ddm_precision(ctoks, precision=None):
+    """Return the precision ddm_to_dd converts ctoks with."""
+    if precision:
+        return precision + len(ctoks)
+    # guess based on h
+    if 'E' in ctoks[2] or 'W' in ctoks[2]:
+        return 4 + len(ctoks)
+    elif 'N' in ctoks[2] or 'S' in ctoks[2]:
+        return 3 + len(ctoks)
+    raise ValueError(('Expect E, W, N, or S in ctoks[2]'
+                     'instead got:%s'), ctoks[2])
+
+
+def _ddm_value(ctoks, coeff=_hemisphere_coeff):
+    """Return the signed degrees of [ddd, mm.mmm, h] in the current context."""
+    cord = int(ctoks[0]) + Decimal(ctoks[1]) / _MINUTES_PER_DEGREE
+    return cord * coeff(ctoks[2])
+
+
+def _convert_coordinates(convert, ctoks_list, places, rounding=None,
+                         failures=None):
+    """Convert each coordinate's tokens to signed decimal degrees.
+
+    A coordinate is converted by convert in places(ctoks) more decimal
+    precision and quantized to as many places. The precision is increased
+    once for all the coordinates with the same places and equal coordinates
+    are converted once. Coordinates that are not numbers are None. See
+    ddms_to_dds for failures.
+
+    """
+    results = [None] * len(ctoks_list)
+    groups = {}
+    for iii, ctoks in enumerate(ctoks_list):
+        try:
+            groups.setdefault(places(ctoks), []).append(iii)
+        except (ValueError, IndexError), err:
+            if failures is None:
+                raise
+            failures[iii] = err
+    for prec, indices in groups.items():
+        converted = {}
+        with IncreasedPrecision(prec):
+            quantum = Decimal(10) ** -prec
+            for iii in indices:
+                ctoks = ctoks_list[iii]
+                key = tuple(ctoks)
+                try:
+                    results[iii] = converted[key]
+                    continue
+                except KeyError:
+                    pass
+                try:
+                    cord = convert(ctoks)
+                except InvalidOperation:
+                    continue
+                except (ValueError, IndexError), err:
+                    if failures is None:
+                        raise
+                    failures[iii] = err
+                    continue
+                results[iii] = converted[key] = cord.quantize(
+                    quantum, rounding)
+    return results
+
+
 def ddm_to_dd(ctoks, precision=None):
     """Converts a coordinate in DDD MM.mmm format to signed DDD.DDDDD
     
@@ -327,26 +406,72 @@ def ddm_to_dd(ctoks, precision=None):
 
     Returns a Decimal corrdinate
     """
-    if precision:
-        precision = precision + len(ctoks)
-    else: # guess based on h
-        if 'E' in ctoks[2] or 'W' in ctoks[2]:
-            precision = 4 + len(ctoks)
-        elif 'N' in ctoks[2] or 'S' in ctoks[2]:
-            precision = 3 + len(ctoks)
-        else:
-            raise ValueError(('Expect E, W, N, or S in ctoks[2]'
-                             'instead got:%s'), ctoks[2])
-    with IncreasedPrecision(precision):
-        cord = int(ctoks[0]) + Decimal(ctoks[1]) / Decimal('60.0')
-        if ctoks[2] == 'W' or ctoks[2] == 'S':
-            cord *= -1
-        elif ctoks[2] == 'E' or ctoks[2] == 'N':
-            pass
-        else:
-            raise ValueError(('Expect E, W, N, or S in ctoks[2]'
-                             'instead got:%s'), ctoks[2])
-        return cord.quantize(Decimal(10) ** -precision)
+    return ddms_to_dds([ctoks], precision)[0]
+
+
+def ddms_to_dds(ctoks_list, precision=None, rounding=None, failures=None,
+                coeff=_hemisphere_coeff):
+    """Converts coordinates in DDD MM.mmm format to signed DDD.DDDDD
+
+    Each coordinate is converted as by ddm_to_dd. The precision is increased
+    once for all the coordinates that are converted with the same precision
+    and equal coordinates are converted once.
+
+    Arguments:
+    ctoks_list -- a sequence of ctoks as for ddm_to_dd
+    precision -- as for ddm_to_dd
+    rounding -- the Decimal rounding to quantize with, if none, the context's
+    failures -- if given, a dict that the indices of coordinates that raise
+                ValueError or IndexError are added to with the exception.
+                Their results are None. Otherwise the exception is raised.
+    coeff -- returns the sign of a coordinate from its hemisphere
+
+    Returns a list of Decimal coordinates. Coordinates with minutes that are
+    not a number are None.
+    """
+    def convert(ctoks):
+        return _ddm_value(ctoks, coeff)
+    def places(ctoks):
+        return _ddm_precision(ctoks, precision)
+    return _convert_coordinates(convert, ctoks_list, places, rounding,
+                                failures)
+
+
+def unsigned_dds_to_dds(ctoks_list, precision, failures=None,
+                        coeff=_hemisphere_coeff):
+    """Converts coordinates in DDD.DDDDD h format to signed DDD.DDDDD
+
+    Arguments:
+    ctoks_list -- a sequence of [ddd.ddddd, h] where h specifies the
+                  hemisphere (E, N, W, or S)
+    precision -- each coordinate is quantized to precision plus its number of
+                 tokens places
+    failures, coeff -- as for ddms_to_dds
+
+    Returns a list of Decimal coordinates. Coordinates that are not a number
+    are None.
+    """
+    def convert(ctoks):
+        return Decimal(ctoks[0]) * coeff(ctoks[1])
+    def places(ctoks):
+        return precision + len(ctoks)
+    return _convert_coordinates(convert, ctoks_list, places, None, failures)
+
+
+def graticules_to_dds(graticules, places):
+    """Converts graticules to signed DDD.DDDDD truncated to places.
+
+    Arguments:
+    graticules -- a sequence of (degrees, minutes, tenths of minutes,
+                  hemisphere)
+    places -- the number of decimal places to keep
+
+    Returns a list of Decimal coordinates
+    """
+    ctoks_list = [[int(degrees), '%d.%d' % (minutes, tenths), hemisphere]
+                  for degrees, minutes, tenths, hemisphere in graticules]
+    return _convert_coordinates(_ddm_value, ctoks_list, lambda ctoks: places,
+                                ROUND_DOWN)
 
 def create_expocode(nodc_ship_code, port_departure_date):
     """Generate an ExpoCode from an NODC ship code and port departure date.
@@ -123,9 +123,9 @@ def read(self, handle):
     vlo = len(self)
     vhi = vlo + dimensions
     for g, var in globals_to_vars.items():
-        self[g].values[vlo:vhi] = [var[1]] * dimensions
+        self[g].set_rows(vlo, vhi, [var[1]] * dimensions)
 
-    self['BTLNBR'].values[vlo:vhi] = bottle_numbers
+    self['BTLNBR'].set_rows(vlo, vhi, bottle_numbers)
 
     # First pass to create columns
     qc_vars = {}
@@ -141,12 +141,9 @@ def read(self, handle):
                 continue
 
             self.create_columns((name, ))
-            self[name].values[vlo:vhi] = variable[:].tolist()
-
             # Quick conversions to uniform data format
-            self[name].values[vlo:vhi] = map(
-                fns.in_band_or_none,
-                self[name].values[vlo:vhi])
+            self[name].set_rows(vlo, vhi, map(
+                fns.in_band_or_none, variable[:].tolist()))
 
     # Second pass to put in flags
     for name, variable in qc_vars.items():
@@ -161,7 +158,7 @@ def read(self, handle):
     nones = [None for i in range(vlo, vhi)]
     for c in self.columns.values():
         if len(c) < vhi:
-            c.values[vlo:vhi] = nones
+            c.set_rows(vlo, vhi, nones)
             if c.is_flagged_woce():
                 c.flags_woce[vlo:vhi] = nones
             if c.is_flagged_igoss():
@@ -0,0 +1,96 @@
+"""Columnar binary cache of parsed DataFiles and DataFileCollections.
+
+Re-reading text formats is slow. Writing a parsed file in this format and
+reading it back later is close to a straight copy of the column buffers.
+
+The layout is the packed form from libcchdo.model.packed: typed column
+buffers for values and flags with each Decimal's exponent so that the decimal
+places survive, followed by the globals (including stamp and header) and
+parameter references. Files on disk are memory mapped while they are
+decoded instead of being read into one string first. The columns read back
+are regular lists.
+
+"""
+import mmap
+from logging import getLogger
+
+
+log = getLogger(__name__)
+
+
+from libcchdo.model.datafile import DataFileCollection
+from libcchdo.model import packed
+from libcchdo.formats.formats import (
+    get_filename_fnameexts, is_filename_recognized_fnameexts)
+
+
+_fname_extensions = ['.cchdo.pack']
+
+
+def get_filename(basename):
+    """Return the filename for this format given a base filename.
+
+    This is a basic implementation using filename extensions.
+
+    """
+    return get_filename_fnameexts(basename, _fname_extensions)
+
+
+def is_filename_recognized(fname):
+    """Return whether the given filename is a match for this file format.
+
+    This is a basic implementation using filename extensions.
+
+    """
+    return is_filename_recognized_fnameexts(fname, _fname_extensions)
+
+
+def is_file_recognized(fileobj):
+    """Return whether the file starts with the packed form's magic."""
+    start = fileobj.tell()
+    try:
+        return fileobj.read(len(packed.MAGIC)) == packed.MAGIC
+    finally:
+        fileobj.seek(start)
+
+
+def container_type(fileobj):
+    """Return the class of the DataFile or collection cached in the file."""
+    start = fileobj.tell()
+    try:
+        return packed.load_type(fileobj)
+    finally:
+        fileobj.seek(start)
+
+
+def _read_mapped(handle):
+    """Return the packed contents of handle.
+
+    The file is decoded from a memory map of it if it has one.
+
+    """
+    try:
+        fileno = handle.fileno()
+    except (AttributeError, IOError):
+        return packed.loads(handle.read())
+    mapped = mmap.mmap(fileno, 0, access=mmap.ACCESS_READ)
+    try:
+        return packed.loads(mapped)
+    finally:
+        mapped.close()
+
+
+def read(self, handle):
+    """How to read a columnar cache file into a DataFile or collection."""
+    loaded = _read_mapped(handle)
+    if (isinstance(self, DataFileCollection) !=
+            isinstance(loaded, DataFileCollection)):
+        raise ValueError(
+            u'Cannot read a cached {0} into a {1}'.format(
+                type(loaded).__name__, type(self).__name__))
+    self.__dict__.update(loaded.__dict__)
+
+
+def write(self, handle):
+    """How to write a DataFile or collection to a columnar cache file."""
+    handle.write(packed.dumps(self))
@@ -110,8 +110,8 @@ def read(self, handle):
             elif name in ['DATE']:
                 # Translate string date YYYYMMDD to date object
                 string = str(self.columns[name].values[0])
-                self.columns[name].values[0] = '%s%s%s' % \
-                    (string[0:4], string[4:6], string[6:8])
+                self.columns[name].set(0, '%s%s%s' % \
+                    (string[0:4], string[4:6], string[6:8]))
             if name == 'CTDSAL':
                 self.columns[name].values = map(
                     lambda x: None if equal_with_epsilon(-9.99, x) \
@@ -6,7 +6,7 @@ from logging import getLogger
 log = getLogger(__name__)
 
 
-from libcchdo.fns import ddm_to_dd
+from libcchdo.fns import ddms_to_dds
 
 
 def read(self, handle, salt='first', temp='first'):
@@ -40,6 +40,7 @@ def read(self, handle, salt='first', temp='first'):
     temps = [] # for the multiple temps
     num_cols = 0 # to verify that each record has the expected number of params
     bad_flag = None
+    positions = {} # NMEA coordinate tokens by global
 
     # regex for various things
     re_units = re.compile('(?<=\[).*(?=\])')
@@ -77,16 +78,12 @@ def read(self, handle, salt='first', temp='first'):
         if 'NMEA' in l:
            s = l.split('=')
            if 'Latitude' in s[0]:
-               lat = s[1].split()
-               lat = ddm_to_dd(lat)
-               self.globals['LATITUDE'] = lat
+               positions['LATITUDE'] = s[1].split()
                l = handle.readline()
                continue
 
            elif 'Longitude' in s[0]:
-               lon = s[1].split()
-               lon = ddm_to_dd(lon)
-               self.globals['LONGITUDE'] = lon
+               positions['LONGITUDE'] = s[1].split()
                l = handle.readline()
                continue
            
@@ -138,6 +135,11 @@ def read(self, handle, salt='first', temp='first'):
 
 
         l = handle.readline()
+    # Both coordinates are converted at once
+    keys = positions.keys()
+    for key, value in zip(keys, ddms_to_dds([positions[k] for k in keys])):
+        self.globals[key] = value
+
     # Have yet to encounter a SBE file with bottom depth in it, JOA will crash
     # if the DEPTH is blank
     self.globals['DEPTH'] = '-999'
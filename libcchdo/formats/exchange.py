@@ -8,6 +8,7 @@ from logging import getLogger
 log = getLogger(__name__)
 
 
+from libcchdo import metrics
 from libcchdo.config import stamp as user_stamp
 from libcchdo.fns import Decimal, decimal_to_str, _decimal, out_of_band
 from libcchdo.db.model.std import session
@@ -27,6 +28,16 @@ FLAG_ENDING_IGOSS = '_FLAG_I'
 END_DATA = 'END_DATA'
 
 
+_rows_read = metrics.counter('exchange.rows_read')
+_values_read = metrics.counter('exchange.values_read')
+_fill_values_read = metrics.counter('exchange.fill_values_read')
+_bytes_read = metrics.counter('exchange.bytes_read')
+_rows_per_file_read = metrics.histogram('exchange.rows_per_file_read')
+_rows_written = metrics.counter('exchange.rows_written')
+_fill_values_written = metrics.counter('exchange.fill_values_written')
+_bytes_written = metrics.counter('exchange.bytes_written')
+
+
 r_idstamp = re_compile('(\w+)')
 r_stamp = re_compile('\d{8}\w+')
 
@@ -148,7 +159,13 @@ def _prepare_to_read_exchange_data(dfile, columns):
 
 
 def _read_data_row(dfile, row_i, info, raw):
+    """Append the value of raw to its column.
+
+    Returns whether raw is a fill value.
+
+    """
     raw_value = raw.strip()
+    fill = False
     col, param = info
     # tuple indicates flag column
     if type(param) is tuple:
@@ -162,6 +179,7 @@ def _read_data_row(dfile, row_i, info, raw):
     else:
         if out_of_band(raw_value):
             value = None
+            fill = True
         else:
             if param is None or param.format.endswith('s'):
                 value = raw_value
@@ -171,16 +189,21 @@ def _read_data_row(dfile, row_i, info, raw):
                 except:
                     value = raw_value
     col.append(value)
+    return fill
 
 
 def read_data(dfile, fileobj, columns):
     """Read Exchange data rows."""
     row_i = 0
+    fills = 0
+    nbytes = 0
     infos = _prepare_to_read_exchange_data(dfile, columns)
-    l = fileobj.readline().strip()
+    line = fileobj.readline()
+    l = line.strip()
     while l:
         if l.startswith(END_DATA):
             break
+        nbytes += len(line)
         values = l.split(',')
         
         # Check columns and values to match length
@@ -190,9 +213,16 @@ def read_data(dfile, fileobj, columns):
                 'columns and {2} values at data line {3}'.format(
                     fileobj.name, len(columns), len(values), len(dfile) + 1))
         for info, raw in zip(infos, values):
-            _read_data_row(dfile, row_i, info, raw)
-        l = fileobj.readline().strip()
+            if _read_data_row(dfile, row_i, info, raw):
+                fills += 1
+        line = fileobj.readline()
+        l = line.strip()
         row_i += 1
+    _rows_read.inc(row_i)
+    _values_read.inc(row_i * len(columns))
+    _fill_values_read.inc(fills)
+    _bytes_read.inc(nbytes)
+    _rows_per_file_read.observe(row_i)
 
 
 def get_flagged_format_parameter_values(dfile):
@@ -248,6 +278,8 @@ def get_flagged_format_parameter_values(dfile):
 
 def write_flagged_format_parameter_values(dfile, fileobj,
                                           flagged_format_parameter_values):
+    fills = 0
+    nbytes = 0
     for i in range(len(dfile)):
         values = []
         for format_str, limit, param, col in flagged_format_parameter_values:
@@ -259,6 +291,7 @@ def write_flagged_format_parameter_values(dfile, fileobj,
                 value = None
             if value is None:
                 value = format_str % FILL_VALUE
+                fills += 1
             try:
                 values.append(decimal_to_str(value).rjust(limit))
             except Exception, err:
@@ -266,7 +299,12 @@ def write_flagged_format_parameter_values(dfile, fileobj,
                     u'Could not format {0} (column {1} row {2:d}): {3}'.format(
                     value, param, i, err))
                 values.append(value)
-        fileobj.write(','.join(values) + '\n')
+        line = ','.join(values) + '\n'
+        nbytes += len(line)
+        fileobj.write(line)
+    _rows_written.inc(len(dfile))
+    _fill_values_written.inc(fills)
+    _bytes_written.inc(nbytes)
 
 
 def write_identifier(dfile, fileobj, ftype):
@@ -227,13 +227,16 @@ def guess_ftype_dftype_format(fileobj, file_type=None, file_name=None):
     from libcchdo.model.datafile import (
         DataFile, SummaryFile, DataFileCollection)
     file_type = guess_file_type_from_file(fileobj, file_type, file_name)
-    if 'zip' in file_type or file_type.startswith('archive'):
+    format_module = guess_format_module(fileobj, file_type)
+    if hasattr(format_module, 'container_type'):
+        # The format records what it holds.
+        dfile = format_module.container_type(fileobj)()
+    elif 'zip' in file_type or file_type.startswith('archive'):
         dfile = DataFileCollection()
     elif file_type.startswith('sum'):
         dfile = SummaryFile()
     else:
         dfile = DataFile()
-    format_module = guess_format_module(fileobj, file_type)
     return (file_type, dfile, format_module)
     
 
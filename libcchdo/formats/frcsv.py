@@ -12,7 +12,7 @@ log = getLogger(__name__)
 
 from libcchdo.fns import _decimal
 from libcchdo.formats.woce import (
-    fuse_datetime, woce_lat_to_dec_lat, woce_lng_to_dec_lng)
+    fuse_datetime, woce_lats_to_dec_lats, woce_lngs_to_dec_lngs)
 
 
 class FrCSVDialect(excel):
@@ -67,6 +67,26 @@ frflag_to_woce_flag = {
 FLAG_F = '_FLAG_F'
 
 
+def _position_tokens(value):
+    """Return the WOCE tokens of a hemisphere prefixed position."""
+    return value[1:].split() + [value[0]]
+
+
+def _read_positions(params, rows):
+    """Return the decimal positions of the rows by parameter index."""
+    positions = {}
+    for param, convert in (('LATITUDE', woce_lats_to_dec_lats),
+                           ('LONGITUDE', woce_lngs_to_dec_lngs)):
+        try:
+            parami = params.index(param)
+        except ValueError:
+            continue
+        rowis = [rowi for rowi, row in enumerate(rows) if parami < len(row)]
+        positions[parami] = dict(zip(rowis, convert(
+            [_position_tokens(rows[rowi][parami]) for rowi in rowis])))
+    return positions
+
+
 def read(dfile, fileobj, data_type=None):
     """Read a French CSV file.
 
@@ -123,14 +143,12 @@ def read(dfile, fileobj, data_type=None):
     # Read data. Flag columns follow immediately after data columns.
     flags = set()
     flag_values = {}
-    for rowi, row in enumerate(reader):
-        for param, value in zip(params, row):
-            if param == 'LATITUDE':
-                lattoks = value[1:].split() + [value[0]]
-                value = woce_lat_to_dec_lat(lattoks)
-            elif param == 'LONGITUDE':
-                lngtoks = value[1:].split() + [value[0]]
-                value = woce_lng_to_dec_lng(lngtoks)
+    rows = list(reader)
+    positions = _read_positions(params, rows)
+    for rowi, row in enumerate(rows):
+        for parami, (param, value) in enumerate(zip(params, row)):
+            if parami in positions:
+                value = positions[parami][rowi]
 
             if param.endswith(FLAG_F):
                 param = param[:-len(FLAG_F)]
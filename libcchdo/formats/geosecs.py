@@ -475,7 +475,7 @@ log = getLogger(__name__)
 
 from libcchdo import config
 from libcchdo.units import convert
-from libcchdo.fns import Decimal
+from libcchdo.fns import Decimal, graticules_to_dds
 from libcchdo.formats.formats import (
     get_filename_fnameexts, is_filename_recognized_fnameexts,
     is_file_recognized_fnameexts)
@@ -665,28 +665,18 @@ def _read_master_information_1(line):
             ("Master Record 1 is corrupt. Latitude hemisphere must be "
              "N or S."))
 
-    latitude = str(
-        (1 if raw['hemisphere_of_latitude'] == 'N' else -1) * \
-        (raw['degrees_latitude'] + 
-         raw['minutes_latitude'] / 60.0 + 
-         raw['minutes_latitude_tenths'] / 600.0))
-    latitude = latitude[:latitude.find('.') + \
-                         _MAX_GRATICULE_PRECISION + 1]
-    station['LATITUDE'] = Decimal(latitude)
+    station['_LATITUDE_GRATICULE'] = (
+        raw['degrees_latitude'], raw['minutes_latitude'],
+        raw['minutes_latitude_tenths'], raw['hemisphere_of_latitude'])
 
     if not raw['hemisphere_of_longitude'] in ('E', 'W'):
         raise ValueError(
             ("Master Record 1 is corrupt. Longitude hemisphere must be "
              "E or W."))
 
-    longitude = str(
-        (1 if raw['hemisphere_of_longitude'] == 'E' else -1) * \
-        (raw['degrees_longitude'] + 
-         raw['minutes_longitude'] / 60.0 + 
-         raw['minutes_longitude_tenths'] / 600.0))
-    longitude = longitude[:longitude.find('.') + \
-                           _MAX_GRATICULE_PRECISION + 1]
-    station['LONGITUDE'] = Decimal(longitude)
+    station['_LONGITUDE_GRATICULE'] = (
+        raw['degrees_longitude'], raw['minutes_longitude'],
+        raw['minutes_longitude_tenths'], raw['hemisphere_of_longitude'])
 
     station['_DATETIME'] = datetime.datetime(
         *(1900 + raw['year_gmt'], raw['month_of_year_gmt'],
@@ -1184,6 +1174,16 @@ def read(self, handle):
         log.warning('unknown GEOSECS expocode')
         expocode = 'UNKNOWN'
 
+    latitudes = graticules_to_dds(
+        [station.pop('_LATITUDE_GRATICULE') for station in stations],
+        _MAX_GRATICULE_PRECISION)
+    longitudes = graticules_to_dds(
+        [station.pop('_LONGITUDE_GRATICULE') for station in stations],
+        _MAX_GRATICULE_PRECISION)
+    for station, latitude, longitude in zip(stations, latitudes, longitudes):
+        station['LATITUDE'] = latitude
+        station['LONGITUDE'] = longitude
+
     def combine_measures(values, qcs):
         """ Combine measurements from multiple institutions of the same parameter
 
@@ -173,7 +173,7 @@ http://www.nodc.noaa.gov/General/NODC-Archive/numcode.txt
 from datetime import datetime
 from collections import defaultdict
 
-from libcchdo.fns import Decimal, int_or_none
+from libcchdo.fns import Decimal, int_or_none, graticules_to_dds
 from libcchdo.formats.formats import (
     get_filename_fnameexts, is_filename_recognized_fnameexts,
     is_file_recognized_fnameexts)
@@ -240,6 +240,8 @@ def read(self, handle):
 
     current_station = None
     current_cast = 1
+    stations = []
+    row_stations = []
 
     while handle:
         line = handle.readline()
@@ -323,28 +325,22 @@ def read(self, handle):
                     ("Master Record 1 is corrupt. Latitude hemisphere must be "
                      "N or S."))
 
-            latitude = str(
-                (1 if raw_line['hemisphere_of_latitude'] == 'N' else -1) * \
-                (raw_line['degrees_latitude'] + 
-                 raw_line['minutes_latitude'] / 60.0 + 
-                 raw_line['minutes_latitude_tenths'] / 600.0))
-            latitude = latitude[:latitude.find('.') + \
-                                 _MAX_GRATICULE_PRECISION + 1]
-            station['LATITUDE'] = Decimal(latitude)
+            station['_LATITUDE_GRATICULE'] = (
+                raw_line['degrees_latitude'],
+                raw_line['minutes_latitude'],
+                raw_line['minutes_latitude_tenths'],
+                raw_line['hemisphere_of_latitude'])
 
             if not raw_line['hemisphere_of_longitude'] in ('E', 'W'):
                 raise ValueError(
                     ("Master Record 1 is corrupt. Longitude hemisphere must be "
                      "E or W."))
 
-            longitude = str(
-                (1 if raw_line['hemisphere_of_longitude'] == 'E' else -1) * \
-                (raw_line['degrees_longitude'] + 
-                 raw_line['minutes_longitude'] / 60.0 + 
-                 raw_line['minutes_longitude_tenths'] / 600.0))
-            longitude = longitude[:longitude.find('.') + \
-                                   _MAX_GRATICULE_PRECISION + 1]
-            station['LONGITUDE'] = Decimal(longitude)
+            station['_LONGITUDE_GRATICULE'] = (
+                raw_line['degrees_longitude'],
+                raw_line['minutes_longitude'],
+                raw_line['minutes_longitude_tenths'],
+                raw_line['hemisphere_of_longitude'])
 
             hours = int(raw_line['station_time_gmt_hours_to_tenths'][:2])
             minutes = int(raw_line['station_time_gmt_hours_to_tenths'][2]) * 6
@@ -359,6 +355,7 @@ def read(self, handle):
                 station['BOTTOM'] = None
 
             current_station = station
+            stations.append(station)
         elif line[79] == '2':
             raw_line = {
                 'depth_difference': line[0:4],
@@ -506,8 +503,6 @@ def read(self, handle):
                 merged_row = {
                     'EXPOCODE': current_station['EXPOCODE'],
                     'STNNBR': current_station['STNNBR'],
-                    'LATITUDE': current_station['LATITUDE'],
-                    'LONGITUDE': current_station['LONGITUDE'],
                     '_DATETIME': current_station['_DATETIME'],
                     'BOTTOM': current_station['BOTTOM'],
                     'CASTNO': sample['CASTNO'],
@@ -535,8 +530,7 @@ def read(self, handle):
                 self['EXPOCODE'].set(i, merged_row['EXPOCODE'])
                 self['STNNBR'].set(i, merged_row['STNNBR'])
                 self['CASTNO'].set(i, merged_row['CASTNO'])
-                self['LATITUDE'].set(i, merged_row['LATITUDE'])
-                self['LONGITUDE'].set(i, merged_row['LONGITUDE'])
+                row_stations.append(len(stations) - 1)
                 self['_DATETIME'].set(i, merged_row['_DATETIME'])
                 self['BOTTOM'].set(i, merged_row['BOTTOM'])
                 self['DEPTH'].set(i, merged_row['DEPTH'], merged_row['DEPTH_FLAG_W'])
@@ -552,6 +546,15 @@ def read(self, handle):
                 # CTD
                 raise NotImplementedError("Can't read SD2 CTDs yet")
 
+    latitudes = graticules_to_dds(
+        [station['_LATITUDE_GRATICULE'] for station in stations],
+        _MAX_GRATICULE_PRECISION)
+    longitudes = graticules_to_dds(
+        [station['_LONGITUDE_GRATICULE'] for station in stations],
+        _MAX_GRATICULE_PRECISION)
+    self['LATITUDE'].values = [latitudes[iii] for iii in row_stations]
+    self['LONGITUDE'].values = [longitudes[iii] for iii in row_stations]
+
     for key, column in self.columns.items():
         if len(filter(None, column.values)) == 0 and \
            len(filter(None, column.flags_woce)) == 0 and \
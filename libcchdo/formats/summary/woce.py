@@ -1,5 +1,6 @@
 import re
 from datetime import datetime
+from itertools import izip
 from logging import getLogger
 
 
@@ -94,12 +95,102 @@ def identity_or_none(x):
     return x if x else None
 
 
+def _read_date(token):
+    try:
+        return datetime.strptime(token, '%m%d%y').strftime('%Y%m%d')
+    except ValueError, e:
+        log.error(u'Expected date format %m%d%y. Got {0!r}.'.format(token))
+        return None
+
+
+def _read_positions(tokens, convert, convert_dec):
+    """Convert the position tokens of a column.
+
+    Positions that are not in degrees and minutes are converted as decimal
+    degrees. Blank positions are None.
+
+    """
+    positions = [token.split() for token in tokens]
+    failures = {}
+    values = convert(positions, failures)
+    decimals = sorted(
+        iii for iii, err in failures.items() if isinstance(err, ValueError))
+    for iii, value in izip(
+            decimals, convert_dec([positions[iii] for iii in decimals])):
+        values[iii] = value
+    return values
+
+
+def _map_distinct(func, tokens):
+    """Return func of each token, calling it once for each distinct token."""
+    results = {}
+    for token in set(tokens):
+        results[token] = func(token)
+    return map(results.__getitem__, tokens)
+
+
+# Columns after the position that may not be present, with their converter
+_OPTIONAL_COLUMNS = [
+    (10, '_NAV', None),
+    (11, 'DEPTH', int_or_none),
+    (12, '_ABOVE_BOTTOM', int_or_none),
+    (13, '_WIRE_OUT', int_or_none),
+    (14, '_MAX_PRESSURE', int_or_none),
+    (15, '_NUM_BOTTLES', int_or_none),
+    (16, '_PARAMETERS', identity_or_none),
+    (17, '_COMMENTS', identity_or_none),
+]
+
+
+def _build_columns(self, rows):
+    """Fill the file's columns from the token rows, a column at a time."""
+    if not rows:
+        return
+    columns = zip(*rows)
+    self['EXPOCODE'].values = [
+        token.replace('/', '_') for token in columns[0]]
+    self['SECT_ID'].values = list(columns[1])
+    self['STNNBR'].values = list(columns[2])
+    self['CASTNO'].values = _map_distinct(int_or_none, columns[3])
+    self['_CAST_TYPE'].values = list(columns[4])
+    self['DATE'].values = _map_distinct(_read_date, columns[5])
+    self['TIME'].values = _map_distinct(int_or_none, columns[6])
+    self['_CODE'].values = list(columns[7])
+    nrows = len(rows)
+    if len(columns) > 8:
+        self['LATITUDE'].values = _read_positions(
+            columns[8], woce.woce_lats_to_dec_lats,
+            woce.woce_dec_lats_to_dec_lats)
+    else:
+        self['LATITUDE'].values = [None] * nrows
+    if len(columns) > 9:
+        self['LONGITUDE'].values = _read_positions(
+            columns[9], woce.woce_lngs_to_dec_lngs,
+            woce.woce_dec_lngs_to_dec_lngs)
+    else:
+        self['LONGITUDE'].values = [None] * nrows
+    for iii, key, convert in _OPTIONAL_COLUMNS:
+        if len(columns) <= iii:
+            break
+        if convert:
+            self[key].values = map(convert, columns[iii])
+        else:
+            self[key].values = list(columns[iii])
+
+
 def read(self, handle):
-    '''How to read a Summary file for WOCE.'''
+    '''How to read a Summary file for WOCE.
+
+    The column boundaries in the header are compiled into slices that cut
+    every data line. The columns are then converted a column at a time.
+
+    '''
     header = True
     header_delimiter = re.compile('^-+$')
     column_starts = []
     column_widths = []
+    slices = None
+    rows = []
     for i, line in enumerate(handle):
         if header:
             if header_delimiter.match(line):
@@ -114,58 +205,20 @@ def read(self, handle):
                     else:
                         column_starts.append(start)
                     column_widths.append(stop.end()-start)
+                slices = [slice(s, s + w)
+                          for s, w in zip(column_starts, column_widths)]
             else:
                 self.globals['header'] += line
         else:
             if not line.strip():
                 log.warn(u'Illegal empty line in summary file, row {0}'.format(i))
                 continue
-            tokens = []
-            for s, w in zip(column_starts, column_widths):
-                tokens.append(line[:-1][s:s+w].strip())
-            if len(tokens) is 0:
+            if not slices:
                 continue
-            self['EXPOCODE'].append(tokens[0].replace('/', '_'))
-            self['SECT_ID'].append(tokens[1])
-            self['STNNBR'].append(tokens[2])
-            self['CASTNO'].append(int_or_none(tokens[3]))
-            self['_CAST_TYPE'].append(tokens[4])
-            try:
-                date = datetime.strptime(tokens[5], '%m%d%y')
-                date = date.strftime('%Y%m%d')
-            except ValueError, e:
-                log.error(u'Expected date format %m%d%y. Got {0!r}.'.format(
-                    tokens[5]))
-                date = None
-            self['DATE'].append(date)
-            self['TIME'].append(int_or_none(tokens[6]))
-            self['_CODE'].append(tokens[7])
-            try:
-                lat = woce.woce_lat_to_dec_lat(tokens[8].split())
-            except ValueError:
-                lat = woce.woce_dec_lat_to_dec_lat(tokens[8].split())
-            except IndexError:
-                lat = None
-            self['LATITUDE'].append(lat)
-            try:
-                lng = woce.woce_lng_to_dec_lng(tokens[9].split())
-            except ValueError:
-                lng = woce.woce_dec_lng_to_dec_lng(tokens[9].split())
-            except IndexError:
-                lng = None
-            self['LONGITUDE'].append(lng)
-            try:
-                self['_NAV'].append(tokens[10])
-                self['DEPTH'].append(int_or_none(tokens[11]))
-                self['_ABOVE_BOTTOM'].append(int_or_none(tokens[12]))
-                self['_WIRE_OUT'].append(int_or_none(tokens[13]))
-                self['_MAX_PRESSURE'].append(int_or_none(tokens[14]))
-                self['_NUM_BOTTLES'].append(int_or_none(tokens[15]))
-                self['_PARAMETERS'].append(identity_or_none(tokens[16]))
-                self['_COMMENTS'].append(identity_or_none(tokens[17]))
-            except IndexError:
-                pass
+            line = line[:-1]
+            rows.append([line[sl].strip() for sl in slices])
 
+    _build_columns(self, rows)
     woce.fuse_datetime(self)
     self.check_and_replace_parameters()
 
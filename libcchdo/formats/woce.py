@@ -1,5 +1,6 @@
 from datetime import datetime, date
 from collections import OrderedDict
+from itertools import izip
 import re
 import struct
 import os.path
@@ -10,11 +11,13 @@ from logging import getLogger
 log = getLogger(__name__)
 
 
+from libcchdo import metrics
 from libcchdo.util import get_library_abspath
+from libcchdo.timings import timed
 from libcchdo.model.datafile import Column
 from libcchdo.fns import (
     Decimal, InvalidOperation, _decimal, in_band_or_none, IncreasedPrecision,
-    strip_all, uniquify)
+    strip_all, uniquify, ddms_to_dds, unsigned_dds_to_dds)
 
 
 # Where no data is known
@@ -100,52 +103,66 @@ def hemisphere_to_coeff(hemisphere):
     return -1
 
 
+def woce_dec_lats_to_dec_lats(lattoks, failures=None):
+    """Convert latitudes in decimal + hemisphere to decimal.
+
+    Each latitude is converted as by woce_dec_lat_to_dec_lat. See
+    fns.ddms_to_dds for failures.
+
+    """
+    return unsigned_dds_to_dds(lattoks, 3, failures, hemisphere_to_coeff)
+
+
+def woce_dec_lngs_to_dec_lngs(lngtoks, failures=None):
+    """Convert longitudes in decimal + hemisphere to decimal.
+
+    Each longitude is converted as by woce_dec_lng_to_dec_lng. See
+    fns.ddms_to_dds for failures.
+
+    """
+    return unsigned_dds_to_dds(lngtoks, 3, failures, hemisphere_to_coeff)
+
+
+def woce_lats_to_dec_lats(lattoks, failures=None):
+    """Convert latitudes in WOCE format to decimal.
+
+    Each latitude is converted as by woce_lat_to_dec_lat. See
+    fns.ddms_to_dds for failures.
+
+    """
+    return ddms_to_dds(lattoks, 3, failures=failures,
+                       coeff=hemisphere_to_coeff)
+
+
+def woce_lngs_to_dec_lngs(lngtoks, failures=None):
+    """Convert longitudes in WOCE format to decimal.
+
+    Each longitude is converted as by woce_lng_to_dec_lng. See
+    fns.ddms_to_dds for failures.
+
+    """
+    return ddms_to_dds(lngtoks, 4, failures=failures,
+                       coeff=hemisphere_to_coeff)
+
+
 def woce_dec_lat_to_dec_lat(lattoks):
     """Convert a latitude in decimal + hemisphere to decimal."""
-    precision = 3 + len(lattoks)
-    with IncreasedPrecision(precision):
-        try:
-            lat = Decimal(lattoks[0])
-        except InvalidOperation:
-            return None
-        lat *= hemisphere_to_coeff(lattoks[1])
-        return lat.quantize(Decimal(10) ** -precision)
+    return woce_dec_lats_to_dec_lats([lattoks])[0]
 
 
 def woce_dec_lng_to_dec_lng(lngtoks):
     """Convert a longitude in decimal + hemisphere to decimal."""
-    precision = 3 + len(lngtoks)
-    with IncreasedPrecision(precision):
-        try:
-            lng = Decimal(lngtoks[0])
-        except InvalidOperation:
-            return None
-        lng *= hemisphere_to_coeff(lngtoks[1])
-        return lng.quantize(Decimal(10) ** -precision)
+    return woce_dec_lngs_to_dec_lngs([lngtoks])[0]
 
 
 def woce_lat_to_dec_lat(lattoks):
     '''Convert a latitude in WOCE format to decimal.'''
-    precision = 3 + len(lattoks)
-    with IncreasedPrecision(precision):
-        try:
-            lat = int(lattoks[0]) + Decimal(lattoks[1]) / Decimal('60.0')
-        except InvalidOperation:
-            return None
-        lat *= hemisphere_to_coeff(lattoks[2])
-        return lat.quantize(Decimal(10) ** -precision)
+    return woce_lats_to_dec_lats([lattoks])[0]
 
 
 def woce_lng_to_dec_lng(lngtoks):
     '''Convert a longitude in WOCE format to decimal.'''
-    precision = 4 + len(lngtoks)
-    with IncreasedPrecision(precision):
-        try:
-            lng = int(lngtoks[0]) + Decimal(lngtoks[1]) / Decimal('60.0')
-        except InvalidOperation:
-            return None
-        lng *= hemisphere_to_coeff(lngtoks[2])
-        return lng.quantize(Decimal(10) ** -precision)
+    return woce_lngs_to_dec_lngs([lngtoks])[0]
 
 
 def dec_lat_to_woce_lat(lat):
@@ -361,50 +378,104 @@ def read_data_egee(self, handle, parameters_line, units_line, asterisk_line):
     # For data, include the QUALT flags in the edges
     edges.append(len(asterisk_line))
 
-    for iii, line in enumerate(handle):
+    rows = []
+    for line in handle:
         line = line.rstrip()
         if not line:
             raise ValueError('Empty lines are not allowed in the data section '
                              'of a WOCE file')
+        rows.append(split_on_edges(line, edges))
+    _build_columns(self, rows, num_quality_words, parameters, asterisks)
 
-        unpacked = split_on_edges(line, edges)
-        _build_columns_for_row(
-            self, iii, unpacked, num_quality_words, parameters, asterisks)
 
+def _convert_value(datum, parameter):
+    """Return the value of a stripped WOCE datum or None for fill values."""
+    try:
+        # Only data near the fill value need the exact out of band check.
+        near_fill = not abs(float(datum) - FILL_VALUE) > 0.2
+    except ValueError:
+        near_fill = False
+    if near_fill:
+        datum = in_band_or_none(datum, FILL_VALUE)
+    if datum is None or parameter in CHARACTER_PARAMETERS:
+        return datum
+    try:
+        return _decimal(datum)
+    except Exception:
+        log.warning(
+            u'Expected numeric data for parameter %r, got %r' % (
+            parameter, datum))
+        return datum
 
-def _build_columns_for_row(self, iii, row, num_quality_words, parameters,
-                           asterisks):
-    # QUALT1 takes precedence
-    quality_flags = row[-num_quality_words:]
 
-    # Build up the columns for the line
-    flag_i = 0
-    for j, parameter in enumerate(parameters):
-        datum = row[j].strip()
-        datum = in_band_or_none(datum, -9)
+def _convert_data_column(data, parameter):
+    """Return the values of a column of data.
+
+    Each distinct datum is converted once and its value shared by the rows
+    that have it, so fill values and repeated values cost a lookup.
 
-        if parameter not in CHARACTER_PARAMETERS:
+    """
+    converted = {}
+    values = []
+    append = values.append
+    for datum in data:
+        try:
+            append(converted[datum])
+        except KeyError:
+            value = converted[datum] = _convert_value(datum.strip(), parameter)
+            append(value)
+    return values
+
+
+_FLAG_VALUES = dict((str(flag), flag) for flag in range(10))
+
+
+def _convert_flag_column(quality_words, flag_i, parameter):
+    """Return the flags at flag_i in the quality words."""
+    try:
+        return [_FLAG_VALUES[word[flag_i]] for word in quality_words]
+    except KeyError:
+        for iii, word in enumerate(quality_words):
             try:
-                datum = _decimal(datum)
-            except Exception, e:
-                log.warning(
-                    u'Expected numeric data for parameter %r, got %r' % (
-                    parameter, datum))
+                int(word[flag_i])
+            except ValueError:
+                log.error(
+                    u'Received bad flag "{}" for {} on record {}'.format(
+                    word[flag_i], parameter, iii))
+                raise
+
+
+def _build_columns(self, rows, num_quality_words, parameters, asterisks):
+    """Fill the parameters' columns from the rows of a data section.
 
+    Rows are transposed and each column is converted at once.
+
+    """
+    if not rows:
+        return
+    data = zip(*rows)
+    # QUALT1 takes precedence
+    quality_words = data[-num_quality_words]
+
+    flag_i = 0
+    for j, parameter in enumerate(parameters):
+        column = self[parameter]
         # Only assign flag if column is flagged.
         if "**" in asterisks[j].strip():
             # TODO should use better detection for asterisks
-            try:
-                woce_flag = int(quality_flags[0][flag_i])
-            except ValueError, e:
-                log.error(
-                    u'Received bad flag "{}" for {} on record {}'.format(
-                    quality_flags[0][flag_i], parameter, iii))
-                raise e
+            column.flags_woce = _convert_flag_column(
+                quality_words, flag_i, parameter)
             flag_i += 1
-            self[parameter].set(iii, datum, woce_flag)
-        else:
-            self[parameter].set(iii, datum)
+        column.values = _convert_data_column(data[j], parameter)
+
+
+_rows_read = metrics.counter('woce.rows_read')
+_values_read = metrics.counter('woce.values_read')
+_bytes_read = metrics.counter('woce.bytes_read')
+_rows_per_file_read = metrics.histogram('woce.rows_per_file_read')
+_rows_written = metrics.counter('woce.rows_written')
+_fill_values_written = metrics.counter('woce.fill_values_written')
+_bytes_written = metrics.counter('woce.bytes_written')
 
 
 def read_data(self, handle, parameters_line, units_line, asterisk_line):
@@ -494,21 +565,31 @@ def read_data(self, handle, parameters_line, units_line, asterisk_line):
     handle.seek(savepoint)
     log.debug(u'Settled on unpack format: {0!r}'.format(unpack_str))
 
+    unpack = struct.Struct(unpack_str).unpack
+    rows = []
+    nbytes = 0
     for iii, line in enumerate(handle):
-        line = _remove_char_columns(bad_cols, line.rstrip())[0]
+        nbytes += len(line)
+        line = line.rstrip()
+        if bad_cols:
+            line = _remove_char_columns(bad_cols, line)[0]
         if not line:
             raise ValueError('Empty lines are not allowed in the data section '
                              'of a WOCE file')
         try:
-            unpacked = struct.unpack(unpack_str, line)
+            rows.append(unpack(line))
         except struct.error, e:
             expected_len = struct.calcsize(unpack_str)
             log.warn('Data record %d has length %d (expected %d).' % (
                 iii, len(line), expected_len))
             raise e
 
-        _build_columns_for_row(
-            self, iii, unpacked, num_quality_words, parameters, asterisks)
+    _build_columns(self, rows, num_quality_words, parameters, asterisks)
+    nrows = len(rows)
+    _rows_read.inc(nrows)
+    _values_read.inc(nrows * len(parameters))
+    _bytes_read.inc(nbytes)
+    _rows_per_file_read.observe(nrows)
 
     # Expand globals into columns TODO?
 
@@ -631,13 +712,77 @@ def truncate_row(lll):
     return truncated
 
 
-def write_data(self, handle, columns, base_format):
+def _format_data_column(column, nrows):
+    """Return the column's first nrows values formatted for WOCE.
+
+    Values that are missing or false are written as the fill value. Values
+    that do not fit the column width are truncated; the invalid formats and
+    truncations are warned about once for the whole column.
+
+    Returns:
+        (formatted values, number of fill values)
+
+    """
+    format = column.parameter.format
+    values = column.values
+    if len(values) < nrows:
+        values = list(values) + [None] * (nrows - len(values))
+    elif len(values) > nrows:
+        values = values[:nrows]
+
+    formatted = []
+    append = formatted.append
+    fill = None
+    fills = 0
+    invalid = []
+    truncated = []
+    for iii, value in enumerate(values):
+        try:
+            if value:
+                formatted_value = format % value
+            else:
+                if fill is None:
+                    fill = format % FILL_VALUE
+                formatted_value = fill
+                fills += 1
+        except TypeError:
+            formatted_value = value
+            invalid.append(value)
+
+        if len(formatted_value) > COLUMN_WIDTH:
+            extra = len(formatted_value) - COLUMN_WIDTH
+            if len(formatted_value[:extra].strip()) == 0:
+                formatted_value = formatted_value[extra:]
+            else:
+                truncated.append((iii, formatted_value))
+                formatted_value = formatted_value[:-extra]
+        append(formatted_value)
+
+    if invalid:
+        log.warn(u'Invalid WOCE format for {0} to {1!r} in {2} rows. '
+                 'Treating as string.'.format(
+                 column.parameter, invalid[0], len(invalid)))
+    if truncated:
+        iii, old_value = truncated[0]
+        log.warn(u'Truncated {0} values of {1} to {2} characters, e.g. {3!r} '
+                 'to {4} in row {5}'.format(
+                 len(truncated), column.parameter.name, COLUMN_WIDTH,
+                 old_value, formatted[iii], iii))
+    return formatted, fills
+
+
+def write_data(self, handle, columns=None, base_format=None):
     """Write WOCE data in fixed width columns.
 
     columns and base_format should be obtained from 
-    columns_and_base_format()
+    columns_and_base_format(). They default to the file's.
+
+    Each column is formatted at once and the lines are written together.
 
     """
+    if columns is None or base_format is None:
+        columns, base_format = columns_and_base_format(self)
+
     def parameter_name_of (column, ):
         return column.parameter.mnemonic_woce()
 
@@ -662,40 +807,32 @@ def write_data(self, handle, columns, base_format):
     handle.write(base_format.format(*truncate_row(all_units)))
     handle.write(base_format.format(*truncate_row(all_asters)))
 
-    for i in range(len(self)):
-        values = []
-        flags = []
-        for column in columns:
-            format = column.parameter.format
-            try:
-                if column[i]:
-                    formatted_value = format % column[i]
-                else:
-                    formatted_value = format % FILL_VALUE
-            except TypeError:
-                formatted_value = column[i]
-                log.warn(u'Invalid WOCE format for {0} to {1!r}. '
-                    'Treating as string.'.format(
-                    column.parameter, formatted_value))
-
-            if len(formatted_value) > COLUMN_WIDTH:
-                extra = len(formatted_value) - COLUMN_WIDTH
-                leading_extra = formatted_value[:extra]
-                if len(leading_extra.strip()) == 0:
-                    formatted_value = formatted_value[extra:]
-                else:
-                    old_value = formatted_value
-                    formatted_value = formatted_value[:-extra]
-                    log.warn(u'Truncated {0!r} to {1} for {2} '
-                             'row {3}'.format(old_value, formatted_value,
-                                              column.parameter.name, i))
-
-            values.append(formatted_value)
-            if column.is_flagged_woce():
-                flags.append(str(column.flags_woce[i]))
+    nrows = len(self)
+    fills = 0
+    data_columns = []
+    flag_columns = []
+    for column in columns:
+        formatted, column_fills = _format_data_column(column, nrows)
+        data_columns.append(formatted)
+        fills += column_fills
+        if column.is_flagged_woce():
+            flags = column.flags_woce
+            if len(flags) < nrows:
+                raise IndexError(
+                    u'{0} has {1} flags for {2} rows'.format(
+                    column.parameter.name, len(flags), nrows))
+            flag_columns.append(map(str, flags[:nrows]))
+    if flag_columns:
+        data_columns.append(map(''.join, izip(*flag_columns)))
+    else:
+        data_columns.append([''] * nrows)
 
-        values.append("".join(flags))
-        handle.write(base_format.format(*values))
+    format = base_format.format
+    data = ''.join([format(*row) for row in izip(*data_columns)])
+    handle.write(data)
+    _rows_written.inc(nrows)
+    _fill_values_written.inc(fills)
+    _bytes_written.inc(len(data))
 
 
 def fuse_datetime_globals(file):
@@ -732,6 +869,8 @@ def fuse_datetime_columns(file):
         3. DATE does not exist but TIME does
             None is inserted because date is required.
 
+        Each distinct DATE and TIME pair is parsed once.
+
         Arg:
             file - a DataFile object
     """
@@ -745,14 +884,26 @@ def fuse_datetime_columns(file):
         times = file['TIME'].values
     except KeyError:
         log.warn(u'No TIME column is present.')
+        times = [None] * len(dates)
+
+    parsed = {}
+    datetimes = []
+    append = datetimes.append
+    for date_time in izip(dates, times):
+        try:
+            append(parsed[date_time])
+        except KeyError:
+            dtime = parsed[date_time] = strptime_woce_date_time(*date_time)
+            append(dtime)
 
     file['_DATETIME'] = Column('_DATETIME')
-    file['_DATETIME'].values = [strptime_woce_date_time(*x) for x in zip(
-        dates, times)]
+    file['_DATETIME'].values = datetimes
     del file['DATE']
-    del file['TIME']
+    if 'TIME' in file:
+        del file['TIME']
 
 
+@timed('fuse_datetime')
 def fuse_datetime(file):
     try:
         fuse_datetime_globals(file)
@@ -791,26 +942,43 @@ def split_datetime_columns(file):
         If there are absolutely no TIMEs in the file the TIME column is not
         kept.
 
+        Each distinct _DATETIME is formatted once.
+
         Arg:
             file - a DataFile object
     """
     dtimecol = file['_DATETIME']
-    date = file['DATE'] = Column('DATE')
-    time = file['TIME'] = Column('TIME')
+    formatted = {}
+    dates = []
+    times = []
     for dtime in dtimecol.values:
         if dtime:
-            date.append(strftime_woce_date(dtime))
-            if type(dtime) is datetime:
-                time.append(strftime_woce_time(dtime))
+            try:
+                sdate, stime = formatted[dtime]
+            except KeyError:
+                sdate = strftime_woce_date(dtime)
+                if type(dtime) is datetime:
+                    stime = strftime_woce_time(dtime)
+                else:
+                    stime = None
+                formatted[dtime] = (sdate, stime)
+            dates.append(sdate)
+            if stime is not None:
+                times.append(stime)
         else:
-            date.append(None)
-            time.append(None)
+            dates.append(None)
+            times.append(None)
+    file['DATE'] = Column('DATE')
+    file['DATE'].values = dates
+    file['TIME'] = Column('TIME')
+    file['TIME'].values = times
     del file['_DATETIME']
 
     if not any(file['TIME'].values):
     	file['TIME'].values = [UNKNONW_TIME_FILL] * len(file['TIME'])
 
 
+@timed('split_datetime')
 def split_datetime(file):
     try:
         split_datetime_globals(file)
@@ -825,6 +993,18 @@ _MSG_NO_STN_CAST_PAIR = (u'The station cast pair ({}, {}) was not found in '
                          'the summary file.')
 
 
+_COMBINED_COLUMNS = [
+    'EXPOCODE', 'SECT_ID', '_DATETIME', 'LATITUDE', 'LONGITUDE', 'DEPTH']
+
+
+def _summary_row(sum_file, station, cast):
+    try:
+        return sum_file.index(station, cast)
+    except ValueError, e:
+        log.error(_MSG_NO_STN_CAST_PAIR.format(station, cast))
+        raise e
+
+
 def combine(woce_file, sum_file):
     """Combines the given WOCE file with the Summary WOCE file.
 
@@ -834,54 +1014,32 @@ def combine(woce_file, sum_file):
     The resulting DataFile contains most of the information from both files.
 
     """
-    headers = sum_file.get_property_for_columns(lambda c: c.parameter.name)
+    summary_columns = dict(
+        (column.parameter.name, column)
+        for column in sum_file.sorted_columns())
 
     if woce_file.globals.get('STNNBR', None) is not None:
         # This is probably a CTD file.
-        station = woce_file.globals.get('STNNBR')
-        cast = woce_file.globals.get('CASTNO')
-        try:
-            sum_file_index = sum_file.index(station, cast)
-        except ValueError, e:
-            log.error(_MSG_NO_STN_CAST_PAIR.format(station, cast))
-            raise e
-        values = sum_file.get_property_for_columns(lambda c: c[sum_file_index])
-
-        info = dict(zip(headers, values))
-        woce_file.globals['EXPOCODE'] = info['EXPOCODE']
-        woce_file.globals['SECT_ID'] = info['SECT_ID']
-        woce_file.globals['_DATETIME'] = info['_DATETIME']
-        woce_file.globals['LATITUDE'] = info['LATITUDE']
-        woce_file.globals['LONGITUDE'] = info['LONGITUDE']
-        woce_file.globals['DEPTH'] = info['DEPTH']
+        sum_file_index = _summary_row(
+            sum_file, woce_file.globals.get('STNNBR'),
+            woce_file.globals.get('CASTNO'))
+        for key in _COMBINED_COLUMNS:
+            woce_file.globals[key] = summary_columns[key][sum_file_index]
     else:
         # This is probably a Bottle file.
-        station_col = woce_file['STNNBR']
-        cast_col = woce_file['CASTNO']
-
-        woce_file.ensure_column('EXPOCODE')
-        woce_file.ensure_column('SECT_ID')
-        woce_file.ensure_column('_DATETIME')
-        woce_file.ensure_column('LATITUDE')
-        woce_file.ensure_column('LONGITUDE')
-        woce_file.ensure_column('DEPTH')
-
-        for i in range(len(woce_file)):
-            station = station_col[i]
-            cast = cast_col[i]
-            try:
-                sum_file_index = sum_file.index(station, cast)
-            except ValueError, e:
-                log.error(_MSG_NO_STN_CAST_PAIR.format(station, cast))
-                raise e
-            values = sum_file.get_property_for_columns(
-                lambda c: c[sum_file_index])
-
-            info = dict(zip(headers, values))
-            woce_file['EXPOCODE'][i] = info['EXPOCODE']
-            woce_file['SECT_ID'][i] = info['SECT_ID']
-            woce_file['_DATETIME'][i] = info['_DATETIME']
-            woce_file['LATITUDE'][i] = info['LATITUDE']
-            woce_file['LONGITUDE'][i] = info['LONGITUDE']
-            woce_file['DEPTH'][i] = info['DEPTH']
+        # Look up each run of a station cast in the summary and then take
+        # the summary's values for all of the file's rows at once.
+        # Rows without a station cast take the last summary value, None.
+        summary_rows = [-1] * len(woce_file)
+        for (station, cast), start, end in woce_file.group_index().runs:
+            summary_rows[start:end] = (
+                [_summary_row(sum_file, station, cast)] * (end - start))
+        num_summary_rows = len(sum_file)
+        for key in _COMBINED_COLUMNS:
+            woce_file.ensure_column(key)
+            summary_values = list(summary_columns[key].values)
+            summary_values.extend(
+                [None] * (num_summary_rows + 1 - len(summary_values)))
+            woce_file[key].values = map(
+                summary_values.__getitem__, summary_rows)
         woce_file.globals['header'] = ''
@@ -11,11 +11,17 @@ from logging import getLogger
 log = getLogger(__name__)
 
 
-from libcchdo import StringIO
+from libcchdo import StringIO, metrics
 from libcchdo.model.datafile import DataFile, DataFileCollection
 from libcchdo.model.convert.datafile_to_datafilecollection import split_on_cast
 
 
+_members_read = metrics.counter('zip.members_read')
+_bytes_read = metrics.counter('zip.bytes_read')
+_members_written = metrics.counter('zip.members_written')
+_bytes_written = metrics.counter('zip.bytes_written')
+
+
 class MemZipFile(zipfile.ZipFile):
     """A modified ZipFile that operates in memory. 
        Handy for writing zip files to streams that can't be seeked.
@@ -151,7 +157,10 @@ def generate_files(fileobj, is_fname_ok=None):
             if is_fname_ok and not is_fname_ok(fname):
                 continue
             with NamedTemporaryFile() as tempfile:
-                tempfile.write(zfile.read(fname))
+                data = zfile.read(fname)
+                _members_read.inc()
+                _bytes_read.inc(len(data))
+                tempfile.write(data)
                 tempfile.flush()
                 tempfile.seek(0)
                 yield tempfile
@@ -201,7 +210,10 @@ def write(self, handle, writer, get_filename, **kwargs):
             else:
                 fnames.add(filename)
             try:
-                zfile.writestr(createZipInfo(filename), tempfile.read())
+                data = tempfile.read()
+                zfile.writestr(createZipInfo(filename), data)
+                _members_written.inc()
+                _bytes_written.inc(len(data))
             except Exception, err:
                 log.error(u'Unable to write {0}: {1!r}'.format(filename, err))
     zfile.close()
@@ -21,7 +21,8 @@ style flags or '_FLAG_I' suffix for IGOSS style flags or another similar style.
 
 """
 from copy import copy
-from collections import OrderedDict
+from collections import OrderedDict, Counter
+from multiprocessing import Pool, cpu_count
 from logging import getLogger
 
 from libcchdo.formats import woce
@@ -30,8 +31,9 @@ from libcchdo.formats.exchange import (
 from libcchdo.fns import equal_with_epsilon, set_list
 from libcchdo.recipes.orderedset import OrderedSet
 from libcchdo.recipes.defaultordereddict import DefaultOrderedDict
+from libcchdo.timings import timed
 from libcchdo.model.datafile import (
-    DataFile, DataFileCollection, Column, PRESSURE_PARAMETERS)
+    DataFile, DataFileCollection, Column, DiffColumn, PRESSURE_PARAMETERS)
 
 
 log = getLogger(__name__)
@@ -43,6 +45,7 @@ BOTTLE_KEY_COLS = ('EXPOCODE', 'STNNBR', 'CASTNO', 'SAMPNO', 'BTLNBR',)
 DFILE_KEY_COLS = ('EXPOCODE', 'STNNBR', 'CASTNO',)
 
 
+@timed('merge')
 def merge_ctd_bacp_xmiss_and_ctd_exchange(file, mergefile):
     """Merge mergefile onto file"""
     merge_pressure = None
@@ -82,7 +85,7 @@ def merge_ctd_bacp_xmiss_and_ctd_exchange(file, mergefile):
 
     for i, p in enumerate(merge_pressure.values):
         j = pressure.values.index(p)
-        xmiss_column.values[j] = merge_xmiss.values[i]
+        xmiss_column.set(j, merge_xmiss.values[i])
 
 
 def _datafile_parameter_mnemonics(dfile):
@@ -109,7 +112,7 @@ def different_columns(origin, deriv, keys, row_map=None):
     merging.
 
     """
-    if not row_map:
+    if row_map is None:
         row_map = map_keys(origin, deriv, keys)
     if type(origin) == DataFileCollection and type(deriv) == DataFileCollection:
         different = OrderedSet()
@@ -137,12 +140,11 @@ def different_columns(origin, deriv, keys, row_map=None):
     not_in_derivative = origin_columns - deriv_columns
     different = OrderedSet()
 
-    def report_differences(param, difflist, difftuples):
-        for i, diff in enumerate(difflist):
-            if not diff:
-                continue
+    def report_differences(param, rows, pair):
+        lll, mmm = pair
+        for i in rows:
             log.info(u'{0} differs at origin row {1}:\t{2!r}'.format(
-                param, i, difftuples[i]))
+                param, i, (lll[i], mmm[i])))
         
     # check common columns for differing data
     for col in common:
@@ -164,16 +166,16 @@ def different_columns(origin, deriv, keys, row_map=None):
             # Report where the flags first differ.
             if col.endswith(FLAG_ENDING_WOCE):
                 report_differences(
-                    col, diffcol.flags_woce, diffcol.flags_woce_tuples)
+                    col, diffcol.flags_woce_rows, diffcol.flags_woce_pair)
             elif col.endswith(FLAG_ENDING_IGOSS):
                 report_differences(
-                    col, diffcol.flags_igoss, diffcol.flags_igoss_tuples)
+                    col, diffcol.flags_igoss_rows, diffcol.flags_igoss_pair)
         else:
             if diffcol.is_diff_values():
                 is_diff = True
 
                 report_differences(
-                    col, diffcol.values, diffcol.values_tuples)
+                    col, diffcol.values_rows, diffcol.values_pair)
             elif diffcol.is_diff_units():
                 is_diff = True
             elif diffcol.is_diff_flags():
@@ -259,14 +261,8 @@ def map_keys(origin, deriv, keys):
             zip(derivcols, collens)))
 
     # TODO similar to map_collections
-    originkeys = DefaultOrderedDict(list)
-    derivkeys = DefaultOrderedDict(list)
-    for i in range(origin_collen):
-        key = tuple([col[i] for col in origincols])
-        originkeys[key].append(i)
-    for i in range(deriv_collen):
-        key = tuple([col[i] for col in derivcols])
-        derivkeys[key].append(i)
+    originkeys = origin.group_index(keys).groups
+    derivkeys = deriv.group_index(keys).groups
 
     keymap = []
     # Map the origin rows to the derivative rows by key (these are the only ones
@@ -364,6 +360,7 @@ def determine_ctd_keys(origin, deriv):
     return (keycol,)
 
 
+@timed('merge')
 def merge_datafiles(origin, deriv, keys, parameters):
     """Merge the columns and data of two DataFiles."""
     row_map = map_keys(origin, deriv, keys)
@@ -467,6 +464,11 @@ def merge_datafiles(origin, deriv, keys, parameters):
     return merged
 
 
+def collection_file_key(dfile, dfkeys=DFILE_KEY_COLS):
+    """Return the key that identifies the DataFile in its collection."""
+    return tuple([dfile.globals[key] for key in dfkeys])
+
+
 def map_collections(origin, deriv, dfkeys=DFILE_KEY_COLS):
     """Return list of tuples of matching DataFiles and the key.
 
@@ -481,11 +483,9 @@ def map_collections(origin, deriv, dfkeys=DFILE_KEY_COLS):
     d_key_file = OrderedDict()
     o_key_file = OrderedDict()
     for ddfile in deriv:
-        dfkey = tuple([ddfile.globals[key] for key in dfkeys])
-        d_key_file[dfkey] = ddfile
+        d_key_file[collection_file_key(ddfile, dfkeys)] = ddfile
     for odfile in origin:
-        dfkey = tuple([odfile.globals[key] for key in dfkeys])
-        o_key_file[dfkey] = odfile
+        o_key_file[collection_file_key(odfile, dfkeys)] = odfile
 
     dfile_map = []
     for dfkey in o_key_file:
@@ -519,3 +519,203 @@ def merge_collections(origin, deriv, merge, dfkeys=DFILE_KEY_COLS):
             log.error(
                 u'Unable to merge datafiles for {0}: {1}'.format(dfkey, err))
     return merged_dfc
+
+
+def guess_keys(origin, deriv):
+    """Return the key columns to diff two DataFiles on.
+
+    Bottle keys are used if the files identify samples with SAMPNO or BTLNBR.
+    Otherwise, the files are treated as CTD and keyed on pressure.
+
+    """
+    keys = determine_bottle_keys(origin, deriv)
+    if 'SAMPNO' in keys or 'BTLNBR' in keys:
+        return keys
+    return determine_ctd_keys(origin, deriv)
+
+
+# Pairs of DataFiles being diffed. Worker processes inherit this on fork so the
+# files themselves never need to be pickled.
+_diff_pairs = []
+
+
+def _diff_parameter(task):
+    """Return the differences for one parameter of one pair of DataFiles."""
+    ipair, param, patch = task
+    origin, deriv, row_map = _diff_pairs[ipair]
+    diffcol = DiffColumn(param)
+    diffcol.diff_storage(origin[param], deriv[param], row_map=row_map)
+    if not diffcol.is_diff():
+        return None
+
+    def keyed_row(iii):
+        if row_map is not None:
+            return row_map[iii][0], row_map[iii][2]
+        return iii, None
+
+    def flag_changes(rows, pair):
+        lll, mmm = pair
+        return dict(Counter((lll[iii], mmm[iii]) for iii in rows))
+
+    result = {
+        'pair': ipair,
+        'parameter': param,
+        'values': len(diffcol.values_rows),
+        'flags_woce': flag_changes(
+            diffcol.flags_woce_rows, diffcol.flags_woce_pair),
+        'flags_igoss': flag_changes(
+            diffcol.flags_igoss_rows, diffcol.flags_igoss_pair),
+    }
+    if patch:
+        changes = []
+        for field, rows, pair in [
+                ('value', diffcol.values_rows, diffcol.values_pair),
+                (FLAG_ENDING_WOCE, diffcol.flags_woce_rows,
+                 diffcol.flags_woce_pair),
+                (FLAG_ENDING_IGOSS, diffcol.flags_igoss_rows,
+                 diffcol.flags_igoss_pair)]:
+            lll, mmm = pair
+            for iii in rows:
+                row, key = keyed_row(iii)
+                changes.append((field, row, key, lll[iii], mmm[iii]))
+        result['patch'] = changes
+    return result
+
+
+def diff_datafile_pairs(pairs, keys_for_pair, processes=None, patch=False):
+    """Diff the common parameters of pairs of DataFiles.
+
+    The comparison of each parameter of each pair is done in a pool of
+    processes unless processes is 1.
+
+    Args:
+        pairs - list of (origin, derivative) DataFiles
+        keys_for_pair - function given an origin and derivative that returns
+            the key columns to map rows on
+        processes - number of worker processes (default: number of CPUs)
+        patch - whether to include every change in the results
+
+    Returns:
+        A dictionary summarizing the differences. Per parameter, the number of
+        differing values and the counts of flag changes keyed by
+        (origin flag, derivative flag). Also present are the parameters not in
+        either file, the parameters with different units and counts of rows
+        that could not be matched.
+
+    """
+    global _diff_pairs
+
+    not_in_origin = OrderedSet()
+    not_in_derivative = OrderedSet()
+    units_changed = OrderedSet()
+    unmatched_origin = 0
+    unmatched_derivative = 0
+    keys = OrderedSet()
+
+    _diff_pairs = []
+    tasks = []
+    for origin, deriv in pairs:
+        pair_keys = keys_for_pair(origin, deriv)
+        keys.add(tuple(pair_keys))
+        row_map = map_keys(origin, deriv, pair_keys)
+        unmatched_origin += len(origin) - len(row_map)
+        unmatched_derivative += \
+            len(deriv) - len(set(ideriv for _, ideriv, _ in row_map))
+
+        origin_params = OrderedSet(origin.columns.keys())
+        deriv_params = OrderedSet(deriv.columns.keys())
+        not_in_origin |= deriv_params - origin_params
+        not_in_derivative |= origin_params - deriv_params
+
+        ipair = len(_diff_pairs)
+        _diff_pairs.append((origin, deriv, row_map))
+        for param in origin_params & deriv_params:
+            ounits = origin[param].parameter.units
+            dunits = deriv[param].parameter.units
+            if ounits != dunits:
+                units_changed.add(param)
+            tasks.append((ipair, param, patch))
+
+    try:
+        if processes == 1 or len(tasks) < 2:
+            results = map(_diff_parameter, tasks)
+        else:
+            processes = processes or cpu_count()
+            pool = Pool(processes)
+            try:
+                chunksize = max(1, len(tasks) / (4 * processes))
+                results = pool.map(_diff_parameter, tasks, chunksize)
+            finally:
+                pool.close()
+                pool.join()
+    finally:
+        _diff_pairs = []
+
+    parameters = OrderedDict()
+    for result in results:
+        if result is None:
+            continue
+        param = result['parameter']
+        try:
+            summary = parameters[param]
+        except KeyError:
+            summary = parameters[param] = {
+                'values': 0,
+                'flags_woce': Counter(),
+                'flags_igoss': Counter(),
+                'patch': [],
+            }
+        summary['values'] += result['values']
+        summary['flags_woce'].update(result['flags_woce'])
+        summary['flags_igoss'].update(result['flags_igoss'])
+        for change in result.get('patch', []):
+            summary['patch'].append((result['pair'], ) + change)
+
+    return {
+        'keys': list(keys),
+        'parameters': parameters,
+        'units_changed': list(units_changed),
+        'not_in_origin': list(not_in_origin),
+        'not_in_derivative': list(not_in_derivative),
+        'unmatched_origin_rows': unmatched_origin,
+        'unmatched_derivative_rows': unmatched_derivative,
+    }
+
+
+@timed('diff')
+def diff_files(origin, deriv, keys=None, processes=None, patch=False):
+    """Diff two DataFiles or two DataFileCollections.
+
+    Collections are matched file by file with map_collections. If keys are not
+    given they are guessed for each pair of files.
+
+    Refer to diff_datafile_pairs for the returned summary. It also has the
+    file keys (DFILE_KEY_COLS values) of the files that were added to and
+    removed from a collection as files_added and files_removed.
+
+    """
+    files_added = []
+    files_removed = []
+    if type(origin) == DataFileCollection:
+        pairs = []
+        for odfile, ddfile, dfkey in map_collections(origin, deriv):
+            if odfile is ddfile:
+                files_removed.append(dfkey)
+            else:
+                pairs.append((odfile, ddfile))
+        origin_keys = set(collection_file_key(dfile) for dfile in origin)
+        files_added = [
+            dfkey for dfkey in map(collection_file_key, deriv)
+            if dfkey not in origin_keys]
+    else:
+        pairs = [(origin, deriv)]
+
+    if keys:
+        keys_for_pair = lambda origin, deriv: keys
+    else:
+        keys_for_pair = guess_keys
+    diff = diff_datafile_pairs(
+        pairs, keys_for_pair, processes=processes, patch=patch)
+    diff['files_added'] = files_added
+    diff['files_removed'] = files_removed
+    return diff
@@ -0,0 +1,205 @@
+"""Counters and histograms of the work done by the library.
+
+Metrics are always recorded. Hot code looks its metrics up once, at import,
+and then only adds to them::
+
+    _rows_read = metrics.counter('exchange.rows_read')
+    ...
+    _rows_read.inc(nrows)
+
+A snapshot of every metric can be taken at any time and written as JSON to
+compare throughput between releases. Long runs can dump snapshots
+periodically with PeriodicDump.
+
+"""
+import time
+import json
+from threading import Thread, Event, Lock
+
+
+class Counter(object):
+    """A running total."""
+
+    __slots__ = ('name', 'value', )
+
+    def __init__(self, name):
+        self.name = name
+        self.value = 0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+    def snapshot(self):
+        return self.value
+
+    def reset(self):
+        self.value = 0
+
+    def merge(self, value):
+        self.value += value
+
+
+class Histogram(object):
+    """The distribution of observed values.
+
+    Values are counted in buckets bounded by powers of two.
+
+    """
+
+    __slots__ = ('name', 'count', 'total', 'min', 'max', 'buckets', )
+
+    def __init__(self, name):
+        self.name = name
+        self.reset()
+
+    def observe(self, value):
+        self.count += 1
+        self.total += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+        bound = 1
+        while bound < value:
+            bound <<= 1
+        try:
+            self.buckets[bound] += 1
+        except KeyError:
+            self.buckets[bound] = 1
+
+    def snapshot(self):
+        return {
+            'count': self.count,
+            'total': self.total,
+            'min': self.min,
+            'max': self.max,
+            'buckets': dict(
+                (str(bound), count) for bound, count in self.buckets.items()),
+        }
+
+    def reset(self):
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+        self.buckets = {}
+
+    def merge(self, snapshot):
+        if not snapshot['count']:
+            return
+        self.count += snapshot['count']
+        self.total += snapshot['total']
+        if self.min is None or snapshot['min'] < self.min:
+            self.min = snapshot['min']
+        if self.max is None or snapshot['max'] > self.max:
+            self.max = snapshot['max']
+        for bound, count in snapshot['buckets'].items():
+            bound = int(bound)
+            self.buckets[bound] = self.buckets.get(bound, 0) + count
+
+
+class Registry(object):
+    """Named counters and histograms."""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = Lock()
+
+    def _get(self, cls, name):
+        try:
+            metric = self._metrics[name]
+        except KeyError:
+            with self._lock:
+                metric = self._metrics.setdefault(name, cls(name))
+        if not isinstance(metric, cls):
+            raise TypeError(u'Metric {0} is a {1}, not a {2}'.format(
+                name, type(metric).__name__, cls.__name__))
+        return metric
+
+    def counter(self, name):
+        """Return the counter with the name, creating it if needed."""
+        return self._get(Counter, name)
+
+    def histogram(self, name):
+        """Return the histogram with the name, creating it if needed."""
+        return self._get(Histogram, name)
+
+    def snapshot(self):
+        """Return the current value of every metric as a dict."""
+        counters = {}
+        histograms = {}
+        for name, metric in self._metrics.items():
+            if isinstance(metric, Counter):
+                counters[name] = metric.snapshot()
+            else:
+                histograms[name] = metric.snapshot()
+        return {
+            'time': time.time(),
+            'counters': counters,
+            'histograms': histograms,
+        }
+
+    def reset(self):
+        """Zero every metric.
+
+        Metrics are kept so that references to them stay valid.
+
+        """
+        for metric in self._metrics.values():
+            metric.reset()
+
+    def merge(self, snapshot):
+        """Add the metrics in a snapshot, e.g. from another process."""
+        for name, value in snapshot['counters'].items():
+            self.counter(name).merge(value)
+        for name, value in snapshot['histograms'].items():
+            self.histogram(name).merge(value)
+
+
+registry = Registry()
+counter = registry.counter
+histogram = registry.histogram
+snapshot = registry.snapshot
+reset = registry.reset
+merge = registry.merge
+
+
+def write_snapshot(handle, registry=registry):
+    """Write a snapshot of the registry to the handle as a line of JSON."""
+    handle.write(json.dumps(registry.snapshot(), sort_keys=True) + '\n')
+    handle.flush()
+
+
+class PeriodicDump(Thread):
+    """Append a snapshot to a file every interval seconds until stopped.
+
+    A final snapshot is written when stopped.
+
+    """
+    def __init__(self, path, interval=60, registry=registry):
+        super(PeriodicDump, self).__init__(name='metrics dump')
+        self.daemon = True
+        self.path = path
+        self.interval = interval
+        self.registry = registry
+        self._stopped = Event()
+
+    def dump(self):
+        with open(self.path, 'a') as handle:
+            write_snapshot(handle, self.registry)
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            self.dump()
+
+    def stop(self):
+        self._stopped.set()
+        self.join()
+        self.dump()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
@@ -1,7 +1,29 @@
 from copy import copy
 
 
-from libcchdo.model.datafile import DataFileCollection
+from libcchdo.model.datafile import DataFile, DataFileCollection
+
+
+def _cast_template(dfile):
+    """Return an empty copy of dfile with checked parameters.
+
+    Also returns a map from the template's column names to the source column
+    names or None if checking the parameters converted any columns, in which
+    case each cast must be checked on its own.
+
+    """
+    template = copy(dfile)
+    source_names = dict(
+        (id(column), name) for name, column in template.columns.items())
+    template.check_and_replace_parameters()
+    if template.changes_to_report:
+        return template, None
+    try:
+        names = [(name, source_names[id(column)]) for name, column in
+                 template.columns.items()]
+    except KeyError:
+        return template, None
+    return template, names
 
 
 def split_on_cast(dfile):
@@ -9,47 +31,28 @@ def split_on_cast(dfile):
 
     Splits are done based on station cast. Each cast is a new 'file'.
 
+    The cast boundaries are found once and each column is sliced per cast.
+    Parameters are checked once and shared between the casts.
+
     """
     coll = DataFileCollection()
 
-    file_parameters = dfile.parameter_mnemonics_woce()
-
-    current_file = copy(dfile)
-
-    expocodes = dfile['EXPOCODE']
-    stations = dfile['STNNBR']
-    casts = dfile['CASTNO']
+    template, names = _cast_template(dfile)
 
-    expocode = expocodes[0]
-    station = stations[0]
-    cast = casts[0]
-    for i in range(len(dfile)):
-        # Check if this row is a new measurement location
-        if expocodes[i] != expocode or \
-           stations[i] != station or \
-           casts[i] != cast:
-            current_file.check_and_replace_parameters()
-            coll.append(current_file)
+    index = dfile.group_index(('EXPOCODE', 'STNNBR', 'CASTNO', ))
+    for key, start, end in index.runs:
+        if names is None:
             current_file = copy(dfile)
-        expocode = expocodes[i]
-        station = stations[i]
-        cast = casts[i]
-
-        # Put the current row in the current dfile
-        for p in file_parameters:
-            source_col = dfile[p]
-            value = source_col[i]
-            try:
-                flag_woce = source_col.flags_woce[i]
-            except IndexError:
-                flag_woce = None
-            try:
-                flag_igoss = source_col.flags_igoss[i]
-            except IndexError:
-                flag_igoss = None
-            current_file[p].append(value, flag_woce, flag_igoss)
-
-    current_file.check_and_replace_parameters()
-    coll.append(current_file)
+            for name, column in current_file.columns.items():
+                current_file[name] = dfile[name].slice(start, end)
+            current_file.check_and_replace_parameters()
+        else:
+            current_file = DataFile()
+            current_file.globals = dfile.globals.copy()
+            for name, source_name in names:
+                column = dfile[source_name].slice(start, end)
+                column.parameter = template[name].parameter
+                current_file[name] = column
+        coll.append(current_file)
 
     return coll
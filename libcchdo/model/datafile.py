@@ -1,6 +1,10 @@
+import sys
+from copy import deepcopy
 from operator import itemgetter
+from itertools import izip, imap, islice, count, repeat, compress
+from array import array
 from datetime import timedelta
-from collections import OrderedDict
+from collections import OrderedDict, MutableSequence
 from logging import getLogger
 
 
@@ -8,15 +12,20 @@ log = getLogger(__name__)
 
 
 from libcchdo.fns import (
-    InvalidOperation,
+    Decimal, InvalidOperation,
     decimal_to_str, _decimal, set_list, uniquify, equal_with_epsilon,
     is_list_global, is_list_globally_equal, is_list_globally)
 from libcchdo.ui import TERMCOLOR
+from libcchdo import metrics
 from libcchdo.util import memoize
+from libcchdo.timings import stage, timed
 from libcchdo.db.model import std
 from libcchdo.algorithms import depth
 
 
+_unit_conversions = metrics.counter('units.conversions')
+
+
 PRESSURE_VARIABLES = ['CTDPRS', 'CTDRAW', 'REVPRS', 'DWNPRS']
 
 
@@ -35,6 +44,312 @@ OXYGEN_VARIABLES = ['CTDOXY', 'DWNOXY', 'OXYGEN', ]
 TEMPERATURE_VARIABLES = ['CTDTMP', 'REVTMP', 'SBE35', ]
 
 
+def _gather(lll, indices):
+    """Return the items of lll at indices. Indices past the end give NaN."""
+    length = len(lll)
+    getter = lll.__getitem__
+    nan = float('nan')
+    return [getter(iii) if iii < length else nan for iii in indices]
+
+
+def _take(lll, indices):
+    """Return the items of lll at indices. Indices past the end give None."""
+    if not indices:
+        return []
+    length = len(lll)
+    if length > max(indices):
+        return map(lll.__getitem__, indices)
+    return [lll[iii] if iii < length else None for iii in indices]
+
+
+def _slot_names(cls):
+    names = []
+    for klass in cls.__mro__:
+        slots = klass.__dict__.get('__slots__', ())
+        if isinstance(slots, basestring):
+            slots = (slots, )
+        names.extend(slots)
+    return names
+
+
+def _sizeof(obj, seen):
+    """Return the bytes used by obj and everything it refers to.
+
+    Containers, slots of slotted objects such as Decimals and the attributes
+    of database objects are followed. Objects whose ids are in seen are not
+    counted again; seen is updated with the ids of the objects counted.
+
+    """
+    size = 0
+    stack = [obj]
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen:
+            continue
+        seen.add(id(obj))
+        size += sys.getsizeof(obj)
+        if isinstance(obj, (basestring, int, long, float, array)):
+            continue
+        if isinstance(obj, (list, tuple, set, frozenset)):
+            stack.extend(obj)
+        elif isinstance(obj, dict):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif hasattr(obj, '_sa_instance_state'):
+            attrs = obj.__dict__
+            seen.add(id(attrs))
+            size += sys.getsizeof(attrs)
+            for key, value in attrs.items():
+                if not key.startswith('_sa_'):
+                    stack.append(value)
+        else:
+            for name in _slot_names(type(obj)):
+                try:
+                    stack.append(getattr(obj, name))
+                except AttributeError:
+                    pass
+    return size
+
+
+def _trim_trailing_none(lll):
+    """Remove Nones from the end of the list as if it were built by set_list.
+
+    """
+    end = len(lll)
+    while end and lll[end - 1] is None:
+        end -= 1
+    del lll[end:]
+    return lll
+
+
+def _is_precision_different(xxx, yyy):
+    """Return whether two equal values are written with different precision."""
+    if type(xxx) is Decimal and type(yyy) is Decimal:
+        return xxx.as_tuple().exponent != yyy.as_tuple().exponent
+    if type(xxx) is type(yyy):
+        return False
+    return decimal_to_str(xxx) != decimal_to_str(yyy)
+
+
+class ListLike(MutableSequence):
+    """Base for sequences that stand in for the lists of Column storage.
+
+    Compares equal to lists with the same items and pickles as a list.
+
+    """
+    __slots__ = ()
+
+    def sort(self, *args, **kwargs):
+        values = list(self)
+        values.sort(*args, **kwargs)
+        self[:] = values
+
+    def __add__(self, other):
+        return list(self) + list(other)
+
+    def __radd__(self, other):
+        return list(other) + list(self)
+
+    def __eq__(self, other):
+        if not isinstance(other, (list, ListLike)):
+            return NotImplemented
+        return len(self) == len(other) and list(self) == list(other)
+
+    def __ne__(self, other):
+        equal = self.__eq__(other)
+        if equal is NotImplemented:
+            return equal
+        return not equal
+
+    def __reduce__(self):
+        return (list, (list(self), ))
+
+    def __repr__(self):
+        return repr(list(self))
+
+
+class RowsView(ListLike):
+    """A list-like view of some rows of a parent list.
+
+    Reads go to the parent list so the view follows changes to the parent.
+    The first write to the view copies its rows into a list of its own.
+
+    rows - a slice or a sequence of indices into the parent
+
+    """
+    __slots__ = ('_parent', '_rows', '_list', )
+
+    def __init__(self, parent, rows):
+        self._list = None
+        if isinstance(parent, RowsView) and parent._list is None:
+            parent_rows = parent._rows
+            parent = parent._parent
+        else:
+            parent_rows = None
+        if isinstance(rows, slice):
+            if parent_rows is None:
+                rows = xrange(*rows.indices(len(parent)))
+            else:
+                rows = array('l', [parent_rows[iii] for iii in
+                                   xrange(*rows.indices(len(parent_rows)))])
+        elif parent_rows is not None:
+            rows = array('l', imap(parent_rows.__getitem__, rows))
+        elif rows and max(rows) >= len(parent):
+            self._list = _take(parent, rows)
+            parent = rows = None
+        self._parent = parent
+        self._rows = rows
+
+    def _own(self):
+        """Copy the rows from the parent if they have not already been."""
+        if self._list is None:
+            self._list = map(self._parent.__getitem__, self._rows)
+            self._parent = self._rows = None
+        return self._list
+
+    def __len__(self):
+        if self._list is not None:
+            return len(self._list)
+        return len(self._rows)
+
+    def __getitem__(self, index):
+        if self._list is not None:
+            return self._list[index]
+        if isinstance(index, slice):
+            return [self._parent[self._rows[iii]] for iii in
+                    xrange(*index.indices(len(self._rows)))]
+        return self._parent[self._rows[index]]
+
+    def __iter__(self):
+        if self._list is not None:
+            return iter(self._list)
+        return imap(self._parent.__getitem__, self._rows)
+
+    def __setitem__(self, index, value):
+        self._own()[index] = value
+
+    def __delitem__(self, index):
+        del self._own()[index]
+
+    def insert(self, index, value):
+        self._own().insert(index, value)
+
+    def append(self, value):
+        self._own().append(value)
+
+    def extend(self, values):
+        self._own().extend(values)
+
+    def sort(self, *args, **kwargs):
+        self._own().sort(*args, **kwargs)
+
+
+def _encoding_key(value):
+    """Return a key that is only equal for values that print the same.
+
+    Decimal('1') and Decimal('1.0') are equal but must not share a code.
+
+    """
+    if type(value) is str:
+        return value
+    if type(value) in (int, long, unicode, bool, type(None)):
+        return (type(value), value)
+    return (type(value), repr(value))
+
+
+class EncodedList(ListLike):
+    """A list that stores integer codes into a table of its distinct values.
+
+    codes - an array of the code of each item
+    table - the distinct values in order of first appearance
+
+    """
+    __slots__ = ('codes', 'table', '_lookup', )
+
+    def __init__(self, values=()):
+        self.codes = array('i')
+        self.table = []
+        self._lookup = {}
+        self.extend(values)
+
+    @classmethod
+    def from_codes(cls, codes, table):
+        """Return an EncodedList of existing codes into the table."""
+        encoded = cls()
+        encoded.codes = codes
+        encoded.table = table
+        encoded._lookup = dict(
+            (_encoding_key(value), code) for code, value in enumerate(table))
+        return encoded
+
+    def encode(self, value):
+        """Return the code for value, adding it to the table if needed."""
+        key = _encoding_key(value)
+        try:
+            return self._lookup[key]
+        except KeyError:
+            code = self._lookup[key] = len(self.table)
+            self.table.append(value)
+            return code
+
+    def is_table_distinct(self):
+        """Return whether no two values in the table are equal.
+
+        If so, comparing codes is the same as comparing values.
+
+        """
+        try:
+            return len(set(self.table)) == len(self.table)
+        except TypeError:
+            return False
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return map(self.table.__getitem__, self.codes[index])
+        return self.table[self.codes[index]]
+
+    def __iter__(self):
+        return imap(self.table.__getitem__, self.codes)
+
+    def __contains__(self, value):
+        codes = set(
+            code for code, item in enumerate(self.table) if item == value)
+        return any(code in codes for code in self.codes)
+
+    def __setitem__(self, index, value):
+        if isinstance(index, slice):
+            self.codes[index] = array('i', imap(self.encode, value))
+        else:
+            self.codes[index] = self.encode(value)
+
+    def __delitem__(self, index):
+        del self.codes[index]
+
+    def insert(self, index, value):
+        self.codes.insert(index, self.encode(value))
+
+    def append(self, value):
+        self.codes.append(self.encode(value))
+
+    def extend(self, values):
+        if values is self:
+            values = list(values)
+        self.codes.extend(imap(self.encode, values))
+
+    def __iadd__(self, values):
+        self.extend(values)
+        return self
+
+
+# Identifiers that have few distinct values per file and are stored as
+# EncodedLists.
+CATEGORICAL_PARAMETERS = (
+    'EXPOCODE', 'SECT_ID', 'STNNBR', 'CASTNO', 'SAMPNO', 'BTLNBR', )
+
+
 class Column(object):
 
     def __init__(self, parameter, units=None):
@@ -48,22 +363,45 @@ class Column(object):
                    parameter = parameter.encode('ascii', 'replace')
             self.parameter = std.make_contrived_parameter(parameter,
                                                           units=units)
+        # Incremented whenever values are replaced or set so that indices built
+        # on the values know to rebuild. Write to values through set() or
+        # set_rows() rather than assigning into the list.
+        self.generation = 0
         self.values = []
         self.flags_woce = []
         self.flags_igoss = []
 
+    @property
+    def values(self):
+        return self._values
+
+    @values.setter
+    def values(self, values):
+        if (    not isinstance(values, ListLike) and
+                getattr(self.parameter, 'name', None) in
+                CATEGORICAL_PARAMETERS):
+            values = EncodedList(values)
+        self._values = values
+        self.generation += 1
+
     def get(self, index):
         if index >= len(self.values):
             return None
         return self.values[index]
 
     def set(self, index, value, flag_woce=None, flag_igoss=None):
+        self.generation += 1
         set_list(self.values, index, value)
         if flag_woce is not None:
             set_list(self.flags_woce, index, flag_woce)
         if flag_igoss is not None:
             set_list(self.flags_igoss, index, flag_igoss)
 
+    def set_rows(self, start, end, values):
+        """Replace the values of rows start to end with values."""
+        self.generation += 1
+        self.values[start:end] = values
+
     def append(self, value=None, flag_woce=None, flag_igoss=None):
         self.values.append(value)
         i = len(self.values) - 1
@@ -110,6 +448,40 @@ class Column(object):
         """
         self.append(*self._check_range(value, flag_woce=flag_woce))
 
+    def slice(self, start, end):
+        """Return a new Column with the same parameter and rows start to end."""
+        column = Column(self.parameter)
+        column.values = self.values[start:end]
+        column.flags_woce = _trim_trailing_none(self.flags_woce[start:end])
+        column.flags_igoss = _trim_trailing_none(self.flags_igoss[start:end])
+        return column
+
+    def view(self, rows=None):
+        """Return a Column with the same parameter that views the rows.
+
+        rows - a slice or a sequence of row indices. Defaults to all rows.
+
+        The new Column shares this column's storage until it is written to.
+
+        """
+        if rows is None:
+            rows = slice(None)
+        column = Column(self.parameter)
+        column.values = RowsView(self.values, rows)
+        if self.flags_woce:
+            column.flags_woce = RowsView(self.flags_woce, rows)
+        if self.flags_igoss:
+            column.flags_igoss = RowsView(self.flags_igoss, rows)
+        return column
+
+    def permute(self, order):
+        """Rearrange the values and flags so that row i becomes order[i]."""
+        self.values = _take(self.values, order)
+        if self.flags_woce:
+            self.flags_woce = _take(self.flags_woce, order)
+        if self.flags_igoss:
+            self.flags_igoss = _take(self.flags_igoss, order)
+
     def set_length(self, length, fill_value=None):
         """Set the length of the column and fill."""
         fill_length = length - len(self.values)
@@ -245,7 +617,9 @@ class Column(object):
                 return
             log.info(("Converting from '%s' -> '%s' for %s.") % \
                      (from_to + (self.parameter.name,)))
-            self = unit_converter(file, self)
+            with stage('unit_conversion'):
+                self = unit_converter(file, self)
+            _unit_conversions.inc()
             file.changes_to_report.append((
                 'Converted %(parameter)s from %(startunit)s to %(endunit)s '
                 'using %(technique)s') % {
@@ -274,6 +648,10 @@ class DiffColumn(Column):
     returned diff column's values and flags will contain the difference
     between the other column and this column's values and flags.
 
+    The rows that differ are also available as compact index arrays in
+    values_rows, flags_woce_rows and flags_igoss_rows. The aligned values being
+    compared are kept in values_pair, flags_woce_pair and flags_igoss_pair.
+
     Determine how the columns are different by asking any of
     * is_diff() - any differences
     * is_diff_parameter()
@@ -293,9 +671,24 @@ class DiffColumn(Column):
         self._is_diff_values = False
         self._is_diff_flags_woce = False
         self._is_diff_flags_igoss = False
-        self.values_tuples = []
-        self.flags_woce_tuples = []
-        self.flags_igoss_tuples = []
+        self.values_pair = ([], [])
+        self.flags_woce_pair = ([], [])
+        self.flags_igoss_pair = ([], [])
+        self.values_rows = array('l')
+        self.flags_woce_rows = array('l')
+        self.flags_igoss_rows = array('l')
+
+    @property
+    def values_tuples(self):
+        return zip(*self.values_pair)
+
+    @property
+    def flags_woce_tuples(self):
+        return zip(*self.flags_woce_pair)
+
+    @property
+    def flags_igoss_tuples(self):
+        return zip(*self.flags_igoss_pair)
 
     def is_diff(self):
         return self._is_diff
@@ -321,48 +714,57 @@ class DiffColumn(Column):
     def is_diff_flags(self):
         return self.is_diff_flags_woce() or self.is_diff_flags_igoss()
 
-    def _zip_row_map(self, lll, mmm, row_map=None):
-        """Zip two lists with row map for the second list.
+    def _align_row_map(self, lll, mmm, row_map=None):
+        """Align two lists with row map for the second list.
 
         Row map maps the indices of the second list onto those of the first
-        list.
+        list. Rows that are not present in a list are aligned to NaN. Without a
+        row map the lists are aligned by position. An empty row map aligns
+        nothing.
+
+        Return:
+            a pair of equal length lists
 
         """
-        if row_map:
-            zipped = []
-            if len(lll) == 0:
-                return zipped
-            for iii, jjj, kkk in row_map:
-                try:
-                    lval = lll[iii]
-                except IndexError:
-                    lval = float('nan')
-                try:
-                    mval = mmm[jjj]
-                except IndexError:
-                    mval = float('nan')
-                zipped.append((lval, mval))
-            return zipped
-        else:
-            return zip(lll, mmm)
+        if row_map is None:
+            length = min(len(lll), len(mmm))
+            if len(lll) == length and len(mmm) == length:
+                return (lll, mmm)
+            return (lll[:length], mmm[:length])
+        if len(lll) == 0:
+            return ([], [])
+        return (_gather(lll, imap(itemgetter(0), row_map)),
+                _gather(mmm, imap(itemgetter(1), row_map)))
+
+    def _differing_rows(self, pair, consider_precision=True):
+        """Return an index array of the rows that differ between the pair.
+
+        When considering precision, values that are equal but are written with
+        a different number of decimal places are also different.
 
-    def _compare_tuples(self, tuples, consider_precision=True):
+        """
+        lll, mmm = pair
+        rows = [iii for iii, xxx, yyy in izip(count(), lll, mmm) if xxx != yyy]
         if consider_precision:
-            diff = []
-            for x, y in tuples:
-                if x != y:
-                    diff.append(True)
-                else:
-                    if decimal_to_str(x) != decimal_to_str(y):
-                        diff.append(True)
-                    else:
-                        diff.append(False)
+            precision_rows = [
+                iii for iii, xxx, yyy in izip(count(), lll, mmm)
+                if xxx == yyy and _is_precision_different(xxx, yyy)]
+            if precision_rows:
+                rows = sorted(rows + precision_rows)
+        return array('l', rows)
+
+    def _compare_pair(self, pair, rows, consider_precision=True):
+        """Return the per row comparison list for a pair of aligned lists."""
+        if consider_precision:
+            diff = [False] * len(pair[0])
+            for iii in rows:
+                diff[iii] = True
             return diff
         else:
             try:
-                return [y - x for x, y in tuples]
+                return [y - x for x, y in izip(*pair)]
             except TypeError:
-                return [x != y for x, y in tuples]
+                return [x != y for x, y in izip(*pair)]
 
     def diff(self, dfa, dfb, row_map=None, consider_precision=True):
         """Calculate the difference and populate the responses.
@@ -380,28 +782,48 @@ class DiffColumn(Column):
         if len(dfa) != len(dfb):
             self._is_diff_length = True
 
-        self.values_tuples = self._zip_row_map(dfa.values, dfb.values, row_map)
-        self.values = self._compare_tuples(
-            self.values_tuples, consider_precision=consider_precision)
-        self._is_diff_values = any(self.values)
-
-        self.flags_woce_tuples = self._zip_row_map(
-            dfa.flags_woce, dfb.flags_woce, row_map)
-        self.flags_woce = self._compare_tuples(
-            self.flags_woce_tuples, consider_precision=consider_precision)
-        self._is_diff_flags_woce = any(self.flags_woce)
-
-        self.flags_igoss_tuples = self._zip_row_map(
-            dfa.flags_igoss, dfb.flags_igoss, row_map)
-        self.flags_igoss = self._compare_tuples(
-            self.flags_igoss_tuples, consider_precision=consider_precision)
-        self._is_diff_flags_igoss = any(self.flags_igoss)
+        self.diff_storage(dfa, dfb, row_map, consider_precision)
 
         self._is_diff = (
             self.is_diff_parameter() or self.is_diff_units() or
             self.is_diff_length() or self.is_diff_values() or
             self.is_diff_flags())
 
+    def diff_storage(self, dfa, dfb, row_map=None, consider_precision=True):
+        """Calculate only the difference of the values and flags.
+
+        Parameters are not inspected so this is safe to call where the
+        parameter definitions are not available, e.g. in a worker process.
+
+        """
+        self.values_pair = self._align_row_map(
+            dfa.values, dfb.values, row_map)
+        self.values_rows = self._differing_rows(
+            self.values_pair, consider_precision=consider_precision)
+        self.values = self._compare_pair(
+            self.values_pair, self.values_rows,
+            consider_precision=consider_precision)
+        self._is_diff_values = len(self.values_rows) > 0
+
+        self.flags_woce_pair = self._align_row_map(
+            dfa.flags_woce, dfb.flags_woce, row_map)
+        self.flags_woce_rows = self._differing_rows(
+            self.flags_woce_pair, consider_precision=consider_precision)
+        self.flags_woce = self._compare_pair(
+            self.flags_woce_pair, self.flags_woce_rows,
+            consider_precision=consider_precision)
+        self._is_diff_flags_woce = len(self.flags_woce_rows) > 0
+
+        self.flags_igoss_pair = self._align_row_map(
+            dfa.flags_igoss, dfb.flags_igoss, row_map)
+        self.flags_igoss_rows = self._differing_rows(
+            self.flags_igoss_pair, consider_precision=consider_precision)
+        self.flags_igoss = self._compare_pair(
+            self.flags_igoss_pair, self.flags_igoss_rows,
+            consider_precision=consider_precision)
+        self._is_diff_flags_igoss = len(self.flags_igoss_rows) > 0
+        self._is_diff = self.is_diff_values() or self.is_diff_flags()
+
     def __str__(self):
         return super(DiffColumn, self).__str__() + '\n' + repr({
                 'parameter': self._is_diff_parameter,
@@ -414,6 +836,118 @@ class DiffColumn(Column):
             })
 
 
+CAST_KEY_COLS = ('STNNBR', 'CASTNO', )
+
+
+class GroupIndex(object):
+    """Index of the rows of a File by the values of key columns.
+
+    runs - list of (key, start, end) for every contiguous run of rows that
+        have the same key
+    groups - OrderedDict of key to an array of its row indices in order of
+        first appearance
+
+    Obtain one with File.group_index() which caches the index until the key
+    columns change.
+
+    """
+    def __init__(self, row_keys):
+        starts = [0] + [
+            iii for iii, aaa, bbb in
+            izip(count(1), row_keys, islice(row_keys, 1, None)) if aaa != bbb]
+        ends = starts[1:] + [len(row_keys)]
+        if not row_keys:
+            starts = ends = []
+        self.runs = [
+            (row_keys[start], start, end) for start, end in izip(starts, ends)]
+
+        self.groups = OrderedDict()
+        for key, start, end in self.runs:
+            try:
+                self.groups[key].extend(xrange(start, end))
+            except KeyError:
+                self.groups[key] = array('l', xrange(start, end))
+
+    def decode_keys(self, tables):
+        """Replace the codes in keys with their values from the tables.
+
+        tables - for each key column, the table to decode with or None if the
+            column was not encoded
+
+        """
+        def decode(key):
+            return tuple(
+                value if table is None else table[value]
+                for value, table in izip(key, tables))
+        self.runs = [(decode(key), start, end) for key, start, end in self.runs]
+        self.groups = OrderedDict(
+            (decode(key), rows) for key, rows in self.groups.iteritems())
+
+    def __len__(self):
+        return len(self.groups)
+
+    def __iter__(self):
+        return iter(self.groups)
+
+    def __contains__(self, key):
+        return key in self.groups
+
+    def rows(self, key):
+        """Return the row indices that have the key."""
+        return self.groups[key]
+
+    def is_contiguous(self):
+        """Return whether each key occurs in a single run of rows."""
+        return len(self.runs) == len(self.groups)
+
+    def run_ids(self):
+        """Return the number of the run each row belongs to."""
+        ids = []
+        for run, (key, start, end) in enumerate(self.runs):
+            ids.extend(repeat(run, end - start))
+        return ids
+
+
+def _copy_state(obj):
+    """Return a shallow copy of obj the way copy.copy does by default."""
+    copy = type(obj).__new__(type(obj))
+    copy.__dict__.update(obj.__dict__)
+    return copy
+
+
+def _deepcopy_state(obj, memo):
+    """Return a deep copy of obj the way copy.deepcopy does by default.
+
+    Objects that pickle through the packed form use this so that copies keep
+    their parameters as they are instead of looking them up again.
+
+    """
+    copy = type(obj).__new__(type(obj))
+    memo[id(obj)] = copy
+    copy.__dict__.update(deepcopy(obj.__dict__, memo))
+    return copy
+
+
+class ColumnDict(OrderedDict):
+    """An OrderedDict of Columns that counts changes to its keys."""
+
+    def __init__(self, *args, **kwargs):
+        self.version = 0
+        super(ColumnDict, self).__init__(*args, **kwargs)
+
+    def __setitem__(self, key, value, *args, **kwargs):
+        self.version += 1
+        super(ColumnDict, self).__setitem__(key, value, *args, **kwargs)
+
+    def __delitem__(self, key, *args, **kwargs):
+        self.version += 1
+        super(ColumnDict, self).__delitem__(key, *args, **kwargs)
+
+    def clear(self):
+        self.version += 1
+        super(ColumnDict, self).clear()
+
+
 class File(object):
 
     def __init__(self):
@@ -433,12 +967,156 @@ class File(object):
         # # old header
         self.changes_to_report = []
 
+        self._group_indices = {}
+
+    @property
+    def columns(self):
+        return self._columns
+
+    @columns.setter
+    def columns(self, columns):
+        if not isinstance(columns, ColumnDict):
+            columns = ColumnDict(columns)
+        self._columns = columns
+
     def sorted_columns(self):
+        """Return the columns in display order.
+
+        The order of the columns is cached until columns are added, removed
+        or replaced, a column's parameter or its display order changes or
+        ordered_columns changes. Empty columns are left out of ordered_columns
+        on every call.
+
+        """
+        signature = (
+            self.columns.version,
+            tuple((id(column), id(column.parameter),
+                   getattr(column.parameter, 'display_order', None))
+                  for column in self.columns.values()),
+            tuple(map(id, self.ordered_columns)))
+        try:
+            cached_columns, cached_signature, cached = self._sorted_columns
+            if (    cached_columns is self.columns and
+                    cached_signature == signature):
+                return self._filter_sorted_columns(cached)
+        except AttributeError:
+            pass
         columns = self.columns.values()
         if self.ordered_columns:
-            return filter(None,
-                          [x for x in self.ordered_columns if x in columns])
-        return sorted(columns)
+            cached = [x for x in self.ordered_columns if x in columns]
+        else:
+            cached = sorted(columns)
+        self._sorted_columns = (self.columns, signature, cached)
+        return self._filter_sorted_columns(cached)
+
+    def _filter_sorted_columns(self, columns):
+        if self.ordered_columns:
+            return filter(None, columns)
+        return list(columns)
+
+    def _view(self, keys, rows):
+        """Return a File of the same type with views of the keyed columns."""
+        view = type(self)()
+        view.columns = ColumnDict()
+        view.globals = self.globals.copy()
+        view.unit_converters = self.unit_converters
+        view.unit_converter_technique = self.unit_converter_technique
+        views = {}
+        for key in keys:
+            column = self.columns[key]
+            views[id(column)] = view.columns[key] = column.view(rows)
+        view.ordered_columns = [
+            views[id(column)] for column in self.ordered_columns
+            if id(column) in views]
+        return view
+
+    def select(self, keys):
+        """Return a view of the file with only the keyed columns.
+
+        The view's columns share storage with this file's columns until they
+        are written to.
+
+        """
+        return self._view(keys, None)
+
+    def take(self, rows):
+        """Return a view of the file with only the rows.
+
+        rows - a slice or a sequence of row indices
+
+        The view's columns share storage with this file's columns until they
+        are written to.
+
+        """
+        return self._view(self.columns.keys(), rows)
+
+    def __copy__(self):
+        return _copy_state(self)
+
+    def __deepcopy__(self, memo):
+        return _deepcopy_state(self, memo)
+
+    def __reduce__(self):
+        """Pickle as the compact form from libcchdo.model.packed.
+
+        Copies do not go through the packed form; see __copy__ and
+        __deepcopy__.
+
+        """
+        from libcchdo.model import packed
+        return (packed.loads, (packed.dumps(self), ))
+
+    def memory_usage(self, seen=None):
+        """Return the bytes used by each column and by the file.
+
+        Each column gives the bytes of its values, flags and parameter and the
+        type of its values' storage. Objects shared between columns, e.g. a
+        parameter or a value that is interned, are counted for the first
+        column that refers to them.
+
+        seen - ids of objects that are already accounted for. Pass the same
+            set for several files to count what they share once.
+
+        """
+        if seen is None:
+            seen = set()
+        columns = OrderedDict()
+        total = 0
+        for key, column in self.columns.items():
+            usage = OrderedDict([
+                ('storage', type(column.values).__name__),
+                ('values', _sizeof(column.values, seen)),
+                ('flags_woce', _sizeof(column.flags_woce, seen)),
+                ('flags_igoss', _sizeof(column.flags_igoss, seen)),
+                ('parameter', _sizeof(column.parameter, seen)),
+            ])
+            usage['total'] = (
+                usage['values'] + usage['flags_woce'] +
+                usage['flags_igoss'] + usage['parameter'])
+            columns[key] = usage
+            total += usage['total']
+        globals_size = _sizeof(getattr(self, 'globals', None), seen)
+        total += globals_size
+        rows = len(self)
+        return OrderedDict([
+            ('columns', columns),
+            ('globals', globals_size),
+            ('total', total),
+            ('rows', rows),
+            ('bytes_per_row', total / rows if rows else 0),
+        ])
+
+    def mask(self, predicate):
+        """Return a list of booleans for whether each row satisfies predicate.
+
+        See libcchdo.model.query for building predicates.
+
+        """
+        return predicate.mask(self)
+
+    def query(self, predicate):
+        """Return a view of the rows that satisfy predicate."""
+        return self.take(array('l', compress(count(), self.mask(predicate))))
 
     def get_property_for_columns(self, property_getter):
         return map(property_getter, self.sorted_columns())
@@ -465,10 +1143,54 @@ class File(object):
     def row(self, i):
         return [column[i] for column in self.sorted_columns()]
 
+    def row_keys(self, keys):
+        """Return a list of tuples of the key columns' values for each row."""
+        return zip(*[self[key].values for key in keys])
+
+    def group_index(self, keys=CAST_KEY_COLS):
+        """Return a GroupIndex of the rows by the key columns.
+
+        The index is cached and is rebuilt only when a key column is replaced,
+        changes length or has values set through the Column.
+
+        """
+        keys = tuple(keys)
+        columns = [self[key] for key in keys]
+        signature = [(column.generation, len(column)) for column in columns]
+        try:
+            cached_columns, cached_signature, index = self._group_indices[keys]
+            if (    cached_signature == signature and
+                    all(aaa is bbb for aaa, bbb in
+                        izip(cached_columns, columns))):
+                return index
+        except KeyError:
+            pass
+        # Group on the codes of encoded columns and decode the keys after.
+        tables = []
+        key_lists = []
+        for column in columns:
+            values = column.values
+            if isinstance(values, EncodedList) and values.is_table_distinct():
+                tables.append(values.table)
+                key_lists.append(values.codes)
+            else:
+                tables.append(None)
+                key_lists.append(values)
+        index = GroupIndex(zip(*key_lists))
+        if any(table is not None for table in tables):
+            index.decode_keys(tables)
+        self._group_indices[keys] = (columns, signature, index)
+        return index
+
+    def groupby(self, keys=CAST_KEY_COLS):
+        """Yield each key and its row indices in order of first appearance."""
+        return self.group_index(keys).groups.iteritems()
+
     def each_column(self, func, *args, **kwargs):
         for column in self.columns.values():
             func(column, self, *args, **kwargs)
 
+    @timed('check_and_replace_parameters')
     def check_and_replace_parameters(self, convert=True):
         self.each_column(Column.check_and_replace_parameter, convert=convert)
 
@@ -476,22 +1198,20 @@ class File(object):
         return key in self.columns
 
 
+def station_cast_key(value):
+    """Return the station or cast normalized for comparison."""
+    # TODO figure out how to compare station and cast "numbers" reliably.
+    if type(value) is float:
+        value = int(value)
+    return str(value)
+
+
 def station_equal(s0, s1):
-    # TODO figure out how to compare station "numbers" reliably.
-    if type(s0) is float:
-        s0 = int(s0)
-    if type(s1) is float:
-        s1 = int(s1)
-    return str(s0) == str(s1)
+    return station_cast_key(s0) == station_cast_key(s1)
 
 
 def cast_equal(c0, c1):
-    # TODO figure out how to compare cast "numbers" reliably.
-    if type(c0) is float:
-        c0 = int(c0)
-    if type(c1) is float:
-        c1 = int(c1)
-    return str(c0) == str(c1)
+    return station_cast_key(c0) == station_cast_key(c1)
 
 
 class SummaryFile(File):
@@ -509,13 +1229,41 @@ class SummaryFile(File):
         for column in columns:
             self[column] = Column(column)
 
+    def station_cast_index(self):
+        """Return a dict of each (station, cast) to its first row.
+
+        Stations and casts are normalized with station_cast_key(). The index
+        is cached and is rebuilt only when STNNBR or CASTNO is replaced,
+        changes length or has values set through the Column.
+
+        """
+        columns = [self['STNNBR'], self['CASTNO']]
+        signature = [(column.generation, len(column)) for column in columns]
+        try:
+            cached_columns, cached_signature, index = self._station_cast_index
+            if (    cached_signature == signature and
+                    all(aaa is bbb for aaa, bbb in
+                        izip(cached_columns, columns))):
+                return index
+        except AttributeError:
+            pass
+        stations, casts = [column.values for column in columns]
+        if len(casts) < len(stations):
+            casts = list(casts) + [None] * (len(stations) - len(casts))
+        index = {}
+        for i, (s, c) in enumerate(izip(stations, casts)):
+            index.setdefault((station_cast_key(s), station_cast_key(c)), i)
+        self._station_cast_index = (columns, signature, index)
+        return index
+
     def index(self, station, cast):
-        for i, s in enumerate(self['STNNBR'].values):
-            if not station_equal(s, station):
-                continue
-            if cast_equal(self['CASTNO'][i], cast):
-                return i
-        raise ValueError('%s, %s is not in summary file' % (station, cast))
+        """Return the first row with the station and cast."""
+        key = (station_cast_key(station), station_cast_key(cast))
+        try:
+            return self.station_cast_index()[key]
+        except KeyError:
+            raise ValueError(
+                '%s, %s is not in summary file' % (station, cast))
 
     def __str__(self):
         s = u''
@@ -669,6 +1417,7 @@ class DataFile(File):
         """Swaps two rows in the file."""
         for c in self.columns.values():
             c.values[a], c.values[b] = c.values[b], c.values[a]
+            c.generation += 1
             if c.is_flagged_woce():
                 c.flags_woce[a], c.flags_woce[b] = \
                     c.flags_woce[b], c.flags_woce[a]
@@ -676,9 +1425,12 @@ class DataFile(File):
                 c.flags_igoss[a], c.flags_igoss[b] = \
                     c.flags_igoss[b], c.flags_igoss[a]
 
-    def sort_file_range(self, start, end, pres_ascending=True,
-                        bot_ascending=False):
-        """Sort the rows from indexes start to end by pressure and bottle."""
+    def _pressure_bottle_values(self):
+        """Return the pressure and bottle values to order rows by.
+
+        Returns None if there is no pressure column.
+
+        """
         pressure_col = None
         for p in PRESSURE_PARAMETERS:
             try:
@@ -686,36 +1438,41 @@ class DataFile(File):
             except KeyError:
                 pass
         if pressure_col is None:
-            return
+            return None
 
-        bottle_col = None
         try:
-            bottle_col = self['BTLNBR'].values
+            bottles = self['BTLNBR'].values
         except KeyError:
-            bottle_col = [None] * len(pressure_col)
-
-        pb_orders = zip(
-            pressure_col.values[start:end], bottle_col[start:end],
-            range(start, end))
-        order = [i for p, b, i in pb_orders]
-        # Sort first by bottle order
-        reversed_pb_orders = sorted(
-            pb_orders, key=itemgetter(1), reverse=(not bot_ascending))
-        # Sort second by pressure
-        sorted_pb_orders = sorted(
-            reversed_pb_orders, key=itemgetter(0),
-            reverse=(not pres_ascending))
-        sorted_order = [i for p, b, i in sorted_pb_orders]
-
-        # Don't keep swapping after just past the halfway point or things will
-        # become out of order.
-        for i in range(len(sorted_order) / 2 + 1):
-            s = sorted_order[i]
-            o = order[i]
-            if s != o:
-                k = order.index(s)
-                self.swap_rows(s, o)
-                order[i], order[k] = order[k], order[i]
+            bottles = [None] * len(pressure_col)
+        return pressure_col.values, bottles
+
+    def _pressure_order(self, order, values, pres_ascending=True,
+                        bot_ascending=False):
+        """Sort row indices by pressure and then bottle in place.
+
+        values - the pressure and bottle values from _pressure_bottle_values()
+
+        The sorts are stable so indices are left grouped as they were given.
+
+        """
+        pressures, bottles = values
+        order.sort(key=bottles.__getitem__, reverse=(not bot_ascending))
+        order.sort(key=pressures.__getitem__, reverse=(not pres_ascending))
+
+    def permute_rows(self, order):
+        """Rearrange all rows in the file so that row i becomes order[i]."""
+        for column in self.columns.values():
+            column.permute(order)
+
+    def sort_file_range(self, start, end, pres_ascending=True,
+                        bot_ascending=False):
+        """Sort the rows from indexes start to end by pressure and bottle."""
+        values = self._pressure_bottle_values()
+        if values is None:
+            return
+        order = range(start, end)
+        self._pressure_order(order, values, pres_ascending, bot_ascending)
+        self.permute_rows(range(start) + order + range(end, len(self)))
 
     def reorder_file_pressure(self, pres_ascending=True, bot_ascending=False):
         """Reorders a file's rows by pressure then bottle number.
@@ -723,24 +1480,24 @@ class DataFile(File):
         This defaults to non-decreasing pressure and non-ascending bottle
         number order.
 
+        Only rows within runs of the same station and cast are reordered. The
+        runs keep their order in the file.
+
         """
-        if len(self) > 0:
-            stations = self['STNNBR'].values
-            casts = self['CASTNO'].values
-            station = stations[0]
-            cast = casts[0]
-            last_i = 0
-            for i in range(1, len(self)):
-                station_i = stations[i]
-                cast_i = casts[i]
-                if station_i != station or cast_i != cast:
-                    station = station_i
-                    cast = cast_i
-                    self.sort_file_range(
-                        last_i, i, pres_ascending, bot_ascending)
-                    last_i = i
-            self.sort_file_range(
-                last_i, len(self), pres_ascending, bot_ascending)
+        if len(self) <= 0:
+            return
+        values = self._pressure_bottle_values()
+        if values is None:
+            return
+
+        # Sort on the station cast run last so the stable sort leaves each run
+        # ordered by pressure and bottle.
+        runs = self.group_index().run_ids()
+
+        order = range(len(self))
+        self._pressure_order(order, values, pres_ascending, bot_ascending)
+        order.sort(key=runs.__getitem__)
+        self.permute_rows(order)
 
     def find_first(self, parameters):
         for col in self.sorted_columns():
@@ -821,6 +1578,61 @@ class DataFileCollection(object):
         self.files = []
         self.allow_contrived = allow_contrived
 
+    def __copy__(self):
+        return _copy_state(self)
+
+    def __deepcopy__(self, memo):
+        return _deepcopy_state(self, memo)
+
+    def __reduce__(self):
+        """Pickle as the compact form from libcchdo.model.packed.
+
+        Copies do not go through the packed form; see __copy__ and
+        __deepcopy__.
+
+        """
+        from libcchdo.model import packed
+        return (packed.loads, (packed.dumps(self), ))
+
+    def memory_usage(self, seen=None):
+        """Return the bytes used by the files' columns and by the collection.
+
+        The usage of columns with the same key is summed over the files.
+        Objects shared between files are counted once.
+
+        """
+        if seen is None:
+            seen = set()
+        columns = OrderedDict()
+        globals_size = 0
+        rows = 0
+        for file in self.files:
+            usage = file.memory_usage(seen)
+            for key, column in usage['columns'].items():
+                try:
+                    summed = columns[key]
+                except KeyError:
+                    columns[key] = column
+                    continue
+                for part, size in column.items():
+                    if part == 'storage':
+                        if size not in summed[part].split(', '):
+                            summed[part] += ', ' + size
+                    else:
+                        summed[part] += size
+            globals_size += usage['globals']
+            rows += usage['rows']
+        total = _sizeof(self.files, seen) + globals_size + sum(
+            column['total'] for column in columns.values())
+        return OrderedDict([
+            ('files', len(self.files)),
+            ('columns', columns),
+            ('globals', globals_size),
+            ('total', total),
+            ('rows', rows),
+            ('bytes_per_row', total / rows if rows else 0),
+        ])
+
     def stamps(self):
         return [file.globals['stamp'] for file in self.files.values()]
 
@@ -828,36 +1640,66 @@ class DataFileCollection(object):
         self.files.append(x)
 
     def to_data_file(self):
+        """Concatenate the files into one DataFile.
+
+        Each file's globals are broadcast into columns over its rows. The
+        output columns are created once and then filled with a block copy of
+        each file's storage.
+
+        """
         df = DataFile()
-        length = 0
+        global_keys = {}
+        blocks = OrderedDict()
+        offset = 0
         for file in self.files:
             num_rows = len(file)
-            for row in range(num_rows):
-                rowi = length + row
-                # Insert globals
-                for g, v in file.globals.items():
-                    try:
-                        df[g]
-                    except KeyError:
-                        df[g] = Column(g)
-                        df[g].check_and_replace_parameter(df)
-                    df[g].set(rowi, v)
-                for c in file.sorted_columns():
-                    mnemonic = c.parameter.mnemonic_woce()
-                    try:
-                        df[mnemonic]
-                    except KeyError:
-                        df[mnemonic] = Column(c.parameter)
-                    try:
-                        flag_woce = c.flags_woce[row]
-                    except IndexError:
-                        flag_woce = None
-                    try:
-                        flag_igoss = c.flags_igoss[row]
-                    except IndexError:
-                        flag_igoss = None
-                    df[mnemonic].set(rowi, c[row], flag_woce, flag_igoss)
-            length += num_rows
+            if not num_rows:
+                continue
+            for g, v in file.globals.items():
+                try:
+                    key = global_keys[g]
+                except KeyError:
+                    if g not in df.columns:
+                        column = df[g] = Column(g)
+                        column.check_and_replace_parameter(df)
+                        # Checking may have renamed the column
+                        g_key = [
+                            k for k, c in df.columns.items() if c is column][0]
+                    else:
+                        g_key = g
+                    key = global_keys[g] = g_key
+                blocks.setdefault(key, []).append((offset, num_rows, v, None))
+            for c in file.sorted_columns():
+                mnemonic = c.parameter.mnemonic_woce()
+                if mnemonic not in df.columns:
+                    df[mnemonic] = Column(c.parameter)
+                blocks.setdefault(mnemonic, []).append(
+                    (offset, num_rows, None, c))
+            offset += num_rows
+
+        for key, column_blocks in blocks.items():
+            start, num_rows, v, c = column_blocks[-1]
+            end = start + num_rows
+            values = [None] * end
+            flags_woce = [None] * end
+            flags_igoss = [None] * end
+            for start, num_rows, v, c in column_blocks:
+                end = start + num_rows
+                if c is None:
+                    values[start:end] = [v] * num_rows
+                    continue
+                block = c.values[:num_rows]
+                values[start:start + len(block)] = block
+                values[start + len(block):end] = \
+                    [None] * (num_rows - len(block))
+                block = c.flags_woce[:num_rows]
+                flags_woce[start:start + len(block)] = block
+                block = c.flags_igoss[:num_rows]
+                flags_igoss[start:start + len(block)] = block
+            column = df[key]
+            column.values = values
+            column.flags_woce = _trim_trailing_none(flags_woce)
+            column.flags_igoss = _trim_trailing_none(flags_igoss)
         return df
 
     def to_dict(self):
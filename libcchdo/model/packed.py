@@ -0,0 +1,411 @@
+"""A compact serialized form of DataFiles and DataFileCollections.
+
+Parameters are stored by reference (their name) instead of as SQLAlchemy
+instances and column storage is stored as contiguous buffers of machine
+integers where possible instead of lists of Python objects.
+
+The layout is::
+
+    MAGIC | header length | pickled header | buffers
+
+The header describes the files and where each column's buffers are.
+
+share() places the packed form in a shared memory file that other processes
+attach to by path, so only the path crosses the process boundary. Each process
+that attaches still decodes its own full copy of the columns; sharing saves
+the cost of moving the packed bytes, not the memory of the decoded file.
+
+"""
+import os
+import os.path
+import mmap
+import struct
+import tempfile
+from array import array
+from cPickle import dumps as pickle_dumps, loads as pickle_loads
+from itertools import izip, repeat
+from logging import getLogger
+
+
+log = getLogger(__name__)
+
+
+from libcchdo import metrics
+from libcchdo.fns import Decimal
+from libcchdo.db.model import std
+from libcchdo.model.datafile import (
+    ColumnDict, EncodedList, DataFileCollection)
+
+
+MAGIC = 'CCHDOPK1'
+
+
+_HEADER_LENGTH = struct.Struct('<I')
+
+
+_PICKLE_PROTOCOL = 2
+
+
+# Attributes that are packed separately or are caches that are rebuilt.
+_FILE_SKIP_STATE = (
+    '_columns', 'ordered_columns', '_group_indices', '_sorted_columns',
+    '_station_cast_index', )
+
+
+_COLUMN_SKIP_STATE = (
+    'parameter', '_values', 'flags_woce', 'flags_igoss', 'generation', )
+
+
+_COLLECTION_SKIP_STATE = ('files', )
+
+
+_std_parameters = {}
+_parameter_cache_hits = metrics.counter('parameters.cache_hits')
+
+
+def _pack_parameter(parameter):
+    """Return a reference to the parameter that can be packed.
+
+    Known parameters are referenced by name but also keep their attributes
+    in case the name is not found when they are unpacked.
+
+    """
+    if parameter is None:
+        return None
+    units = parameter.units
+    if units:
+        units = (units.name, units.mnemonic)
+    if getattr(parameter, 'id', None) is not None:
+        kind = 'std'
+    else:
+        kind = 'contrived'
+    return (kind, parameter.name, parameter.full_name, parameter.format,
+            units, parameter.bound_lower, parameter.bound_upper,
+            parameter.display_order)
+
+
+def _find_std_parameter(name):
+    try:
+        parameter = _std_parameters[name]
+        _parameter_cache_hits.inc()
+        return parameter
+    except KeyError:
+        parameter = _std_parameters[name] = std.find_by_mnemonic(name)
+        return parameter
+
+
+def _unpack_parameter(ref):
+    if ref is None:
+        return None
+    if ref[0] == 'std':
+        parameter = _find_std_parameter(ref[1])
+        if parameter:
+            return parameter
+        log.warn(u'Parameter {0!r} is no longer known. Using its packed '
+                 'attributes.'.format(ref[1]))
+    (name, full_name, format, units, bound_lower, bound_upper,
+     display_order) = ref[1:]
+    if units:
+        units = std.Unit(*units)
+    return std.Parameter(
+        name, full_name=full_name, format=format, units=units,
+        bound_lower=bound_lower, bound_upper=bound_upper,
+        display_order=display_order)
+
+
+class _Packer(object):
+    """Accumulates the buffers for one packed form."""
+
+    def __init__(self):
+        self.buffers = []
+        self.offset = 0
+
+    def add(self, data):
+        """Add a buffer and return its (offset, length)."""
+        self.buffers.append(data)
+        location = (self.offset, len(data))
+        self.offset += len(data)
+        return location
+
+    def _pack_ints(self, values):
+        """Return the buffers for a list of ints and Nones or None."""
+        try:
+            mask = bytearray(value is None for value in values)
+            ints = array('l', [0 if value is None else value
+                               for value in values])
+        except (TypeError, OverflowError):
+            return None
+        if any(mask):
+            mask = self.add(str(mask))
+        else:
+            mask = None
+        return (ints.itemsize, self.add(ints.tostring()), mask)
+
+    def pack_list(self, values):
+        """Return a description of where the values were packed."""
+        if isinstance(values, EncodedList):
+            return ('codes', self.add(values.codes.tostring()),
+                    list(values.table))
+        if not values:
+            return ('empty', )
+
+        types = set(type(value) for value in values)
+        types.discard(type(None))
+        if types == set([int]):
+            packed = self._pack_ints(values)
+            if packed:
+                return ('int', ) + packed
+        elif types == set([Decimal]):
+            packed = self._pack_decimals(values)
+            if packed:
+                return packed
+        return ('pickle', self.add(pickle_dumps(list(values),
+                                                _PICKLE_PROTOCOL)))
+
+    def _pack_decimals(self, values):
+        """Pack Decimals as scaled integers and their exponents."""
+        exponents = []
+        ints = []
+        for value in values:
+            if value is None:
+                exponents.append(0)
+                ints.append(None)
+                continue
+            sign, digits, exp = value.as_tuple()
+            if type(exp) is not int:
+                # NaN and Infinity
+                return None
+            scaled = int(''.join(map(str, digits)))
+            if sign:
+                if not scaled:
+                    # Negative zero does not survive as an integer
+                    return None
+                scaled = -scaled
+            exponents.append(exp)
+            ints.append(scaled)
+        packed = self._pack_ints(ints)
+        if not packed:
+            return None
+        if len(set(exponents)) == 1:
+            return ('decimal', exponents[0]) + packed
+        try:
+            exponents = array('b', exponents)
+        except OverflowError:
+            return None
+        return ('decimal', self.add(exponents.tostring())) + packed
+
+    def pack_column(self, column):
+        state = dict(
+            (key, value) for key, value in column.__dict__.items()
+            if key not in _COLUMN_SKIP_STATE)
+        return (type(column), _pack_parameter(column.parameter), state,
+                self.pack_list(column.values),
+                self.pack_list(column.flags_woce),
+                self.pack_list(column.flags_igoss))
+
+    def pack_file(self, dfile):
+        state = dict(
+            (key, value) for key, value in dfile.__dict__.items()
+            if key not in _FILE_SKIP_STATE)
+        columns = [(key, self.pack_column(column))
+                   for key, column in dfile.columns.items()]
+        keys_by_id = dict(
+            (id(column), key) for key, column in dfile.columns.items())
+        ordered = [keys_by_id[id(column)] for column in dfile.ordered_columns
+                   if id(column) in keys_by_id]
+        return ('file', type(dfile), state, columns, ordered)
+
+    def pack(self, obj):
+        if isinstance(obj, DataFileCollection):
+            state = dict(
+                (key, value) for key, value in obj.__dict__.items()
+                if key not in _COLLECTION_SKIP_STATE)
+            return ('collection', type(obj), state,
+                    [self.pack_file(dfile) for dfile in obj.files])
+        return self.pack_file(obj)
+
+
+class _Unpacker(object):
+    """Reads the buffers of one packed form."""
+
+    def __init__(self, data, base):
+        self.data = data
+        self.base = base
+
+    def buffer(self, location):
+        offset, length = location
+        start = self.base + offset
+        return self.data[start:start + length]
+
+    def _unpack_ints(self, itemsize, location, mask):
+        ints = array('l')
+        if ints.itemsize != itemsize:
+            raise ValueError(
+                u'Packed integers are {0} bytes but this platform uses '
+                '{1}'.format(itemsize, ints.itemsize))
+        ints.fromstring(self.buffer(location))
+        if mask is None:
+            return ints.tolist()
+        return [None if missing else value for value, missing in
+                izip(ints, bytearray(self.buffer(mask)))]
+
+    def unpack_list(self, description):
+        kind = description[0]
+        if kind == 'empty':
+            return []
+        elif kind == 'codes':
+            codes = array('i')
+            codes.fromstring(self.buffer(description[1]))
+            return EncodedList.from_codes(codes, description[2])
+        elif kind == 'int':
+            return self._unpack_ints(*description[1:])
+        elif kind == 'decimal':
+            exponents = description[1]
+            values = self._unpack_ints(*description[2:])
+            if type(exponents) is int:
+                exponents = repeat(exponents)
+            else:
+                location = exponents
+                exponents = array('b')
+                exponents.fromstring(self.buffer(location))
+            return [None if value is None else
+                    Decimal('{0}e{1}'.format(value, exponent))
+                    for value, exponent in izip(values, exponents)]
+        elif kind == 'pickle':
+            return pickle_loads(self.buffer(description[1]))
+        raise ValueError(u'Unknown packed list kind {0!r}'.format(kind))
+
+    def unpack_column(self, description):
+        (cls, parameter, state, values, flags_woce,
+         flags_igoss) = description
+        column = cls.__new__(cls)
+        column.__dict__.update(state)
+        column.generation = 0
+        column.parameter = _unpack_parameter(parameter)
+        column.values = self.unpack_list(values)
+        column.flags_woce = self.unpack_list(flags_woce)
+        column.flags_igoss = self.unpack_list(flags_igoss)
+        return column
+
+    def unpack_file(self, description):
+        kind, cls, state, columns, ordered = description
+        dfile = cls.__new__(cls)
+        dfile.__dict__.update(state)
+        dfile._group_indices = {}
+        dfile.columns = ColumnDict(
+            (key, self.unpack_column(column)) for key, column in columns)
+        dfile.ordered_columns = [dfile.columns[key] for key in ordered]
+        return dfile
+
+    def unpack(self, description):
+        if description[0] == 'collection':
+            kind, cls, state, files = description
+            coll = cls.__new__(cls)
+            coll.__dict__.update(state)
+            coll.files = [self.unpack_file(dfile) for dfile in files]
+            return coll
+        return self.unpack_file(description)
+
+
+def dumps(obj):
+    """Return the packed form of a DataFile or DataFileCollection."""
+    packer = _Packer()
+    header = pickle_dumps(packer.pack(obj), _PICKLE_PROTOCOL)
+    return ''.join(
+        [MAGIC, _HEADER_LENGTH.pack(len(header)), header] + packer.buffers)
+
+
+def _header_length(prefix):
+    """Return the header length given the start of a packed form."""
+    if prefix[:len(MAGIC)] != MAGIC:
+        raise ValueError(u'Not a packed DataFile')
+    header_length, = _HEADER_LENGTH.unpack(
+        prefix[len(MAGIC):len(MAGIC) + _HEADER_LENGTH.size])
+    return header_length
+
+
+def loads(data):
+    """Return the DataFile or DataFileCollection from its packed form.
+
+    data may be a string or anything that slices into strings, such as an
+    mmap.
+
+    """
+    start = len(MAGIC) + _HEADER_LENGTH.size
+    header_length = _header_length(data[:start])
+    header = pickle_loads(data[start:start + header_length])
+    return _Unpacker(data, start + header_length).unpack(header)
+
+
+def load_type(handle):
+    """Return the class of the object packed in the file handle.
+
+    Only the header is read from the handle.
+
+    """
+    header_length = _header_length(
+        handle.read(len(MAGIC) + _HEADER_LENGTH.size))
+    return pickle_loads(handle.read(header_length))[1]
+
+
+def _shared_memory_dir():
+    """Return the directory of the memory backed file system if present."""
+    if os.path.isdir('/dev/shm') and os.access('/dev/shm', os.W_OK):
+        return '/dev/shm'
+    return None
+
+
+class SharedPacked(object):
+    """A packed DataFile or DataFileCollection in shared memory.
+
+    Only the path is pickled so passing this to a worker process is cheap.
+    Workers attach() to decode their own copy from the shared memory, so the
+    packed bytes never go through a pipe. That transfer is the only saving:
+    attach() builds every column as regular lists in the worker, so each
+    attached worker holds a full copy of the file, not views of the shared
+    memory.
+
+    Use as a context manager or call unlink() to release the memory.
+
+    """
+    def __init__(self, obj, dir=None):
+        data = dumps(obj)
+        fd, self.path = tempfile.mkstemp(
+            prefix='libcchdo-', suffix='.pack',
+            dir=dir or _shared_memory_dir())
+        try:
+            os.write(fd, data)
+        finally:
+            os.close(fd)
+        self.size = len(data)
+
+    def attach(self):
+        """Return a copy of the DataFile or DataFileCollection.
+
+        The shared memory is mapped only while the copy is decoded.
+
+        """
+        with open(self.path, 'rb') as fff:
+            shared = mmap.mmap(fff.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            return loads(shared)
+        finally:
+            shared.close()
+
+    def unlink(self):
+        try:
+            os.unlink(self.path)
+        except OSError, err:
+            log.warn(u'Unable to remove shared {0}: {1}'.format(
+                self.path, err))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.unlink()
+
+
+def share(obj, dir=None):
+    """Place the packed form of obj in shared memory and return its handle."""
+    return SharedPacked(obj, dir)
@@ -0,0 +1,144 @@
+"""Select rows of DataFiles with predicates on their columns and flags.
+
+Predicates are built from column references and combined with &, | and ~::
+
+    from libcchdo.model.query import column
+    pres = column('CTDPRS')
+    dfile.query(pres.between(0, 100) & (pres.flag_woce == 2) &
+                column('STNNBR').isin(['1', '2']))
+
+A predicate is evaluated a column at a time into a mask of booleans, one per
+row. Missing values (None) never satisfy a comparison.
+
+"""
+from operator import eq, ne, lt, le, gt, ge, and_, or_, not_
+from itertools import repeat
+
+from libcchdo.model.datafile import CAST_KEY_COLS
+
+
+def _between(value, bounds):
+    return bounds[0] <= value <= bounds[1]
+
+
+def _isin(value, values):
+    return value in values
+
+
+class Predicate(object):
+    """A condition on the rows of a DataFile."""
+
+    def mask(self, dfile):
+        """Return a list of booleans for whether each row satisfies."""
+        raise NotImplementedError()
+
+    def __and__(self, other):
+        return _Combined(and_, self, other)
+
+    def __or__(self, other):
+        return _Combined(or_, self, other)
+
+    def __invert__(self):
+        return _Inverted(self)
+
+
+class _Combined(Predicate):
+    def __init__(self, op, aaa, bbb):
+        self.op = op
+        self.aaa = aaa
+        self.bbb = bbb
+
+    def mask(self, dfile):
+        return map(self.op, self.aaa.mask(dfile), self.bbb.mask(dfile))
+
+
+class _Inverted(Predicate):
+    def __init__(self, predicate):
+        self.predicate = predicate
+
+    def mask(self, dfile):
+        return map(not_, self.predicate.mask(dfile))
+
+
+class _Comparison(Predicate):
+    def __init__(self, ref, op, operand):
+        self.ref = ref
+        self.op = op
+        self.operand = operand
+
+    def _test(self, value):
+        return value is not None and self.op(value, self.operand)
+
+    def mask(self, dfile):
+        length = len(dfile)
+        if self.ref.field == 'values' and self.ref.name in CAST_KEY_COLS:
+            try:
+                return self._mask_by_cast(dfile, length)
+            except KeyError:
+                pass
+
+        values = getattr(dfile[self.ref.name], self.ref.field)
+        mask = map(self._test, values[:length])
+        if len(mask) < length:
+            mask.extend(repeat(False, length - len(mask)))
+        return mask
+
+    def _mask_by_cast(self, dfile, length):
+        """Test once per station cast instead of once per row."""
+        index = dfile.group_index()
+        ikey = CAST_KEY_COLS.index(self.ref.name)
+        mask = [False] * length
+        for key, rows in index.groups.iteritems():
+            if self._test(key[ikey]):
+                for row in rows:
+                    mask[row] = True
+        return mask
+
+
+class ColumnReference(object):
+    """Refers to the values or flags of a column by parameter mnemonic.
+
+    Comparing a reference makes a Predicate.
+
+    """
+    def __init__(self, name, field='values'):
+        self.name = name
+        self.field = field
+
+    @property
+    def flag_woce(self):
+        return ColumnReference(self.name, 'flags_woce')
+
+    @property
+    def flag_igoss(self):
+        return ColumnReference(self.name, 'flags_igoss')
+
+    def __eq__(self, operand):
+        return _Comparison(self, eq, operand)
+
+    def __ne__(self, operand):
+        return _Comparison(self, ne, operand)
+
+    def __lt__(self, operand):
+        return _Comparison(self, lt, operand)
+
+    def __le__(self, operand):
+        return _Comparison(self, le, operand)
+
+    def __gt__(self, operand):
+        return _Comparison(self, gt, operand)
+
+    def __ge__(self, operand):
+        return _Comparison(self, ge, operand)
+
+    def between(self, lower, upper):
+        """Inclusive of both bounds."""
+        return _Comparison(self, _between, (lower, upper))
+
+    def isin(self, values):
+        return _Comparison(self, _isin, frozenset(values))
+
+
+def column(name):
+    """Return a reference to the values of the column for use in predicates."""
+    return ColumnReference(name)
@@ -122,6 +122,17 @@ def subcommand(superparser, name, func):
 hydro_parser = NiceUsageArgumentParser(
     description='libcchdo tools',
     formatter_class=RawTextHelpFormatter)
+hydro_parser.add_argument(
+    '--timings', action='store_true',
+    help='report the wall and CPU time of each stage (read, '
+         'check_and_replace_parameters, merge, write, zip...) as JSON on '
+         'stderr')
+hydro_parser.add_argument(
+    '--timings-file', metavar='FILE',
+    help='write the timings report to FILE instead of stderr')
+hydro_parser.add_argument(
+    '--profile', metavar='FILE',
+    help='write cProfile statistics for the run to FILE')
 
 
 hydro_subparsers = hydro_parser.add_subparsers(
@@ -258,6 +269,17 @@ with subcommand(check_parsers, 'any', check_any) as p:
 
 converter_parser = hydro_subparsers.add_parser(
     'convert', help='Format converters')
+converter_parser.add_argument(
+    '--cache', action='store_true',
+    help='reuse the output of identical earlier conversions')
+converter_parser.add_argument(
+    '--cache-dir', default=None, metavar='DIR',
+    help='directory to store cached outputs in (default: conversion_cache in '
+         'the configuration directory)')
+converter_parser.add_argument(
+    '--cache-size', type=int, default=1024, metavar='MB',
+    help='evict the least recently used outputs beyond this size '
+         '(default: 1024)')
 converter_parsers = converter_parser.add_subparsers(
     title='format converters')
 
@@ -1124,6 +1146,86 @@ with subcommand(misc_converter_parsers, 'bonus_goodhope',
         help='output CTD ZIP Exchange file')
 
 
+def convert_batch(args):
+    """Run a converter over many files in a pool of worker processes.
+
+    Each input is written to a file of the same name in the output directory.
+    Nothing is converted if two inputs would be written to the same file. A
+    file that fails to convert does not stop the others. A summary of the
+    failures and timings is printed at the end.
+
+    """
+    from shlex import split
+    from libcchdo.batch import find_inputs, convert_files, summarize
+
+    converter_argv = ['convert']
+    if args.cache:
+        converter_argv.append('--cache')
+        if args.cache_dir:
+            converter_argv.extend(['--cache-dir', args.cache_dir])
+        converter_argv.extend(['--cache-size', str(args.cache_size)])
+    converter_argv.extend(args.converter.replace('/', ' ').split())
+    if args.args:
+        converter_argv.extend(split(args.args))
+
+    inputs = find_inputs(args.inputs)
+    if not inputs:
+        log.error(u'No files found in {0}'.format(args.inputs))
+        return 1
+
+    def convert():
+        return convert_files(
+            hydro_parser, converter_argv, inputs, args.outdir, args.suffix,
+            args.processes, args.files_per_worker, _run_conversion)
+
+    try:
+        if args.metrics:
+            from libcchdo.metrics import PeriodicDump
+            with PeriodicDump(args.metrics, args.metrics_interval):
+                results = convert()
+        else:
+            results = convert()
+    except ValueError, err:
+        log.error(unicode(err))
+        return 1
+    for line in summarize(results):
+        print line
+    if any(result['error'] for result in results):
+        return 1
+    return 0
+
+
+with subcommand(converter_parsers, 'batch', convert_batch) as p:
+    p.add_argument(
+        '-j', '--processes', type=int, default=None,
+        help='number of worker processes (default: number of CPUs)')
+    p.add_argument(
+        '--files-per-worker', type=int, default=10,
+        help='replace a worker after it has converted this many files to '
+             'release its memory (default: 10)')
+    p.add_argument(
+        '--suffix', default=None,
+        help='replace the extension of each output file with this')
+    p.add_argument(
+        '--args', default=None,
+        help='options to pass to the converter, e.g. "-t btl.woce"')
+    p.add_argument(
+        '--metrics', metavar='FILE',
+        help='append snapshots of the library metrics to FILE as JSON lines')
+    p.add_argument(
+        '--metrics-interval', type=float, default=60, metavar='SECONDS',
+        help='seconds between metrics snapshots (default: 60)')
+    p.add_argument(
+        'converter',
+        help='the converter to run, e.g. bottle/exchange_to_woce')
+    p.add_argument(
+        'inputs',
+        help='a directory or a glob of input files')
+    p.add_argument(
+        'outdir',
+        help='the directory to write outputs into')
+
+
 merge_parser = hydro_subparsers.add_parser(
     'merge', help='Mergers')
 merge_parsers = merge_parser.add_subparsers(title='mergers')
@@ -1346,6 +1448,126 @@ with subcommand(merge_parsers, 'ctdzipex_and_ctdzipex',
 
 
 
+def diff_any(args):
+    """Show the differences between two versions of a dataset.
+
+    Rows are matched on key columns and the common parameters are compared in
+    parallel. A summary of changed parameters, rows and flag changes is
+    written. Optionally, every change is also written as a JSON patch.
+
+    """
+    import json
+    from libcchdo.fns import decimal_to_str
+    from libcchdo.merge import diff_files, DFILE_KEY_COLS
+
+    with closing(args.origin) as in_file:
+        origin = read_arbitrary(in_file, args.input_type)
+    with closing(args.derivative) as in_file:
+        deriv = read_arbitrary(in_file, args.input_type)
+
+    if args.key:
+        keys = [xxx.strip() for xxx in args.key.split(',')]
+    else:
+        keys = None
+    diff = diff_files(
+        origin, deriv, keys, processes=args.processes,
+        patch=args.patch is not None)
+
+    def fmt_flag_changes(changes):
+        return ', '.join(
+            '{0}->{1}: {2}'.format(ofl, dfl, num) for (ofl, dfl), num in
+            sorted(changes.items()))
+
+    with closing(args.output) as out_file:
+        out_file.write(u'Keys: {0}\n'.format(
+            '; '.join(', '.join(keys) for keys in diff['keys'])))
+        out_file.write(u'Changed parameters: {0}\n'.format(
+            ', '.join(diff['parameters'].keys())))
+        for param, summary in diff['parameters'].items():
+            if summary['values']:
+                out_file.write(u'  {0}: {1} rows\n'.format(
+                    param, summary['values']))
+            for ending, field in [
+                    ('_FLAG_W', 'flags_woce'), ('_FLAG_I', 'flags_igoss')]:
+                changes = summary[field]
+                if changes:
+                    out_file.write(u'  {0}{1}: {2} rows ({3})\n'.format(
+                        param, ending, sum(changes.values()),
+                        fmt_flag_changes(changes)))
+        for label, field in [
+                ('Changed units', 'units_changed'),
+                ('Not in origin', 'not_in_origin'),
+                ('Not in derivative', 'not_in_derivative')]:
+            if diff[field]:
+                out_file.write(u'{0}: {1}\n'.format(
+                    label, ', '.join(diff[field])))
+        for label, field in [
+                ('Files added', 'files_added'),
+                ('Files removed', 'files_removed')]:
+            if diff[field]:
+                out_file.write(u'{0}: {1}\n'.format(label, '; '.join(
+                    ', '.join(map(unicode, dfkey)) for dfkey in diff[field])))
+        out_file.write(u'Unmatched rows: origin {0}, derivative {1}\n'.format(
+            diff['unmatched_origin_rows'], diff['unmatched_derivative_rows']))
+
+    if args.patch is None:
+        return
+
+    def jsonable(value):
+        if value is None or type(value) is int:
+            return value
+        return decimal_to_str(value)
+
+    patch = []
+    for param, summary in diff['parameters'].items():
+        for ipair, field, row, key, oval, dval in summary['patch']:
+            if field == 'value':
+                column = param
+            else:
+                column = param + field
+            patch.append({
+                'file': ipair,
+                'column': column,
+                'row': row,
+                'key': [jsonable(kkk) for kkk in key] if key else None,
+                'origin': jsonable(oval),
+                'derivative': jsonable(dval),
+            })
+    for change, field in [
+            ('added', 'files_added'), ('removed', 'files_removed')]:
+        for dfkey in diff[field]:
+            patch.append({
+                'file_key': dict(zip(DFILE_KEY_COLS, map(jsonable, dfkey))),
+                'change': change,
+            })
+    with closing(args.patch) as patch_file:
+        json.dump(patch, patch_file, indent=1)
+        patch_file.write('\n')
+
+
+with subcommand(hydro_subparsers, 'diff', diff_any) as p:
+    p.add_argument('-i', '--input-type', choices=known_formats,
+        help='force the input files to be read as the specified type')
+    p.add_argument(
+        '--key', type=str,
+        help='Comma separated columns to match rows on (default: guess)')
+    p.add_argument(
+        '-j', '--processes', type=int, default=None,
+        help='number of processes to compare with (default: number of CPUs)')
+    p.add_argument(
+        '--patch', type=FileType('w'), default=None,
+        help='write every change as a JSON patch to this file')
+    p.add_argument(
+        'origin', type=FileType('r'),
+        help='any recognized CCHDO file')
+    p.add_argument(
+        'derivative', type=FileType('r'),
+        help='a newer version of the origin file')
+    p.add_argument(
+        'output', type=FileType('w'), nargs='?', default=sys.stdout,
+        help='output summary (default: stdout)')
+
+
 plot_parser = hydro_subparsers.add_parser(
     'plot', help='Plotters')
 plot_parsers = plot_parser.add_subparsers(title='plotters')
@@ -1758,6 +1980,61 @@ misc_parser = hydro_subparsers.add_parser(
 misc_parsers = misc_parser.add_subparsers(title='miscellaneous')
 
 
+def benchmark(args):
+    """Benchmark reading, writing and manipulating large synthetic cruises.
+
+    Exits with an error if any case regressed against the baseline.
+
+    """
+    import json
+    from libcchdo.benchmark import run, compare, format_report
+
+    report = run(args.cases, args.scale, args.repeat, args.inputs)
+    for line in format_report(report):
+        print line
+
+    if args.output:
+        with open(args.output, 'w') as out:
+            json.dump(report, out, indent=2)
+
+    if not args.baseline:
+        return 0
+    with open(args.baseline) as handle:
+        baseline = json.load(handle)
+    regressions = compare(report, baseline, args.threshold)
+    for name, key, base, value in regressions:
+        print u'REGRESSED {0} {1}: {2} -> {3}'.format(name, key, base, value)
+    if regressions:
+        return 1
+    return 0
+
+
+with subcommand(misc_parsers, 'benchmark', benchmark) as p:
+    p.add_argument(
+        '--scale', type=float, default=1.0,
+        help='multiply the sizes of the synthetic inputs (default: 1)')
+    p.add_argument(
+        '--repeat', type=int, default=1,
+        help='run each case this many times and keep the fastest '
+             '(default: 1)')
+    p.add_argument(
+        '--inputs', metavar='DIR',
+        help='keep generated inputs in DIR to reuse them in later runs')
+    p.add_argument(
+        '--output', metavar='FILE',
+        help='write the JSON report to FILE')
+    p.add_argument(
+        '--baseline', metavar='FILE',
+        help='compare against a JSON report written earlier')
+    p.add_argument(
+        '--threshold', type=float, default=0.25,
+        help='the fraction over the baseline that is a regression '
+             '(default: 0.25)')
+    p.add_argument(
+        'cases', nargs='*',
+        help='the cases to run (default: all)')
+
+
 def get_ctdex_name(args):
     """Get correct name of an Exchange CTD file."""
     from libcchdo.model.datafile import DataFile
@@ -2157,10 +2434,35 @@ def env(args):
 
 with subcommand(hydro_subparsers, 'env', env) as p:
     p.add_argument(
-        'environment', nargs='?', 
+        'environment', nargs='?',
         help='the environment to set')
 
 
+def worker(args):
+    """Keep hydro loaded and run subcommands sent by hydro-client.
+
+    Each subcommand runs in a fork of the loaded process so it does not pay
+    for startup, imports, the format scan or the parameter database check.
+
+    """
+    from libcchdo.worker import serve, serve_stdio
+
+    if args.stdio:
+        serve_stdio()
+    else:
+        serve(args.socket)
+
+
+with subcommand(hydro_subparsers, 'worker', worker) as p:
+    p.add_argument(
+        '--socket', default=None,
+        help='the Unix socket to listen on (default: $HYDRO_WORKER_SOCKET or '
+             'worker.sock in the configuration directory)')
+    p.add_argument(
+        '--stdio', action='store_true',
+        help='read jobs from stdin and write responses to stdout instead')
+
+
 def _subparsers(parser):
     """Get the subparsers for an ArgumentParser."""
     try:
@@ -2211,6 +2513,42 @@ except ImportError:
     pass
     
 
+def _run_conversion(args):
+    """Run the parsed arguments, through the conversion cache if asked to."""
+    if not getattr(args, 'cache', None) or args.main is convert_batch:
+        return args.main(args)
+
+    from libcchdo.conversion_cache import ConversionCache, run_cached
+
+    cache = ConversionCache(args.cache_dir, args.cache_size * 2 ** 20)
+    return run_cached(
+        cache, args, ignore=('cache', 'cache_dir', 'cache_size', ))
+
+
+def _run_timed(args):
+    """Run the parsed arguments, timing and profiling them if asked to."""
+    if not (args.timings or args.timings_file or args.profile):
+        return _run_conversion(args)
+
+    from libcchdo import timings
+
+    timings.enable()
+    timings.instrument_formats()
+    try:
+        if args.profile:
+            from cProfile import Profile
+            profiler = Profile()
+            try:
+                return profiler.runcall(_run_conversion, args)
+            finally:
+                profiler.dump_stats(args.profile)
+        return _run_conversion(args)
+    finally:
+        recorded = timings.disable()
+        if args.timings or args.timings_file:
+            timings.write_report(recorded, args.timings_file)
+
+
 def main():
     """The main program that wraps all subcommands."""
     from libcchdo.db.model import ignore_sa_warnings
@@ -2218,6 +2556,6 @@ def main():
     args = hydro_parser.parse_args()
     with ignore_sa_warnings():
         try:
-            hydro_parser.exit(args.main(args))
+            hydro_parser.exit(_run_timed(args))
         except Exception, err:
             log.critical(format_exc(err))
@@ -0,0 +1,77 @@
+from unittest import TestCase
+from argparse import ArgumentParser, FileType
+from tempfile import mkdtemp
+from shutil import rmtree
+import os
+import os.path
+
+from libcchdo.batch import find_inputs, convert_files, summarize
+
+
+def upper(args):
+    data = args.input.read()
+    if data == 'fail':
+        raise ValueError(u'cannot convert')
+    args.output.write(data.upper())
+
+
+parser = ArgumentParser()
+parser.add_argument('input', type=FileType('r'))
+parser.add_argument('output', type=FileType('w'))
+parser.set_defaults(main=upper)
+
+
+class TestBatch(TestCase):
+
+    def setUp(self):
+        self.directory = mkdtemp()
+        self.indir = os.path.join(self.directory, 'in')
+        self.outdir = os.path.join(self.directory, 'out')
+        os.mkdir(self.indir)
+        for name, data in [('a.txt', 'a'), ('b.txt', 'fail'), ('c.txt', 'c')]:
+            with open(os.path.join(self.indir, name), 'w') as fff:
+                fff.write(data)
+
+    def tearDown(self):
+        rmtree(self.directory)
+
+    def check_results(self, results):
+        self.assertEqual(
+            ['a.txt', 'b.txt', 'c.txt'],
+            [os.path.basename(result['input']) for result in results])
+        self.assertEqual(None, results[0]['error'])
+        self.assertTrue('cannot convert' in results[1]['error'])
+        self.assertEqual(
+            ['a.out', 'c.out'], sorted(os.listdir(self.outdir)))
+        with open(os.path.join(self.outdir, 'c.out')) as fff:
+            self.assertEqual('C', fff.read())
+        self.assertTrue('Converted 2 of 3 files, 1 failed' in
+                        summarize(results)[0])
+
+    def test_serial(self):
+        """A failing file does not stop the other files converting."""
+        inputs = find_inputs(self.indir)
+        self.check_results(convert_files(
+            parser, [], inputs, self.outdir, '.out', processes=1))
+
+    def test_pool(self):
+        inputs = find_inputs(os.path.join(self.indir, '*.txt'))
+        self.check_results(convert_files(
+            parser, [], inputs, self.outdir, '.out', processes=2,
+            files_per_worker=1))
+
+    def test_output_collision(self):
+        """Inputs that would overwrite each other's output are refused."""
+        other = os.path.join(self.directory, 'other')
+        os.mkdir(other)
+        with open(os.path.join(other, 'a.txt'), 'w') as fff:
+            fff.write('other')
+        with open(os.path.join(self.indir, 'c.csv'), 'w') as fff:
+            fff.write('csv')
+        inputs = find_inputs(self.indir) + find_inputs(other)
+        with self.assertRaises(ValueError) as context:
+            convert_files(parser, [], inputs, self.outdir, '.out', processes=1)
+        message = unicode(context.exception)
+        self.assertTrue(os.path.join(self.outdir, 'a.out') in message)
+        self.assertTrue(os.path.join(self.outdir, 'c.out') in message)
+        self.assertFalse(os.path.exists(self.outdir))
@@ -0,0 +1,49 @@
+from unittest import TestCase
+
+from libcchdo import benchmark
+
+
+class TestBenchmark(TestCase):
+
+    def test_run(self):
+        """Cases report their timings and peak memory."""
+        report = benchmark.run(
+            ['read_btl_ex', 'split_on_cast_btl', 'read_ctdzip_woce'],
+            scale=0.002)
+        self.assertEqual(
+            ['read_btl_ex', 'split_on_cast_btl', 'read_ctdzip_woce'],
+            report['cases'].keys())
+        for result in report['cases'].values():
+            self.assertFalse('error' in result, result.get('error'))
+            self.assertTrue(result['wall'] >= 0)
+            self.assertTrue(result['peak_rss_kb'] > 0)
+        # Reads also report the memory held by what was read.
+        self.assertTrue(report['cases']['read_btl_ex']['data_bytes'] > 0)
+        self.assertTrue(
+            report['cases']['read_ctdzip_woce']['data_bytes_per_row'] > 0)
+        self.assertFalse('data_bytes' in report['cases']['split_on_cast_btl'])
+
+    def test_merge_repeats(self):
+        """The merge case merges matching rows on every run."""
+        report = benchmark.run(['merge_btl'], scale=0.002, repeat=2)
+        result = report['cases']['merge_btl']
+        self.assertFalse('error' in result, result.get('error'))
+
+    def test_unknown_case(self):
+        with self.assertRaises(KeyError):
+            benchmark.run(['not_a_case'])
+
+    def test_compare(self):
+        baseline = {'scale': 1, 'cases': {
+            'a': {'wall': 1.0, 'peak_rss_growth_kb': 100},
+            'b': {'wall': 1.0, 'peak_rss_growth_kb': 0},
+            'c': {'skipped': 'missing dependency'},
+        }}
+        report = {'scale': 1, 'cases': {
+            'a': {'wall': 1.1, 'peak_rss_growth_kb': 200},
+            'b': {'wall': 2.0, 'peak_rss_growth_kb': 50},
+            'c': {'wall': 5.0, 'peak_rss_growth_kb': 50},
+        }}
+        self.assertEqual(
+            [('a', 'peak_rss_growth_kb', 100, 200), ('b', 'wall', 1.0, 2.0)],
+            sorted(benchmark.compare(report, baseline, 0.25)))
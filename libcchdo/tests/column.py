@@ -3,7 +3,8 @@
 
 from unittest import TestCase
 
-from libcchdo.model.datafile import Column
+from libcchdo.model.datafile import Column, EncodedList
+from libcchdo.fns import _decimal
 from libcchdo.db.model import std
 
 
@@ -129,3 +130,44 @@ class TestColumn(TestCase):
 
 
 
+
+    def test_view(self):
+        """A view shares storage with its column until the view is written."""
+        self.column.values = [1, 2, 3, 4]
+        self.column.flags_woce = [2, 3]
+        view = self.column.view(slice(1, 4))
+        self.assertEqual([2, 3, 4], view.values)
+        self.assertEqual([3], view.flags_woce)
+        self.assertEqual([], view.flags_igoss)
+
+        self.column[1] = 5
+        self.assertEqual([5, 3, 4], view.values)
+
+        view[0] = 6
+        view.append(7)
+        self.assertEqual([6, 3, 4, 7], view.values)
+        self.assertEqual([1, 5, 3, 4], self.column.values)
+
+        view = self.column.view([3, 0, 3])
+        self.assertEqual([4, 1, 4], view.values)
+        self.assertEqual([4, 1], view.view([0, 1]).values)
+        self.assertEqual([None, 2, None], view.flags_woce)
+
+    def test_encoded_identifiers(self):
+        """Identifier columns store codes into a table of distinct values."""
+        self.column.values = ['A', 'B', 'A']
+        self.column.append('B')
+        values = self.column.values
+        self.assertTrue(isinstance(values, EncodedList))
+        self.assertEqual(['A', 'B', 'A', 'B'], values)
+        self.assertEqual([0, 1, 0, 1], list(values.codes))
+        self.assertEqual(['A', 'B'], values.table)
+
+        values = EncodedList([_decimal('1'), _decimal('1.0'), 1])
+        self.assertEqual(['1', '1.0', '1'], map(str, values))
+        self.assertEqual(int, type(values[2]))
+        self.assertFalse(values.is_table_distinct())
+        self.assertTrue(_decimal('1.00') in values)
+
+        self.assertEqual([], Column('CTDPRS').values)
+        self.assertFalse(isinstance(Column('CTDPRS').values, EncodedList))
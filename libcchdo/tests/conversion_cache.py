@@ -0,0 +1,134 @@
+from unittest import TestCase
+from argparse import Namespace
+from tempfile import mkdtemp
+from shutil import rmtree
+import os
+import os.path
+import time
+
+from libcchdo.util import pyStringIO
+from libcchdo.tests import sample_file
+from libcchdo.conversion_cache import ConversionCache, run_cached
+
+
+class TestConversionCache(TestCase):
+
+    def setUp(self):
+        self.directory = mkdtemp()
+        self.calls = 0
+
+    def tearDown(self):
+        rmtree(self.directory)
+
+    def convert(self, args):
+        self.calls += 1
+        args.output.write(args.input.read().upper() + args.suffix)
+        args.output.close()
+
+    def run_convert(self, cache, content, suffix='!'):
+        output_path = os.path.join(self.directory, 'out.txt')
+        args = Namespace(
+            main=self.convert, input=pyStringIO(content),
+            output=open(output_path, 'w'), suffix=suffix)
+        self.assertFalse(run_cached(cache, args))
+        with open(output_path) as fff:
+            return fff.read()
+
+    def test_run_cached(self):
+        """Identical conversions are only run once."""
+        cache = ConversionCache(os.path.join(self.directory, 'cache'))
+        self.assertEqual('ABC!', self.run_convert(cache, 'abc'))
+        self.assertEqual('ABC!', self.run_convert(cache, 'abc'))
+        self.assertEqual(1, self.calls)
+
+        self.assertEqual('ABD!', self.run_convert(cache, 'abd'))
+        self.assertEqual('ABC?', self.run_convert(cache, 'abc', '?'))
+        self.assertEqual(3, self.calls)
+
+    def convert_suffix_file(self, args):
+        self.calls += 1
+        with open(args.suffix_file) as fff:
+            args.output.write(args.input.read() + fff.read())
+        args.output.close()
+
+    def run_convert_suffix_file(self, cache, suffix_file):
+        output_path = os.path.join(self.directory, 'out.txt')
+        args = Namespace(
+            main=self.convert_suffix_file, input=pyStringIO('abc'),
+            output=open(output_path, 'w'), suffix_file=suffix_file)
+        self.assertFalse(run_cached(cache, args))
+        with open(output_path) as fff:
+            return fff.read()
+
+    def test_run_cached_path_arguments(self):
+        """Files named by path arguments are keyed by their contents."""
+        cache = ConversionCache(os.path.join(self.directory, 'cache'))
+        suffix_path = os.path.join(self.directory, 'suffix.txt')
+        with open(suffix_path, 'w') as fff:
+            fff.write('!')
+        self.assertEqual(
+            'abc!', self.run_convert_suffix_file(cache, suffix_path))
+        self.assertEqual(
+            'abc!', self.run_convert_suffix_file(cache, suffix_path))
+        self.assertEqual(1, self.calls)
+
+        with open(suffix_path, 'w') as fff:
+            fff.write('?')
+        self.assertEqual(
+            'abc?', self.run_convert_suffix_file(cache, suffix_path))
+        self.assertEqual(2, self.calls)
+
+    def test_run_cached_directory_arguments(self):
+        """Conversions given directories are not cached."""
+        cache = ConversionCache(os.path.join(self.directory, 'cache'))
+        subdir = os.path.join(self.directory, 'sub')
+        os.mkdir(subdir)
+        def convert(args):
+            self.calls += 1
+            args.output.write(args.input.read())
+            args.output.close()
+        for i in range(2):
+            args = Namespace(
+                main=convert, input=pyStringIO('abc'),
+                output=open(os.path.join(self.directory, 'out.txt'), 'w'),
+                directory=subdir)
+            self.assertFalse(run_cached(cache, args))
+        self.assertEqual(2, self.calls)
+        self.assertEqual([], cache.entries())
+
+    def test_hydro_convert_cache(self):
+        """--cache is a flag given before the converter."""
+        from libcchdo.scripts import hydro_parser, _run_conversion
+        cache_dir = os.path.join(self.directory, 'cache')
+        input_path = sample_file('bottle_exchange', '64PE20050907_hy1.csv')
+        outputs = []
+        for i in range(2):
+            output_path = os.path.join(self.directory, 'out{0}.txt'.format(i))
+            args = hydro_parser.parse_args([
+                'convert', '--cache', '--cache-dir', cache_dir, 'any', 'type',
+                '-t', 'btl.ex', input_path, output_path])
+            self.assertTrue(args.cache)
+            self.assertFalse(_run_conversion(args))
+            with open(output_path) as fff:
+                outputs.append(fff.read())
+        self.assertEqual(1, len(ConversionCache(cache_dir).entries()))
+        self.assertEqual(outputs[0], outputs[1])
+
+        args = hydro_parser.parse_args([
+            'convert', '--cache', 'bottle', 'exchange_to_woce', input_path])
+        self.assertTrue(args.cache)
+        self.assertEqual(None, args.cache_dir)
+
+    def test_evict_least_recently_used(self):
+        cache = ConversionCache(
+            os.path.join(self.directory, 'cache'), max_bytes=8)
+        cache.put('a', pyStringIO('1234'))
+        cache.put('b', pyStringIO('1234'))
+        past = time.time() - 60
+        os.utime(os.path.join(cache.directory, 'b'), (past, past))
+        self.assertTrue(cache.get('a'))
+
+        cache.put('c', pyStringIO('1234'))
+        self.assertTrue(cache.get('a'))
+        self.assertEqual(None, cache.get('b'))
+        self.assertTrue(cache.get('c'))
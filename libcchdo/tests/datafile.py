@@ -1,7 +1,11 @@
 from unittest import TestCase
 
-from libcchdo.model.datafile import DataFile, Column
+from libcchdo.model.datafile import DataFile, DataFileCollection, Column
 from libcchdo.fns import _decimal
+from libcchdo.db.model import std
+from libcchdo.model.convert.datafile_to_datafilecollection import (
+    split_on_cast)
+from libcchdo.model.query import column
 
 
 class TestDataFile(TestCase):
@@ -45,7 +49,42 @@ class TestDataFile(TestCase):
         # If lengths are equal and all expected in received, then assume equal
         self.assertEqual(len(expected), len(received))
         self.assertTrue(all( [x in received for x in expected] ))
-  
+
+    def test_sorted_columns_cached(self):
+        """The column order is recomputed only when columns change."""
+        dfile = DataFile()
+        for name, order in [('B', 20), ('A', 10)]:
+            dfile[name] = Column(
+                std.make_contrived_parameter(name, display_order=order))
+        names = lambda: [c.parameter.name for c in dfile.sorted_columns()]
+        self.assertEqual(['A', 'B'], names())
+        self.assertTrue(dfile.sorted_columns()[0] is dfile['A'])
+
+        dfile['C'] = Column(std.make_contrived_parameter('C', display_order=5))
+        self.assertEqual(['C', 'A', 'B'], names())
+        del dfile['C']
+        self.assertEqual(['A', 'B'], names())
+
+        dfile['A'].parameter = std.make_contrived_parameter(
+            'D', display_order=30)
+        self.assertEqual(['B', 'D'], names())
+
+        dfile['A'].append(1)
+        dfile.ordered_columns.append(dfile['A'])
+        self.assertEqual(['D'], names())
+
+    def test_sorted_columns_cached_fills(self):
+        """Ordered columns appear once they have values."""
+        dfile = DataFile()
+        dfile.create_columns(['CTDPRS', 'CTDTMP'], ordered=True)
+        self.assertEqual([], dfile.column_headers())
+        dfile['CTDPRS'].append(1)
+        dfile['CTDTMP'].append(2)
+        self.assertEqual(['CTDPRS', 'CTDTMP'], dfile.column_headers())
+
+        dfile.ordered_columns[:] = [dfile['CTDTMP'], dfile['CTDPRS']]
+        self.assertEqual(['CTDTMP', 'CTDPRS'], dfile.column_headers())
+
     def test_get_property_for_columns(self):
         pass # This is tested by the following tests.
   
@@ -108,6 +147,195 @@ class TestDataFile(TestCase):
         col.check_and_replace_parameter(self.file, convert=False)
 
 
+    def test_reorder_file_pressure(self):
+        """Rows are ordered by pressure then bottle within each station cast."""
+        dfile = DataFile()
+        dfile.create_columns(['STNNBR', 'CASTNO', 'CTDPRS', 'BTLNBR'])
+        rows = [
+            ('2', '1', 10, '1', 2),
+            ('2', '1', 5, '2', 3),
+            ('2', '1', 5, '3', 2),
+            ('1', '1', 30, '1', 2),
+            ('1', '1', 20, '2', 4),
+            ('1', '1', 40, '3', 2),
+        ]
+        for stn, cast, pres, btl, flag in rows:
+            dfile['STNNBR'].append(stn)
+            dfile['CASTNO'].append(cast)
+            dfile['CTDPRS'].append(pres, flag)
+            dfile['BTLNBR'].append(btl)
+        dfile.reorder_file_pressure()
+        self.assertEqual(['2', '2', '2', '1', '1', '1'], dfile['STNNBR'].values)
+        self.assertEqual([5, 5, 10, 20, 30, 40], dfile['CTDPRS'].values)
+        self.assertEqual([2, 3, 2, 4, 2, 2], dfile['CTDPRS'].flags_woce)
+        self.assertEqual(['3', '2', '1', '2', '1', '3'], dfile['BTLNBR'].values)
+
+    def test_group_index(self):
+        """Rows are indexed by station cast and the index follows changes."""
+        dfile = DataFile()
+        dfile.create_columns(['STNNBR', 'CASTNO'])
+        for stn, cast in [('1', 1), ('1', 1), ('2', 1), ('1', 1), ('1', 2)]:
+            dfile['STNNBR'].append(stn)
+            dfile['CASTNO'].append(cast)
+
+        index = dfile.group_index()
+        self.assertEqual(
+            [(('1', 1), 0, 2), (('2', 1), 2, 3), (('1', 1), 3, 4),
+             (('1', 2), 4, 5)], index.runs)
+        self.assertEqual([0, 1, 3], list(index.rows(('1', 1))))
+        self.assertEqual([0, 0, 1, 2, 3], index.run_ids())
+        self.assertFalse(index.is_contiguous())
+        self.assertTrue(dfile.group_index() is index)
+
+        dfile['STNNBR'][3] = '2'
+        index = dfile.group_index()
+        self.assertEqual([2, 3], list(index.rows(('2', 1))))
+
+        dfile['STNNBR'].append('3')
+        dfile['CASTNO'].append(1)
+        self.assertTrue(('3', 1) in dfile.group_index())
+
+        dfile['CASTNO'] = Column('CASTNO')
+        dfile['CASTNO'].values = [1] * 6
+        self.assertEqual(3, len(dfile.group_index()))
+
+        dfile['STNNBR'].set_rows(0, 6, ['4'] * 6)
+        self.assertEqual([('4', 1)], dfile.group_index().groups.keys())
+
+        empty = DataFile()
+        empty.create_columns(['STNNBR', 'CASTNO'])
+        self.assertEqual([], empty.group_index().runs)
+
+    def test_split_on_cast(self):
+        """Each station cast run becomes a file with its slice of the rows."""
+        dfile = DataFile()
+        dfile.create_columns(['EXPOCODE', 'STNNBR', 'CASTNO', 'CTDPRS'])
+        dfile.globals['header'] = '#header\n'
+        rows = [
+            ('A', '1', 1, 1, 2),
+            ('A', '1', 1, 2, None),
+            ('A', '1', 2, 3, 3),
+            ('A', '2', 1, 4, 2),
+        ]
+        for expo, stn, cast, pres, flag in rows:
+            dfile['EXPOCODE'].append(expo)
+            dfile['STNNBR'].append(stn)
+            dfile['CASTNO'].append(cast)
+            dfile['CTDPRS'].append(pres, flag)
+
+        coll = split_on_cast(dfile)
+        self.assertEqual(3, len(coll))
+        files = coll.files
+        self.assertEqual([[1, 2], [3], [4]],
+                         [fff['CTDPRS'].values for fff in files])
+        self.assertEqual([[2], [3], [2]],
+                         [fff['CTDPRS'].flags_woce for fff in files])
+        self.assertFalse(files[0]['STNNBR'].is_flagged_woce())
+        self.assertEqual('#header\n', files[2].globals['header'])
+        self.assertTrue(
+            files[0]['CTDPRS'].parameter is files[1]['CTDPRS'].parameter)
+
+    def test_collection_to_data_file(self):
+        """Files are concatenated and their globals broadcast into columns."""
+        coll = DataFileCollection()
+        for stn, pressures, flags, extra in [
+                ('1', [1, 2], [2, 3], None), ('2', [], [], None),
+                ('3', [3], [], [7])]:
+            dfile = DataFile()
+            dfile.globals['STNNBR'] = stn
+            dfile['CTDPRS'] = Column('CTDPRS')
+            dfile['CTDPRS'].values = pressures
+            dfile['CTDPRS'].flags_woce = flags
+            if extra:
+                dfile['CTDTMP'] = Column('CTDTMP')
+                dfile['CTDTMP'].values = extra
+            coll.append(dfile)
+
+        dfile = coll.to_data_file()
+        self.assertEqual(['1', '1', '3'], dfile['STNNBR'].values)
+        self.assertEqual([1, 2, 3], dfile['CTDPRS'].values)
+        self.assertEqual([2, 3], dfile['CTDPRS'].flags_woce)
+        self.assertEqual([None, None, 7], dfile['CTDTMP'].values)
+        self.assertEqual(['', '', ''], dfile['header'].values)
+
+    def test_select_take(self):
+        """Selected and taken views share the file's columns and globals."""
+        dfile = DataFile()
+        dfile.create_columns(['STNNBR', 'CTDPRS'])
+        dfile.globals['header'] = '#header\n'
+        dfile['STNNBR'].values = ['1', '1', '2']
+        dfile['CTDPRS'].values = [1, 2, 3]
+        dfile['CTDPRS'].flags_woce = [2, 3, 2]
+
+        view = dfile.select(['CTDPRS'])
+        self.assertEqual(['CTDPRS'], view.columns.keys())
+        self.assertEqual('#header\n', view.globals['header'])
+
+        view = dfile.take([2, 0])
+        self.assertEqual(['2', '1'], view['STNNBR'].values)
+        self.assertEqual([2, 2], view['CTDPRS'].flags_woce)
+        view['CTDPRS'][0] = 4
+        self.assertEqual([1, 2, 3], dfile['CTDPRS'].values)
+        self.assertEqual(2, len(dfile.take(slice(1, None))))
+
+    def test_query(self):
+        """Rows are selected by predicates on values and flags."""
+        dfile = DataFile()
+        dfile.create_columns(['STNNBR', 'CASTNO', 'CTDPRS'])
+        dfile['STNNBR'].values = ['1', '1', '2', '2', '3']
+        dfile['CASTNO'].values = [1, 1, 1, 1, 1]
+        dfile['CTDPRS'].values = [5, 50, 10, None, 500]
+        dfile['CTDPRS'].flags_woce = [2, 3, 2, 9]
+        # The last row's flag is missing and so never satisfies.
+
+        pres = column('CTDPRS')
+        self.assertEqual([True, False, True, False, False],
+                         dfile.mask(pres.flag_woce == 2))
+        self.assertEqual([False, True, True, False, False],
+                         dfile.mask(pres.between(10, 100)))
+        self.assertEqual([True, True, False, False, True],
+                         dfile.mask(~column('STNNBR').isin(['2'])))
+
+        view = dfile.query(
+            (column('STNNBR') == '2') | (pres > 100) & (pres.flag_woce != 2))
+        self.assertEqual([10, None], view['CTDPRS'].values)
+        view = dfile.query((column('STNNBR') == '2') | (pres > 100))
+        self.assertEqual([10, None, 500], view['CTDPRS'].values)
+        self.assertEqual(['2', '2', '3'], view['STNNBR'].values)
+        self.assertEqual(0, len(dfile.query(pres < 0)))
+
+    def test_memory_usage(self):
+        """Each column's storage is accounted and shared objects once."""
+        dfile = DataFile()
+        dfile.create_columns(['STNNBR', 'CTDPRS'])
+        dfile['STNNBR'].values = ['1', '1', '2']
+        dfile['CTDPRS'].values = [_decimal('1.0'), _decimal('2.0'), None]
+        dfile['CTDPRS'].flags_woce = [2, 2, 9]
+
+        usage = dfile.memory_usage()
+        self.assertEqual(['STNNBR', 'CTDPRS'], usage['columns'].keys())
+        self.assertEqual('EncodedList', usage['columns']['STNNBR']['storage'])
+        self.assertEqual('list', usage['columns']['CTDPRS']['storage'])
+        pres = usage['columns']['CTDPRS']
+        self.assertTrue(pres['values'] > 0)
+        self.assertEqual(
+            pres['values'] + pres['flags_woce'] + pres['flags_igoss'] +
+            pres['parameter'], pres['total'])
+        self.assertEqual(3, usage['rows'])
+        self.assertEqual(usage['total'] / 3, usage['bytes_per_row'])
+
+        coll = DataFileCollection()
+        coll.append(dfile)
+        coll.append(dfile.take([0, 1]))
+        coll_usage = coll.memory_usage()
+        self.assertEqual(2, coll_usage['files'])
+        self.assertEqual(5, coll_usage['rows'])
+        self.assertEqual('EncodedList, RowsView',
+                         coll_usage['columns']['STNNBR']['storage'])
+        # The view shares its values and parameters with the file.
+        self.assertTrue(coll_usage['total'] < 2 * usage['total'])
+
+
 class TestColumn(TestCase):
     def test_decimal_places_requires_decimal(self):
         ccc = Column('test')
@@ -141,3 +369,26 @@ class TestColumn(TestCase):
         bbb.flags_woce = [None]
         diff = aaa.diff(bbb)
         self.assertFalse(diff['diff'])
+
+    def test_diff_rows(self):
+        """Differing rows are given as an index array."""
+        aaa = Column('aaa')
+        bbb = Column('aaa')
+        aaa.values = _decimal(['1.0', '2.0', '3.0', '4.0'])
+        bbb.values = _decimal(['1.0', '2.00', '3.5', '4.0'])
+        aaa.flags_woce = [2, 2, 2, 2]
+        bbb.flags_woce = [2, 2, 3, 2]
+        diff = aaa.diff(bbb)
+        self.assertTrue(diff.is_diff_values())
+        self.assertEqual([1, 2], list(diff.values_rows))
+        self.assertEqual([False, True, True, False], diff.values)
+        self.assertEqual([2], list(diff.flags_woce_rows))
+
+        diff = aaa.diff(bbb, consider_precision=False)
+        self.assertEqual([2], list(diff.values_rows))
+
+        # Row maps align the second column onto the first. Rows missing from
+        # the second column differ.
+        row_map = [(0, 0, None), (3, 3, None), (1, 4, None)]
+        diff = aaa.diff(bbb, row_map=row_map)
+        self.assertEqual([2], list(diff.values_rows))
@@ -29,6 +29,25 @@ class TestDbModelStd(unittest.TestCase):
         # Test something that needs an alias lookup
         okay(std.find_by_mnemonic(u'TALK'))
 
+    def test_cache_parameters(self):
+        """Cached parameters are found without the database."""
+        with std.closing(std.session(no_global=True)) as sesh:
+            std.cache_parameters(sesh)
+        session = std.session
+        def no_session(*args, **kwargs):
+            raise AssertionError('The database was queried')
+        std.session = no_session
+        try:
+            parameter = std.find_by_mnemonic(u'CTDOXY')
+            self.assertEqual(u'CTDOXY', parameter.name)
+            self.assertTrue(parameter.units is None or parameter.units.name)
+            alias = std.find_by_mnemonic(u'TALK')
+            if alias:
+                self.assertEqual(alias, std.find_by_mnemonic(alias.name))
+        finally:
+            std.session = session
+            std._parameters_by_name.clear()
+
     def test_parameter_is_in_range(self):
         p = std.Parameter('_test')
         p.bound_lower = 0.0
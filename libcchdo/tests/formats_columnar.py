@@ -0,0 +1,77 @@
+from unittest import TestCase
+from StringIO import StringIO
+from tempfile import TemporaryFile, NamedTemporaryFile
+import os.path
+
+from libcchdo.model.datafile import DataFile, DataFileCollection
+from libcchdo.formats.bottle import exchange as btlex
+from libcchdo.formats import columnar
+from libcchdo.formats.formats import read_arbitrary
+
+
+SAMPLE = os.path.join(
+    os.path.dirname(__file__), 'samples', 'bottle_exchange',
+    'a10_33RO20110926_hy1.csv')
+
+
+class TestColumnar(TestCase):
+
+    def setUp(self):
+        self.dfile = DataFile()
+        with open(SAMPLE) as fff:
+            btlex.read(self.dfile, fff)
+        self.exchange = StringIO()
+        btlex.write(self.dfile, self.exchange)
+
+    def assertSameExchange(self, dfile):
+        exchange = StringIO()
+        btlex.write(dfile, exchange)
+        self.assertEqual(self.exchange.getvalue(), exchange.getvalue())
+
+    def test_round_trip_mapped(self):
+        """Files read back from disk write the same Exchange."""
+        with TemporaryFile() as fff:
+            columnar.write(self.dfile, fff)
+            fff.flush()
+            fff.seek(0)
+            self.assertTrue(columnar.is_file_recognized(fff))
+            dfile = DataFile()
+            columnar.read(dfile, fff)
+        self.assertSameExchange(dfile)
+
+    def test_round_trip_stream(self):
+        cache = StringIO()
+        columnar.write(self.dfile, cache)
+        cache.seek(0)
+        dfile = DataFile()
+        columnar.read(dfile, cache)
+        self.assertSameExchange(dfile)
+
+        cache.seek(0)
+        with self.assertRaises(ValueError):
+            columnar.read(DataFileCollection(), cache)
+
+    def test_recognized(self):
+        self.assertTrue(columnar.is_filename_recognized('a.cchdo.pack'))
+        self.assertFalse(columnar.is_file_recognized(StringIO('EXPOCODE')))
+
+    def test_read_arbitrary_collection(self):
+        """Cached collections are read back into collections."""
+        coll = DataFileCollection()
+        coll.files.append(self.dfile)
+        with NamedTemporaryFile(suffix='.cchdo.pack') as fff:
+            columnar.write(coll, fff)
+            fff.flush()
+            fff.seek(0)
+            self.assertTrue(columnar.container_type(fff) is DataFileCollection)
+            self.assertEqual(0, fff.tell())
+            loaded = read_arbitrary(fff)
+        self.assertTrue(isinstance(loaded, DataFileCollection))
+        self.assertEqual(1, len(loaded.files))
+        self.assertSameExchange(loaded.files[0])
+
+        with NamedTemporaryFile(suffix='.cchdo.pack') as fff:
+            columnar.write(self.dfile, fff)
+            fff.flush()
+            fff.seek(0)
+            self.assertTrue(type(read_arbitrary(fff)) is DataFile)
@@ -79,3 +79,19 @@ class TestFormatsExchange(BaseTestCase):
         self.assertEqual('012', dfile['BTLNBR'].values[0])
         self.assertEqual('123', dfile['BTLNBR'].values[1])
         self.assertEqual(None, dfile['UNKPARAM'].values[1])
+
+    def test_read_data_metrics(self):
+        """Only fill values count as fills and newlines count as bytes."""
+        fills = exchange._fill_values_read.value
+        nbytes = exchange._bytes_read.value
+        with closing(StringIO()) as fff:
+            fff.name = 'testfile'
+            fff.write('-999,a\n')
+            fff.write('33.24,2\n')
+            fff.flush()
+            fff.seek(0)
+            dfile = DataFile()
+            dfile['CTDSAL'] = Column('CTDSAL')
+            exchange.read_data(dfile, fff, ['CTDSAL', 'CTDSAL_FLAG_W'])
+        self.assertEqual(1, exchange._fill_values_read.value - fills)
+        self.assertEqual(15, exchange._bytes_read.value - nbytes)
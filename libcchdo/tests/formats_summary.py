@@ -3,7 +3,8 @@ from datetime import datetime
 import unittest
 
 from libcchdo.fns import equal_with_epsilon, Decimal
-from libcchdo.model.datafile import SummaryFile
+from libcchdo.model.datafile import SummaryFile, DataFile
+from libcchdo.formats import woce
 from libcchdo.formats.summary import woce as sumwoce, hot as sumhot
 
 
@@ -93,3 +94,47 @@ EXPOCODE     SECT   STNNBR CASTNO TYPE DATE   TIME  CODE LATITUDE   LONGITUDE
         self.assertEqual([1020, 4806, 4806], cs['_MAX_PRESSURE'].values)
         self.assertEqual(['1,2', '1,2,3,4,5,6', '1,2'], cs['_PARAMETERS'].values)
         self.assertEqual(['Dual T, C sensors'] * 3, cs['_COMMENTS'].values)
+
+    def test_index(self):
+        """Station casts are found by their normalized values."""
+        sfile = SummaryFile()
+        sumwoce.read(sfile, StringIO(self.sample_woce))
+        self.assertEqual(0, sfile.index('1', 1))
+        self.assertEqual(2, sfile.index(2.0, '1'))
+        with self.assertRaises(ValueError):
+            sfile.index('3', 1)
+
+        # The index follows changes to the station and cast columns.
+        sfile['STNNBR'].values = ['3', '1', '2']
+        self.assertEqual(0, sfile.index('3', 1))
+        self.assertEqual(1, sfile.index('1', 1))
+
+    def test_combine(self):
+        """Summary data is joined onto the bottle rows by station cast."""
+        sfile = SummaryFile()
+        sumwoce.read(sfile, StringIO(self.sample_woce))
+        dfile = DataFile()
+        dfile.create_columns(['STNNBR', 'CASTNO'])
+        dfile['STNNBR'].values = ['2', '2', '1']
+        dfile['CASTNO'].values = [1, 1, 1]
+        woce.combine(dfile, sfile)
+        self.assertEqual([1257, 1257, 450], dfile['DEPTH'].values)
+        self.assertEqual(
+            [datetime(2007, 2, 15, 17, 5)] * 2 + [
+             datetime(2007, 2, 15, 14, 24)], dfile['_DATETIME'].values)
+        self.assertEqual(['33RR20070204'] * 3, dfile['EXPOCODE'].values)
+
+    def test_read_summary_woce_positions(self):
+        """Positions may be in decimal degrees or blank."""
+        lines = self.sample_woce.splitlines(True)
+        lines[4] = lines[4].replace(
+            '65 48.65 S  84 33.00 E', '65.8108  S 84.5500  E')
+        lines[5] = lines[5].replace('65 48.65 S  84 33.01 E', ' ' * 22)
+        sfile = SummaryFile()
+        sumwoce.read(sfile, StringIO(''.join(lines)))
+        self.assertEqual(
+            [Decimal('-65.810800'), None, Decimal('-65.768167')],
+            sfile['LATITUDE'].values)
+        self.assertEqual(
+            [Decimal('84.550000'), None, Decimal('84.5348333')],
+            sfile['LONGITUDE'].values)
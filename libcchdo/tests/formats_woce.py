@@ -1,8 +1,10 @@
 from contextlib import closing
+from datetime import datetime
 
 from libcchdo.util import StringIO
 from libcchdo.tests import BaseTestCase, sample_file
-from libcchdo.formats import exchange
+from libcchdo.formats import exchange, woce
+from libcchdo.fns import _decimal
 from libcchdo.model.datafile import DataFile, Column
 
 
@@ -23,3 +25,138 @@ class TestFormatsExchange(BaseTestCase):
 
             self.assertTrue(isinstance(dfile['BTLNBR'].values[0], basestring))
 
+
+class TestFormatsWoce(BaseTestCase):
+
+    parameters_line = '  CTDPRS  CTDTMP  CTDSAL  QUALT1'
+    units_line = '    DBAR  ITS-90  PSS-78       *'
+    asterisk_line = '         ******* *******       *'
+
+    def _read_data(self, lines):
+        dfile = DataFile()
+        with closing(StringIO('\n'.join(lines) + '\n')) as fff:
+            woce.read_data(dfile, fff, self.parameters_line, self.units_line,
+                           self.asterisk_line)
+        return dfile
+
+    def test_read_data(self):
+        """Columns are converted with fill values as None."""
+        dfile = self._read_data([
+            '     1.0  2.0000 34.0000     22',
+            '     2.0 -9.0000 -9.0000     99',
+            '     3.0  2.0000 34.0000     23',
+        ])
+        self.assertEqual(
+            [_decimal('1.0'), _decimal('2.0'), _decimal('3.0')],
+            dfile['CTDPRS'].values)
+        self.assertEqual([], dfile['CTDPRS'].flags_woce)
+        self.assertEqual(
+            [_decimal('2.0000'), None, _decimal('2.0000')],
+            dfile['CTDTMP'].values)
+        self.assertEqual([2, 9, 2], dfile['CTDTMP'].flags_woce)
+        self.assertEqual([2, 9, 3], dfile['CTDSAL'].flags_woce)
+        self.assertEqual(-4, dfile['CTDSAL'].values[0].as_tuple().exponent)
+
+    def test_read_data_bad_flag(self):
+        with self.assertRaises(ValueError):
+            self._read_data([
+                '     1.0  2.0000 34.0000     22',
+                '     2.0  2.0000 34.0000     2X',
+            ])
+
+    def test_write_data(self):
+        """Missing values are filled and truncations warned once per column."""
+        dfile = DataFile()
+        dfile.create_columns(['CTDPRS', 'CTDTMP'])
+        dfile['CTDPRS'].values = [
+            _decimal('1.0'), _decimal('123456789.0'), _decimal('123456789.0')]
+        dfile['CTDTMP'].values = [_decimal('2.0000'), None]
+        dfile['CTDTMP'].flags_woce = [2, 9, 2]
+        with closing(StringIO()) as fff:
+            woce.write_data(dfile, fff)
+            self.assertEqual(
+                '  CTDPRS  CTDTMP QUALT1\n'
+                '                      *\n'
+                '         *******      *\n'
+                '     1.0  2.0000      2\n'
+                '12345678 -9.0000      9\n'
+                '12345678 -9.0000      2\n', fff.getvalue())
+        self.assertTrue(self.ensure_lines(
+            [['Truncated 2 values of CTDPRS', "'123456789.0'", 'row 1']]))
+
+    def test_fuse_split_datetime_columns(self):
+        """Dates and times are fused into datetimes and split back."""
+        dfile = DataFile()
+        dfile.create_columns(['DATE', 'TIME'])
+        dfile['DATE'].values = ['20140101', '20140101', '20140102', None]
+        dfile['TIME'].values = ['0130', '0130', '2359', '0000']
+        woce.fuse_datetime(dfile)
+        self.assertEqual([
+            datetime(2014, 1, 1, 1, 30), datetime(2014, 1, 1, 1, 30),
+            datetime(2014, 1, 2, 23, 59), None], dfile['_DATETIME'].values)
+        self.assertFalse('DATE' in dfile or 'TIME' in dfile)
+
+        woce.split_datetime(dfile)
+        self.assertEqual(['20140101', '20140101', '20140102', None],
+                         dfile['DATE'].values)
+        self.assertEqual(['0130', '0130', '2359', None], dfile['TIME'].values)
+
+    def test_fuse_datetime_columns_without_time(self):
+        dfile = DataFile()
+        dfile.create_columns(['DATE'])
+        dfile['DATE'].values = ['20140101']
+        woce.fuse_datetime(dfile)
+        self.assertEqual([datetime(2014, 1, 1)], dfile['_DATETIME'].values)
+
+    def test_bottle_round_trip_cruise_dates(self):
+        """WOCE bottle files are read back with the cruise dates written."""
+        from libcchdo.formats.bottle import exchange as btlex
+        from libcchdo.formats.bottle import woce as btlwoce
+        dfile = DataFile()
+        with open(sample_file(
+                'bottle_exchange', '64PE20050907_hy1.csv')) as fff:
+            btlex.read(dfile, fff)
+        dfile.globals['stamp'] = '20140101SIOSIO'
+        # Writing rewrites the shared parameters' formats and display orders.
+        saved = [(col.parameter, col.parameter.format,
+                  col.parameter.display_order)
+                 for col in dfile.columns.values()]
+        with closing(StringIO()) as fff:
+            try:
+                btlwoce.write(dfile, fff)
+            finally:
+                for param, fmt, order in saved:
+                    param.format = fmt
+                    param.display_order = order
+            fff.seek(0)
+            record_1 = fff.readline()
+            fff.seek(0)
+            copy = DataFile()
+            btlwoce.read(copy, fff)
+        begin_date, end_date = record_1.split('CRUISE DATES')[1].split()[:3:2]
+        self.assertEqual(begin_date, copy.globals['_BEGIN_DATE'])
+        self.assertEqual(end_date, copy.globals['_END_DATE'])
+        self.assertEqual(len(dfile), len(copy))
+
+    def test_woce_lats_to_dec_lats(self):
+        lattoks = [
+            ['65', '48.65', 'S'], ['0', '30.00', 'N'], ['65', '48.65', 'S']]
+        self.assertEqual(
+            [_decimal('-65.810833'), _decimal('0.500000'),
+             _decimal('-65.810833')],
+            woce.woce_lats_to_dec_lats(lattoks))
+        lngtoks = [['84', '33.00', 'E'], ['179', '59.99', 'W']]
+        self.assertEqual(
+            [_decimal('84.5500000'), _decimal('-179.9998333')],
+            woce.woce_lngs_to_dec_lngs(lngtoks))
+        self.assertEqual(
+            _decimal('-179.9998333'), woce.woce_lng_to_dec_lng(lngtoks[1]))
+
+        failures = {}
+        self.assertEqual(
+            [None, _decimal('-0.500000')],
+            woce.woce_lats_to_dec_lats(
+                [['65.8', 'S'], ['0', '30.00', 'S']], failures))
+        self.assertEqual([0], failures.keys())
+        with self.assertRaises(ValueError):
+            woce.woce_lats_to_dec_lats([['65.8', 'S']])
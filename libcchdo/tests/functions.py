@@ -101,6 +101,30 @@ class TestFunctions(unittest.TestCase):
         self.assertEqual(30, fns.polynomial(5, [0, 1, 1]))
         self.assertEqual(50, fns.polynomial(5, [0, 5, 1]))
 
+    def test_ddms_to_dds(self):
+        ctoks = [['12', '30.50', 'S'], ['140', '15.25', 'W'],
+                 ['12', '30.50', 'S'], ['0', '6', 'N']]
+        self.assertEqual(
+            [fns.Decimal('-12.508333'), fns.Decimal('-140.2541667'),
+             fns.Decimal('-12.508333'), fns.Decimal('0.100000')],
+            fns.ddms_to_dds(ctoks))
+        self.assertEqual(
+            [fns.ddm_to_dd(toks, 2) for toks in ctoks],
+            fns.ddms_to_dds(ctoks, 2))
+        self.assertEqual(
+            [fns.Decimal('-12.5083'), fns.Decimal('-140.2541')],
+            fns.ddms_to_dds(ctoks[:2], 1, fns.ROUND_DOWN))
+        with self.assertRaises(ValueError):
+            fns.ddms_to_dds([['12', '30.50', 'X']])
+        self.assertEqual([None], fns.ddms_to_dds([['12', '--', 'S']]))
+
+    def test_graticules_to_dds(self):
+        self.assertEqual(
+            [fns.Decimal('-12.5083'), fns.Decimal('140.2500'),
+             fns.Decimal('0.0000')],
+            fns.graticules_to_dds(
+                [(12, 30, 5, 'S'), (140, 15, 0, 'E'), (0, 0, 0, 'N')], 4))
+
     def test_read_arbitrary(self):
         # TODO
         t = NamedTemporaryFile(suffix='su.txt')
@@ -9,7 +9,7 @@ from libcchdo.model.datafile import DataFile, DataFileCollection
 from libcchdo.db.model.std import Unit
 from libcchdo.merge import (
     BOTTLE_KEY_COLS, determine_bottle_keys, different_columns, map_collections,
-    merge_collections, merge_datafiles)
+    merge_collections, merge_datafiles, diff_files)
 from libcchdo.recipes.orderedset import OrderedSet
 
 from libcchdo.tests import BaseTestCase
@@ -209,12 +209,15 @@ END_DATA
             parameters = p_different + p_not_in_orig
             keys = determine_bottle_keys(dfo, dfd)
             parameters = list(OrderedSet(parameters) - OrderedSet(keys))
-            mdf = merge_datafiles(dfo, dfd, keys, parameters)
+            # With no rows matched no columns differ so there is nothing to
+            # merge.
+            self.assertEqual([], parameters)
+            with self.assertRaises(ValueError):
+                merge_datafiles(dfo, dfd, keys, parameters)
 
             # Make sure warning is printed regarding extra key in deriv file.
             lines = [
                 'No keys matched',
-                'No keys provided to map on.',
             ]
             self.assertTrue(self.ensure_lines(lines))
 
@@ -527,6 +530,50 @@ END_DATA
         self.assertEqual(mdf['FLUOR'].values, [100, 101, 102])
         self.assertEqual(mdf['FLUOR'].flags_woce, [2, 3, 9])
 
+    def test_diff_files(self):
+        """Diffs summarize changed rows and flag changes by code."""
+        df0 = DataFile()
+        df0.create_columns(['CTDPRS', 'NITRAT', 'FLUOR'])
+        df1 = DataFile()
+        df1.create_columns(['CTDPRS', 'NITRAT', 'SILCAT'])
+        for pres, nitrat, flag in [(1, 10, 2), (2, 11, 2), (3, 12, 2)]:
+            df0['CTDPRS'].append(pres, 2)
+            df0['NITRAT'].append(nitrat, flag)
+            df0['FLUOR'].append(100)
+        for pres, nitrat, flag in [(3, 12, 3), (2, 13, 2), (1, 10, 3)]:
+            df1['CTDPRS'].append(pres, 2)
+            df1['NITRAT'].append(nitrat, flag)
+            df1['SILCAT'].append(100)
+
+        for processes in (1, 2):
+            diff = diff_files(
+                df0, df1, ['CTDPRS'], processes=processes, patch=True)
+            self.assertEqual(['NITRAT'], diff['parameters'].keys())
+            nitrat = diff['parameters']['NITRAT']
+            self.assertEqual(1, nitrat['values'])
+            self.assertEqual({(2, 3): 2}, nitrat['flags_woce'])
+            self.assertEqual(['SILCAT'], diff['not_in_origin'])
+            self.assertEqual(['FLUOR'], diff['not_in_derivative'])
+            self.assertIn((0, 'value', 1, (2, ), 11, 13), nitrat['patch'])
+
+    def test_diff_files_no_matching_keys(self):
+        """Rows whose keys do not match are only reported as unmatched."""
+        df0 = DataFile()
+        df0.create_columns(['CTDPRS', 'NITRAT'])
+        df1 = DataFile()
+        df1.create_columns(['CTDPRS', 'NITRAT'])
+        for pres, nitrat in [(1, 10), (2, 11)]:
+            df0['CTDPRS'].append(pres, 2)
+            df0['NITRAT'].append(nitrat, 2)
+        for pres, nitrat in [(5, 20), (6, 21)]:
+            df1['CTDPRS'].append(pres, 3)
+            df1['NITRAT'].append(nitrat, 3)
+
+        diff = diff_files(df0, df1, ['CTDPRS'], processes=1, patch=True)
+        self.assertEqual(2, diff['unmatched_origin_rows'])
+        self.assertEqual(2, diff['unmatched_derivative_rows'])
+        self.assertEqual({}, dict(diff['parameters']))
+
     def test_functional_scripts_ctdex(self):
         """Test merging CTD Exchange files."""
         from argparse import Namespace
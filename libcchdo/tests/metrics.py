@@ -0,0 +1,62 @@
+from unittest import TestCase
+from tempfile import NamedTemporaryFile
+from json import loads
+
+from libcchdo.metrics import Registry, PeriodicDump
+
+
+class TestMetrics(TestCase):
+
+    def setUp(self):
+        self.registry = Registry()
+
+    def test_counter(self):
+        counter = self.registry.counter('rows')
+        counter.inc()
+        counter.inc(2)
+        self.assertTrue(counter is self.registry.counter('rows'))
+        self.assertEqual(3, self.registry.snapshot()['counters']['rows'])
+
+        self.registry.reset()
+        counter.inc()
+        self.assertEqual(1, self.registry.snapshot()['counters']['rows'])
+
+    def test_histogram(self):
+        histogram = self.registry.histogram('rows_per_file')
+        for value in (0, 3, 4, 100):
+            histogram.observe(value)
+        snapshot = self.registry.snapshot()['histograms']['rows_per_file']
+        self.assertEqual(4, snapshot['count'])
+        self.assertEqual(107, snapshot['total'])
+        self.assertEqual(0, snapshot['min'])
+        self.assertEqual(100, snapshot['max'])
+        self.assertEqual({'1': 1, '4': 2, '128': 1}, snapshot['buckets'])
+
+    def test_kind_mismatch(self):
+        self.registry.counter('rows')
+        with self.assertRaises(TypeError):
+            self.registry.histogram('rows')
+
+    def test_merge(self):
+        """Snapshots from other processes add to the registry."""
+        other = Registry()
+        other.counter('rows').inc(2)
+        other.histogram('sizes').observe(5)
+        self.registry.counter('rows').inc(1)
+        self.registry.histogram('sizes').observe(1)
+        self.registry.merge(other.snapshot())
+        snapshot = self.registry.snapshot()
+        self.assertEqual(3, snapshot['counters']['rows'])
+        self.assertEqual(
+            {'1': 1, '8': 1}, snapshot['histograms']['sizes']['buckets'])
+        self.assertEqual(5, snapshot['histograms']['sizes']['max'])
+
+    def test_periodic_dump(self):
+        """A final snapshot is written when the dump is stopped."""
+        self.registry.counter('rows').inc(4)
+        with NamedTemporaryFile() as fff:
+            with PeriodicDump(fff.name, 3600, self.registry):
+                pass
+            lines = fff.read().splitlines()
+        self.assertEqual(1, len(lines))
+        self.assertEqual(4, loads(lines[0])['counters']['rows'])
@@ -0,0 +1,104 @@
+from unittest import TestCase
+from cPickle import dumps as pickle_dumps, loads as pickle_loads
+from copy import copy, deepcopy
+import os.path
+
+from libcchdo.fns import _decimal
+from libcchdo.db.model import std
+from libcchdo.model.datafile import (
+    DataFile, DataFileCollection, SummaryFile, EncodedList, Column)
+from libcchdo.model import packed
+
+
+class TestPacked(TestCase):
+
+    def setUp(self):
+        self.dfile = DataFile()
+        self.dfile.create_columns(['STNNBR', 'CTDPRS', 'CTDTMP', 'NOTE'])
+        self.dfile.globals['header'] = '#header\n'
+        self.dfile['STNNBR'].values = ['1', '1', '2']
+        self.dfile['CTDPRS'].values = [
+            _decimal('1.0'), None, _decimal('-3.0')]
+        self.dfile['CTDPRS'].flags_woce = [2, None, 3]
+        self.dfile['CTDTMP'].values = [
+            _decimal('1'), _decimal('-0.0010'), _decimal('-999')]
+        self.dfile['NOTE'].values = ['a', None, u'c']
+
+    def assertFilesEqual(self, dfile, copy):
+        self.assertEqual(dfile.columns.keys(), copy.columns.keys())
+        self.assertEqual(dfile.globals, copy.globals)
+        for key, column in dfile.columns.items():
+            other = copy[key]
+            self.assertEqual(map(repr, column.values), map(repr, other.values))
+            self.assertEqual(column.flags_woce, other.flags_woce)
+            self.assertEqual(column.flags_igoss, other.flags_igoss)
+            self.assertEqual(column.parameter.name, other.parameter.name)
+
+    def test_round_trip(self):
+        """Values, flags, globals and parameters survive packing exactly."""
+        copy = packed.loads(packed.dumps(self.dfile))
+        self.assertFilesEqual(self.dfile, copy)
+        self.assertTrue(isinstance(copy['STNNBR'].values, EncodedList))
+
+    def test_summary_station_cast_index(self):
+        """The station cast index is rebuilt on the unpacked columns."""
+        sfile = SummaryFile()
+        sfile['STNNBR'].values = ['1', '2']
+        sfile['CASTNO'].values = [1, 1]
+        self.assertEqual(1, sfile.index('2', 1))
+        copy = packed.loads(packed.dumps(sfile))
+        self.assertFalse(hasattr(copy, '_station_cast_index'))
+        self.assertEqual(1, copy.index('2', 1))
+        copy['STNNBR'].set(1, '3')
+        self.assertEqual(1, copy.index('3', 1))
+
+    def test_pickle(self):
+        """DataFiles and collections pickle through the packed form."""
+        coll = DataFileCollection()
+        coll.append(self.dfile)
+        coll.append(DataFile())
+        copy = pickle_loads(pickle_dumps(coll, 2))
+        self.assertEqual(2, len(copy.files))
+        self.assertFilesEqual(self.dfile, copy.files[0])
+
+    def test_copy(self):
+        """Copies keep their parameters instead of going through packing."""
+        parameter = self.dfile['CTDPRS'].parameter
+        original_format = parameter.format
+        parameter.format = '%9.3f'
+        try:
+            copied = deepcopy(self.dfile)
+            self.assertFilesEqual(self.dfile, copied)
+            self.assertEqual('%9.3f', copied['CTDPRS'].parameter.format)
+            self.assertFalse(
+                copied['CTDPRS'].values is self.dfile['CTDPRS'].values)
+
+            coll = DataFileCollection()
+            coll.append(self.dfile)
+            self.assertTrue(copy(coll).files is coll.files)
+            copied = deepcopy(coll)
+            self.assertEqual(
+                '%9.3f', copied.files[0]['CTDPRS'].parameter.format)
+        finally:
+            parameter.format = original_format
+
+    def test_unknown_std_parameter(self):
+        """Parameters that are no longer known keep their attributes."""
+        parameter = std.make_contrived_parameter('NOT_KNOWN', format='%4.1f')
+        parameter.id = -1
+        self.dfile['NOT_KNOWN'] = Column(parameter)
+        self.dfile['NOT_KNOWN'].values = [1, 2, 3]
+        copied = packed.loads(packed.dumps(self.dfile))
+        self.assertEqual('NOT_KNOWN', copied['NOT_KNOWN'].parameter.name)
+        self.assertEqual('%4.1f', copied['NOT_KNOWN'].parameter.format)
+
+    def test_share(self):
+        """Shared packed files are attached to by path."""
+        with packed.share(self.dfile) as shared:
+            handle = pickle_loads(pickle_dumps(shared, 2))
+            self.assertFilesEqual(self.dfile, handle.attach())
+        self.assertFalse(os.path.exists(shared.path))
+
+    def test_not_packed(self):
+        with self.assertRaises(ValueError):
+            packed.loads('not packed')
@@ -75,3 +75,69 @@ class TestScripts(TestCase):
                     self.assertEqual(lines[2].split(','), answer)
             finally:
                 os.unlink(path)
+
+    def test_diff_collections(self):
+        """hydro diff reports casts added to and removed from a collection."""
+        import json
+        from shutil import rmtree
+        from tempfile import mkdtemp
+        from libcchdo.fns import _decimal
+        from libcchdo.model.datafile import DataFile, DataFileCollection
+        from libcchdo.formats.ctd.zip import exchange as ctdzipex
+
+        def cast(stnnbr, temperatures):
+            dfile = DataFile()
+            dfile.globals.update({
+                'stamp': '20120515ODF', 'header': '',
+                'EXPOCODE': '33AT20120419', 'SECT_ID': 'A20',
+                'STNNBR': stnnbr, 'CASTNO': '1', 'DATE': '20120421',
+                'TIME': '1552', 'LATITUDE': _decimal('6.8682'),
+                'LONGITUDE': _decimal('-53.4793'), 'DEPTH': 66,
+            })
+            dfile.create_columns(['CTDPRS', 'CTDTMP'], ['DBAR', 'ITS-90'])
+            for pres, temp in enumerate(temperatures):
+                dfile['CTDPRS'].append(_decimal('{0}.0'.format(pres)), 2)
+                dfile['CTDTMP'].append(_decimal(temp), 2)
+            return dfile
+
+        directory = mkdtemp()
+        try:
+            paths = {}
+            for name, casts in [
+                    ('origin', [cast('1', ['1.0000', '2.0000']),
+                                cast('2', ['1.0000', '2.0000'])]),
+                    ('derivative', [cast('1', ['1.0000', '2.5000']),
+                                    cast('3', ['1.0000', '2.0000'])])]:
+                coll = DataFileCollection()
+                for dfile in casts:
+                    coll.append(dfile)
+                paths[name] = os.path.join(directory, name + '_ct1.zip')
+                with open(paths[name], 'wb') as fff:
+                    ctdzipex.write(coll, fff)
+            summary_path = os.path.join(directory, 'summary.txt')
+            patch_path = os.path.join(directory, 'patch.json')
+
+            sys.argv = [
+                'hydro', 'diff', '-j', '1', '--patch', patch_path,
+                paths['origin'], paths['derivative'], summary_path]
+            with self.assertRaises(SystemExit) as context:
+                scripts.main()
+            self.assertFalse(context.exception.code)
+
+            with open(summary_path) as fff:
+                summary = fff.read()
+            self.assertIn('CTDTMP: 1 rows', summary)
+            self.assertIn('Files added: 33AT20120419, 3, 1\n', summary)
+            self.assertIn('Files removed: 33AT20120419, 2, 1\n', summary)
+            with open(patch_path) as fff:
+                patch = json.load(fff)
+            self.assertIn({
+                'file_key': {
+                    'EXPOCODE': '33AT20120419', 'STNNBR': '3', 'CASTNO': '1'},
+                'change': 'added'}, patch)
+            self.assertIn({
+                'file_key': {
+                    'EXPOCODE': '33AT20120419', 'STNNBR': '2', 'CASTNO': '1'},
+                'change': 'removed'}, patch)
+        finally:
+            rmtree(directory)
@@ -0,0 +1,47 @@
+from unittest import TestCase
+from tempfile import NamedTemporaryFile
+from json import load
+
+from libcchdo import timings
+
+
+@timings.timed('outer')
+def outer():
+    with timings.stage('inner'):
+        pass
+    with timings.stage('inner'):
+        pass
+
+
+class TestTimings(TestCase):
+
+    def tearDown(self):
+        timings.disable()
+
+    def test_disabled(self):
+        """Nothing is recorded while timing is off."""
+        outer()
+        recorded = timings.enable()
+        timings.disable()
+        outer()
+        self.assertEqual({}, recorded.stages)
+
+    def test_stages(self):
+        recorded = timings.enable()
+        outer()
+        self.assertEqual(['inner', 'outer'], recorded.stages.keys())
+        self.assertEqual(2, recorded.stages['inner']['count'])
+        self.assertEqual(1, recorded.stages['outer']['count'])
+        self.assertTrue(
+            recorded.stages['outer']['wall'] >=
+            recorded.stages['inner']['wall'])
+
+    def test_write_report(self):
+        recorded = timings.enable()
+        outer()
+        with NamedTemporaryFile() as fff:
+            timings.write_report(recorded, fff.name)
+            report = load(fff)
+        self.assertEqual(1, report['stages']['outer']['count'])
+        self.assertTrue('wall' in report)
+        self.assertTrue('cpu' in report)
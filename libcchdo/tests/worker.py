@@ -0,0 +1,70 @@
+import os
+import os.path
+import stat
+from unittest import TestCase
+from tempfile import mkdtemp
+from shutil import rmtree
+from base64 import b64encode, b64decode
+from json import loads, dumps
+
+from libcchdo.util import pyStringIO
+from libcchdo.tests import sample_file
+from libcchdo.worker import run_job, serve_lines, create_server
+
+
+class TestWorker(TestCase):
+
+    def test_run_job(self):
+        """Jobs run a hydro subcommand and return its output."""
+        path = sample_file('bottle_exchange', '64PE20050907_hy1.csv')
+        with open(path) as fff:
+            data = fff.read()
+        response = run_job({
+            'argv': ['convert', 'any', 'type', '-i', 'btl.ex', '-t',
+                     'btl.ex', '-'],
+            'stdin': b64encode(data)})
+        self.assertEqual(0, response['status'])
+        self.assertTrue(b64decode(response['stdout']).startswith('BOTTLE'))
+
+    def test_failing_job(self):
+        response = run_job({'argv': ['not_a_subcommand']})
+        self.assertEqual(2, response['status'])
+        self.assertTrue('invalid choice' in b64decode(response['stderr']))
+
+    def test_serve_lines(self):
+        """Each job line is answered with a response line."""
+        out = pyStringIO()
+        serve_lines(pyStringIO(
+            'not json\n\n' + dumps({'argv': ['formats']}) + '\n'), out)
+        responses = map(loads, out.getvalue().splitlines())
+        self.assertEqual([2, 0], [resp['status'] for resp in responses])
+        self.assertTrue('bottle.exchange' in b64decode(responses[1]['stdout']))
+
+    def test_timings_job(self):
+        """The global timing options apply to jobs in the job's directory."""
+        tmpdir = mkdtemp()
+        try:
+            response = run_job({
+                'argv': ['--timings-file', 'timings.json', 'formats'],
+                'cwd': tmpdir})
+            self.assertEqual(0, response['status'])
+            with open(os.path.join(tmpdir, 'timings.json')) as fff:
+                self.assertTrue(isinstance(loads(fff.read()), dict))
+        finally:
+            rmtree(tmpdir)
+
+    def test_socket_private(self):
+        """The socket is created accessible only to its owner."""
+        tmpdir = mkdtemp()
+        umask = os.umask(0)
+        try:
+            server = create_server(os.path.join(tmpdir, 'worker.sock'))
+            try:
+                mode = os.stat(server.server_address).st_mode
+                self.assertEqual(0, stat.S_IMODE(mode) & 0077)
+            finally:
+                server.server_close()
+            self.assertEqual(0, os.umask(umask))
+        finally:
+            os.umask(umask)
+            rmtree(tmpdir)
@@ -0,0 +1,131 @@
+"""Wall and CPU time spent in each stage of a hydro run.
+
+Timing is off until enable() is called. While it is off a stage costs one
+global lookup, so stages may be marked in code that runs often.
+
+Stages may nest. The time for a stage includes the stages inside it, e.g. a
+zip stage includes the read of each member.
+
+Use with hydro::
+
+    $ hydro --timings convert bottle exchange_to_woce in_hy1.csv out_hy.txt
+
+"""
+import os
+import sys
+import time
+import json
+from collections import OrderedDict
+from contextlib import contextmanager
+from functools import wraps
+from types import FunctionType
+
+
+def _cpu_time():
+    times = os.times()
+    return times[0] + times[1]
+
+
+class Timings(object):
+    """Accumulates the count, wall and CPU seconds of each stage."""
+
+    def __init__(self):
+        self.stages = OrderedDict()
+        self.start_wall = time.time()
+        self.start_cpu = _cpu_time()
+
+    def add(self, name, wall, cpu):
+        try:
+            stage = self.stages[name]
+        except KeyError:
+            stage = self.stages[name] = {'count': 0, 'wall': 0.0, 'cpu': 0.0}
+        stage['count'] += 1
+        stage['wall'] += wall
+        stage['cpu'] += cpu
+
+    def report(self):
+        """Return the timings as a dict that can be written as JSON."""
+        return OrderedDict([
+            ('wall', time.time() - self.start_wall),
+            ('cpu', _cpu_time() - self.start_cpu),
+            ('stages', self.stages),
+        ])
+
+
+_timings = None
+
+
+def enable():
+    """Start recording stages and return the Timings they are recorded in."""
+    global _timings
+    _timings = Timings()
+    return _timings
+
+
+def disable():
+    """Stop recording stages and return the Timings they were recorded in."""
+    global _timings
+    timings, _timings = _timings, None
+    return timings
+
+
+@contextmanager
+def stage(name):
+    """Record the time spent in the block as the named stage."""
+    timings = _timings
+    if timings is None:
+        yield
+        return
+    wall = time.time()
+    cpu = _cpu_time()
+    try:
+        yield
+    finally:
+        timings.add(name, time.time() - wall, _cpu_time() - cpu)
+
+
+def timed(name):
+    """Decorate a function to record each call as the named stage."""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if _timings is None:
+                return func(*args, **kwargs)
+            with stage(name):
+                return func(*args, **kwargs)
+        wrapper._timed_stage = name
+        return wrapper
+    return decorator
+
+
+def instrument_formats():
+    """Record the read and write functions of all format modules as stages.
+
+    Zip formats are recorded as the zip stage.
+
+    """
+    from libcchdo.formats.formats import all_formats
+
+    for module in all_formats.values():
+        if isinstance(module, str):
+            continue
+        if 'zip' in module.__name__.split('.')[-1]:
+            name = 'zip'
+        else:
+            name = None
+        for attr in ('read', 'write', ):
+            func = getattr(module, attr, None)
+            if (not isinstance(func, FunctionType) or
+                    hasattr(func, '_timed_stage')):
+                continue
+            setattr(module, attr, timed(name or attr)(func))
+
+
+def write_report(timings, path=None):
+    """Write the timings report as JSON to the path or stderr."""
+    report = json.dumps(timings.report(), indent=2)
+    if not path or path == '-':
+        sys.stderr.write(report + '\n')
+    else:
+        with open(path, 'w') as out:
+            out.write(report + '\n')
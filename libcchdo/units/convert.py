@@ -66,7 +66,7 @@ def milliliter_per_liter_to_umol_per_kg(file, column, whole_not_aliquot=None):
 
         if value < -3:
             # Missing
-            column.values[i] = None
+            column.set(i, None)
         elif 'OXY' in column.parameter.mnemonic_woce():
             # Converting oxygen
             if not whole_not_aliquot and \
@@ -81,8 +81,8 @@ def milliliter_per_liter_to_umol_per_kg(file, column, whole_not_aliquot=None):
             o2_atomic_weight = 31.9988
             density_o2 = 1.42905481 # g/l @ 273.15K
             constant = o2_atomic_weight / density_o2 * 0.001
-            column.values[i] /= (
-                _decimal(constant) * (sigt / _decimal(1.0e3) + _decimal(1.0)))
+            column.set(i, value / (
+                _decimal(constant) * (sigt / _decimal(1.0e3) + _decimal(1.0))))
         else:
             raise ValueError(('Cannot apply conversion for oxygen to '
                               'non-oxygen parameter.'))
@@ -114,10 +114,10 @@ def mol_per_liter_to_mol_per_kg(file, column):
 
         if value < -3:
             # Missing
-            column.values[i] = None
+            column.set(i, None)
         else:
-            column.values[i] /= (volume.sigma_r(
-                                     0.0, 0.0, 25.0, salinity) / 1.0e3 + 1.0)
+            column.set(i, value / (volume.sigma_r(
+                                     0.0, 0.0, 25.0, salinity) / 1.0e3 + 1.0))
 
     # Change the units
     prefix = column.parameter.units.name.strip()[:-1]
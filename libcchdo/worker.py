@@ -0,0 +1,272 @@
+"""A long running hydro process that runs jobs for a thin client.
+
+Starting hydro pays for Python startup, imports, the format scan and the
+parameter database check every time. The worker does this once and then runs
+each hydro subcommand it is sent in a forked child of the warm process. A job
+cannot leave state behind in the worker and a crashing job only fails itself.
+
+Jobs are sent one JSON object per line, either over a Unix socket or on the
+worker's stdin::
+
+    {"argv": ["convert", "any", "type", "in_hy1.csv"], "cwd": "/data",
+     "stdin": null}
+
+and answered one JSON object per line::
+
+    {"status": 0, "stdout": "...", "stderr": "..."}
+
+stdin, stdout and stderr are base64 encoded since they may be binary.
+
+Start a worker and send it jobs with the client::
+
+    $ hydro worker &
+    $ hydro-client convert any type in_hy1.csv
+
+"""
+import os
+import os.path
+import sys
+import json
+import socket
+import signal
+from base64 import b64encode, b64decode
+from tempfile import TemporaryFile
+from traceback import format_exc
+from SocketServer import UnixStreamServer, StreamRequestHandler, ForkingMixIn
+from logging import getLogger
+
+
+log = getLogger(__name__)
+
+
+SOCKET_ENV = 'HYDRO_WORKER_SOCKET'
+
+
+def get_default_socket_path():
+    """Return the worker socket path from the environment or the default."""
+    try:
+        return os.environ[SOCKET_ENV]
+    except KeyError:
+        from libcchdo import config
+        return os.path.join(config.get_config_dir(), 'worker.sock')
+
+
+def warm():
+    """Load what each hydro invocation would otherwise load again."""
+    from libcchdo.db.model import std
+    from libcchdo.formats.formats import all_formats
+    import libcchdo.scripts
+
+    all_formats.keys()
+
+    std_session = std.session()
+    std.cache_parameters(std_session)
+    # The cached parameters are fully loaded so jobs only need the database
+    # for names that are not parameters. Release the connection so that jobs
+    # do not inherit one that is in use.
+    std_session.close()
+
+
+def _run_hydro(argv):
+    """Run a hydro subcommand the way main() does and return its status.
+
+    The global --timings, --timings-file and --profile options apply to the
+    job. Their files are relative to the job's working directory.
+
+    """
+    from libcchdo.scripts import hydro_parser, _run_timed
+    from libcchdo.db.model import ignore_sa_warnings
+
+    try:
+        args = hydro_parser.parse_args(argv)
+        with ignore_sa_warnings():
+            return _run_timed(args) or 0
+    except SystemExit, err:
+        if err.code is None:
+            return 0
+        if isinstance(err.code, int):
+            return err.code
+        sys.stderr.write(u'{0}\n'.format(err.code))
+        return 1
+    except Exception:
+        log.critical(format_exc())
+        return 1
+
+
+def _redirect(fd, handle):
+    os.dup2(handle.fileno(), fd)
+
+
+def run_job(job):
+    """Run the job in a forked child and return its response."""
+    stdin = TemporaryFile()
+    if job.get('stdin'):
+        stdin.write(b64decode(job['stdin']))
+        stdin.seek(0)
+    stdout = TemporaryFile()
+    stderr = TemporaryFile()
+
+    sys.stdout.flush()
+    sys.stderr.flush()
+    pid = os.fork()
+    if pid == 0:
+        status = 1
+        try:
+            _redirect(0, stdin)
+            _redirect(1, stdout)
+            _redirect(2, stderr)
+            # The job's standard streams are the redirected descriptors. This
+            # also drops anything the worker had buffered from its own stdin.
+            sys.stdin = os.fdopen(0, 'r')
+            sys.stdout = os.fdopen(1, 'w')
+            sys.stderr = os.fdopen(2, 'w', 0)
+            # SQLite connections must not be used across fork.
+            from libcchdo.db.model import std
+            std.reconnect()
+            if job.get('cwd'):
+                os.chdir(job['cwd'].encode('utf8'))
+            # Command line arguments are byte strings.
+            argv = [arg.encode('utf8') for arg in job.get('argv', [])]
+            status = _run_hydro(argv)
+        except BaseException:
+            log.critical(format_exc())
+        finally:
+            for handle in (sys.stdout, sys.stderr):
+                try:
+                    handle.flush()
+                except (IOError, ValueError):
+                    pass
+            if not isinstance(status, int):
+                status = 1
+            os._exit(status)
+
+    pid, status = os.waitpid(pid, 0)
+    if os.WIFEXITED(status):
+        status = os.WEXITSTATUS(status)
+    else:
+        status = 128 + os.WTERMSIG(status)
+
+    response = {'status': status}
+    for name, handle in [('stdout', stdout), ('stderr', stderr)]:
+        handle.seek(0)
+        response[name] = b64encode(handle.read())
+        handle.close()
+    stdin.close()
+    return response
+
+
+def serve_lines(rfile, wfile):
+    """Answer each job line read from rfile on wfile until end of file."""
+    for line in iter(rfile.readline, ''):
+        if not line.strip():
+            continue
+        try:
+            job = json.loads(line)
+        except ValueError, err:
+            response = {
+                'status': 2, 'stdout': '',
+                'stderr': b64encode('Invalid job: {0}\n'.format(err))}
+        else:
+            response = run_job(job)
+        wfile.write(json.dumps(response) + '\n')
+        wfile.flush()
+
+
+class _JobHandler(StreamRequestHandler):
+
+    def handle(self):
+        serve_lines(self.rfile, self.wfile)
+
+
+class WorkerServer(ForkingMixIn, UnixStreamServer):
+    """Serves jobs over a Unix socket, one forked handler per connection."""
+
+
+def _terminate(signum, frame):
+    raise SystemExit(0)
+
+
+def create_server(socket_path):
+    """Return a WorkerServer bound to a new socket at socket_path.
+
+    Jobs run with the worker's permissions so the socket is only accessible
+    to its owner.
+
+    """
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+    umask = os.umask(0077)
+    try:
+        return WorkerServer(socket_path, _JobHandler)
+    finally:
+        os.umask(umask)
+
+
+def serve(socket_path=None):
+    """Warm up and serve jobs on the Unix socket until interrupted."""
+    socket_path = socket_path or get_default_socket_path()
+    warm()
+    server = create_server(socket_path)
+    signal.signal(signal.SIGTERM, _terminate)
+    log.info(u'hydro worker listening on {0}'.format(socket_path))
+    try:
+        server.serve_forever()
+    except (KeyboardInterrupt, SystemExit):
+        pass
+    finally:
+        server.server_close()
+        os.unlink(socket_path)
+
+
+def serve_stdio():
+    """Warm up and serve jobs on stdin and stdout."""
+    warm()
+    # Jobs' output is captured so nothing else should reach stdout.
+    out = os.fdopen(os.dup(1), 'w')
+    os.dup2(2, 1)
+    serve_lines(sys.stdin, out)
+
+
+def send_job(argv, socket_path=None, cwd=None, stdin=None):
+    """Send a job to the worker and return its response."""
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.connect(socket_path or get_default_socket_path())
+    try:
+        handle = sock.makefile('rwb')
+        job = {
+            'argv': argv,
+            'cwd': cwd or os.getcwd(),
+            'stdin': b64encode(stdin) if stdin is not None else None,
+        }
+        handle.write(json.dumps(job) + '\n')
+        handle.flush()
+        response = json.loads(handle.readline())
+        handle.close()
+    finally:
+        sock.close()
+    for name in ('stdout', 'stderr'):
+        response[name] = b64decode(response[name])
+    return response
+
+
+def client_main(argv=None):
+    """Forward a hydro subcommand to the worker.
+
+    stdin is forwarded only when a file argument is '-'.
+
+    """
+    if argv is None:
+        argv = sys.argv[1:]
+    stdin = None
+    if '-' in argv:
+        stdin = sys.stdin.read()
+    try:
+        response = send_job(argv, stdin=stdin)
+    except socket.error, err:
+        sys.stderr.write(
+            'Unable to reach the hydro worker at {0}: {1}\n'.format(
+                get_default_socket_path(), err))
+        sys.exit(1)
+    sys.stdout.write(response['stdout'])
+    sys.stderr.write(response['stderr'])
+    sys.exit(response['status'])
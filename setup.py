@@ -69,6 +69,7 @@ if __name__ == "__main__":
         entry_points={
             'console_scripts': [
                 'hydro = libcchdo.scripts:main',
+                'hydro-client = libcchdo.worker:client_main',
             ],
         },
         cmdclass={